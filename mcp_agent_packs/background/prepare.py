@@ -1,15 +1,23 @@
 
 import os
+import tempfile
 from pathlib import Path
 
+FILESYSTEM_DIR = Path(os.environ.get('TEMP', tempfile.gettempdir())) / 'mcp-server-filesystem'
+
+# Declarative steps run by the generator, which skips them when they are
+# already done
+PREPARE_STEPS = [
+    {"id": "filesystem-dir", "action": "mkdir", "path": str(FILESYSTEM_DIR)},
+]
+
 
 def prepare():
     # Ensure the mcp-server-filesystem directory exists
-    filesystem_dir = Path(os.environ['TEMP']) / 'mcp-server-filesystem'
-    filesystem_dir.mkdir(parents=True, exist_ok=True)
+    FILESYSTEM_DIR.mkdir(parents=True, exist_ok=True)
 
     # Print the path for verification
-    print(f"Prepared filesystem directory at: {filesystem_dir}")
+    print(f"Prepared filesystem directory at: {FILESYSTEM_DIR}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,55 @@
+"""MCP agent packs: generate MCP client configurations from pack templates.
+
+The library is quiet: progress is reported as ``Event`` objects to an
+``on_event`` handler and results are returned, never printed. The generation
+runs as a pipeline of stages (see ``mcp_agents.pipeline``);
+``mcp_agents.cli`` is the command line interface of ``generate_mcp_config.py``.
+
+Submodules are imported on first use of one of their names, so importing
+the package itself is cheap.
+"""
+
+from importlib import import_module
+
+# Public name -> submodule that defines it
+_EXPORTS = {
+    "GENERATOR_VERSION": "common",
+    "ClaudeDesktopWriter": "writers",
+    "BufferedHandler": "events",
+    "CompiledServer": "templates",
+    "CompiledTemplate": "templates",
+    "CredentialIndex": "credentials",
+    "CursorWriter": "writers",
+    "Event": "events",
+    "EventHandler": "events",
+    "FlatCredentials": "credentials",
+    "LoadedTemplates": "pipeline",
+    "MCPConfigGenerator": "generator",
+    "OUTPUT_WRITERS": "writers",
+    "OutputWriter": "writers",
+    "Pipeline": "pipeline",
+    "PipelineResult": "pipeline",
+    "PlaceholderSlot": "templates",
+    "PrepareResult": "prepare",
+    "PrepareScheduler": "prepare",
+    "RenderCache": "generator",
+    "StreamHandler": "events",
+    "Timings": "timings",
+    "VSCodeWriter": "writers",
+    "compile_template": "templates",
+    "json_line": "events",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> object:
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_EXPORTS])
@@ -0,0 +1,85 @@
+"""Rendering one template for many workspaces."""
+
+import json
+import time
+import typing as tp
+from dataclasses import dataclass
+from pathlib import Path
+
+from .credentials import CredentialIndex
+from .events import EventHandler
+from .generator import MCPConfigGenerator
+from .pipeline import Pipeline
+from .templates import CompiledTemplate
+
+
+@dataclass
+class BatchResult:
+    """Outcome of rendering one batch target."""
+
+    credentials_dir: str
+    output_path: str
+    seconds: float
+    error: str | None = None
+
+
+def load_batch_targets(path: str) -> list[tuple[str, str]]:
+    """Read batch targets from a JSON file.
+
+    The file holds a list of objects with ``credentials_dir`` and
+    ``output_path`` keys.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON in batch file {path}: {e}")
+
+    if not isinstance(entries, list):
+        raise ValueError(f"Batch file {path} must contain a JSON list")
+    targets = []
+    for i, entry in enumerate(entries, 1):
+        required = {"credentials_dir", "output_path"}
+        if not isinstance(entry, dict) or not required <= entry.keys():
+            raise ValueError(
+                f"Batch target {i} in {path} needs 'credentials_dir' and 'output_path'")
+        targets.append((entry["credentials_dir"], entry["output_path"]))
+    return targets
+
+
+def generate_batch(template_path: str | Path,
+                   targets: tp.Iterable[tuple[str, str]],
+                   compose_with: tp.Sequence[str | Path] = (),
+                   compiled: CompiledTemplate | None = None,
+                   on_event: EventHandler | None = None) -> list[BatchResult]:
+    """Render one template for many (credentials_dir, output_path) targets.
+
+    The template is loaded and validated once, unless ``compiled`` is
+    given; each target then runs the resolve, render and write stages of
+    the pipeline. Credential files are shared between targets whose
+    credential directories overlap. A failing target is recorded in its
+    result and does not stop the others.
+    """
+    credential_index = CredentialIndex()
+    if compiled is None:
+        loader = Pipeline(MCPConfigGenerator(str(template_path)))
+        loader.generator.compose_with = [Path(path) for path in compose_with]
+        compiled = loader.validate(loader.load())
+
+    results = []
+    for credentials_dir, output_path in targets:
+        start = time.perf_counter()
+        generator = MCPConfigGenerator(str(template_path), credentials_dir,
+                                       output_path, credential_index)
+        generator.compose_with = [Path(path) for path in compose_with]
+        generator.on_event = on_event
+        pipeline = Pipeline(generator)
+        error = None
+        try:
+            generator.output_path.parent.mkdir(parents=True, exist_ok=True)
+            pipeline.write(pipeline.render(compiled, pipeline.resolve(compiled)))
+        except (OSError, ValueError) as e:
+            error = str(e)
+        results.append(BatchResult(credentials_dir, output_path,
+                                   time.perf_counter() - start, error))
+    return results
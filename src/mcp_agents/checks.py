@@ -0,0 +1,234 @@
+"""Validating packs without writing an output."""
+
+import hashlib
+import json
+import os
+import time
+import typing as tp
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .common import CACHE_DIR, cache_key, file_digest
+from .generator import MCPConfigGenerator
+
+
+@dataclass
+class CheckResult:
+    """Outcome of validating one pack."""
+
+    name: str
+    path: str
+    errors: list[str] = field(default_factory=list)
+    placeholders: dict[str, list[str]] = field(default_factory=dict)
+    timings: dict[str, float] = field(default_factory=dict)
+    # Files the result depends on besides credential files
+    sources: list[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    @property
+    def seconds(self) -> float:
+        return sum(self.timings.values())
+
+
+def check_pack(config: dict[str, str], fixtures_dir: str | None = None) -> CheckResult:
+    """Validate one pack without writing an output; usable in a worker process.
+
+    Runs the load and validate stages of the pipeline, reporting the
+    template's structure errors and placeholders. With ``fixtures_dir`` the
+    resolve and render stages also run against the credential files in that
+    directory. Like a render, the check keeps the compiled template cache
+    current; it does not need a writable output directory, and the cache is
+    skipped where it cannot be written.
+    """
+    # Imported here: --check-changed without affected packs needs no pipeline
+    from .pipeline import Pipeline
+
+    result = CheckResult(config["name"], config["path"])
+    result.sources = [config["path"]]
+    if "prepare_script" in config:
+        result.sources.append(config["prepare_script"])
+    generator = MCPConfigGenerator(credentials_dir=fixtures_dir or "credentials")
+    pipeline = Pipeline(generator)
+    pipeline.select([config])
+
+    def phase(name: str, func: tp.Callable[[], tp.Any]) -> tp.Any:
+        start = time.perf_counter()
+        try:
+            return func()
+        except (OSError, ValueError) as e:
+            result.errors.append(f"{name}: {e}")
+            return None
+        finally:
+            result.timings[name] = time.perf_counter() - start
+
+    loaded = phase("parse", pipeline.load)
+    result.sources.extend(str(p) for p in generator.template_sources
+                          if str(p) not in result.sources)
+    if loaded is None:
+        return result
+    # Every structure error is reported, not only the first; a cached
+    # compiled template was valid when it was cached
+    errors = phase("structure",
+                   lambda: [error for _, template in loaded.templates
+                            for error in generator.validate_template(template)])
+    if errors:
+        result.errors.extend(f"structure: {error}" for error in errors)
+        return result
+    compiled = phase("placeholders", lambda: pipeline.validate(loaded))
+    if compiled is None:
+        return result
+    result.placeholders = {name: sorted(server.placeholders)
+                           for name, server in compiled.servers.items()
+                           if server.placeholders}
+    if fixtures_dir is not None:
+        phase("credentials",
+              lambda: pipeline.render(compiled,
+                                      pipeline.resolve(compiled, write=False)))
+    return result
+
+
+def check_packs(configurations: list[dict[str, str]], fixtures_dir: str | None = None,
+                jobs: int | None = None) -> list[CheckResult]:
+    """Validate several packs, fanned out over a process pool."""
+    jobs = jobs or os.cpu_count() or 1
+    if jobs > 1 and len(configurations) > 1:
+        # Imported here: the process pool machinery costs ~10 ms to import,
+        # which matters for --check-changed in pre-commit hooks
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            return list(executor.map(check_pack, configurations,
+                                     [fixtures_dir] * len(configurations)))
+    return [check_pack(config, fixtures_dir) for config in configurations]
+
+
+def git_changed_paths(since: str | None = None) -> set[Path]:
+    """Paths changed according to git, relative to the working directory.
+
+    Without ``since`` these are the staged changes, as seen by a pre-commit
+    hook; otherwise the changes between ``since`` and the working tree.
+    """
+    import subprocess
+
+    command = ["git", "diff", "--name-only", "--relative", "--no-renames"]
+    command.append(since if since else "--cached")
+    result = subprocess.run(command, capture_output=True, text=True, encoding='utf-8')
+    if result.returncode:
+        raise ValueError(f"git diff failed: {result.stderr.strip()}")
+    return {Path(line) for line in result.stdout.splitlines() if line}
+
+
+class ValidationCache:
+    """Per-pack check results keyed by a hash of everything they depend on."""
+
+    def __init__(self, path: Path = CACHE_DIR / "validation.json"):
+        self.path = path
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries: dict[str, dict[str, tp.Any]] = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+
+    @staticmethod
+    def key(sources: tp.Iterable[str], credential_files: tp.Iterable[Path],
+            fixtures_dir: str | None) -> str:
+        digest = hashlib.sha256(f"{cache_key()}:{fixtures_dir}".encode())
+        for source in sorted(sources):
+            digest.update(f"{source}:{file_digest(Path(source))}".encode())
+        if fixtures_dir is not None:
+            for credential_file in sorted(credential_files):
+                digest.update(
+                    f"{credential_file}:{file_digest(credential_file)}".encode())
+        return digest.hexdigest()
+
+    def key_for(self, result: CheckResult, fixtures_dir: str | None) -> str:
+        credential_files = [Path(fixtures_dir or "credentials") / f"{server}.json"
+                            for server in result.placeholders]
+        return self.key(result.sources, credential_files, fixtures_dir)
+
+    def get(self, name: str, fixtures_dir: str | None) -> CheckResult | None:
+        entry = self.entries.get(name)
+        if not entry:
+            return None
+        result = CheckResult(**entry["result"])
+        if entry["key"] != self.key_for(result, fixtures_dir):
+            return None
+        return result
+
+    def put(self, result: CheckResult, fixtures_dir: str | None) -> None:
+        self.entries[result.name] = {
+            "key": self.key_for(result, fixtures_dir), "result": vars(result)}
+
+    def save(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f)
+        except OSError:
+            pass
+
+
+def packs_affected_by(changed: set[Path], configurations: list[dict[str, str]],
+                      cache: ValidationCache, credential_dirs: tp.Iterable[str]
+                      ) -> list[dict[str, str]]:
+    """Map changed paths to the packs whose validation they can affect.
+
+    A pack is affected by changes to its own directory, to any other file
+    its last result depended on, or to the credential file of a server that
+    uses placeholders. Packs without a cached result are always affected.
+    A change to the generator itself affects every pack.
+    """
+    package_dir = Path(__file__).resolve().parent
+    if any(path.name == "generate_mcp_config.py"
+           or path.resolve().is_relative_to(package_dir) for path in changed):
+        return list(configurations)
+    changed_names = {path.as_posix() for path in changed}
+    credential_dir_names = {Path(d).as_posix() for d in credential_dirs}
+
+    affected = []
+    for config in configurations:
+        entry = cache.entries.get(config["name"])
+        pack_dir = Path(config["path"]).parent.as_posix() + "/"
+        if entry is None or any(name.startswith(pack_dir) for name in changed_names):
+            affected.append(config)
+            continue
+        result = entry["result"]
+        watched = {Path(source).as_posix() for source in result["sources"]}
+        watched.update(f"{directory}/{server}.json"
+                       for directory in credential_dir_names
+                       for server in result["placeholders"])
+        if changed_names & watched:
+            affected.append(config)
+    return affected
+
+
+def check_changed(configurations: list[dict[str, str]], since: str | None = None,
+                  fixtures_dir: str | None = None, jobs: int | None = None
+                  ) -> list[CheckResult]:
+    """Validate only the packs affected by the changes git reports.
+
+    Results are cached per pack; a pack whose inputs hash to a cached key
+    is not validated again.
+    """
+    cache = ValidationCache()
+    credential_dirs = ["credentials"] + ([fixtures_dir] if fixtures_dir else [])
+    affected = packs_affected_by(git_changed_paths(since), configurations,
+                                 cache, credential_dirs)
+
+    results: dict[str, CheckResult] = {}
+    to_check = []
+    for config in affected:
+        cached = cache.get(config["name"], fixtures_dir)
+        if cached is not None:
+            results[config["name"]] = cached
+        else:
+            to_check.append(config)
+
+    for result in check_packs(to_check, fixtures_dir, jobs):
+        results[result.name] = result
+        cache.put(result, fixtures_dir)
+    if to_check:
+        cache.save()
+    return [results[config["name"]] for config in affected]
@@ -0,0 +1,627 @@
+"""Command line interface of the MCP configuration generator."""
+
+import argparse
+import json
+import sys
+import time
+import typing as tp
+from pathlib import Path
+
+from .common import CACHE_DIR, GENERATOR_VERSION
+from .events import DEBUG, LEVELS, BufferedHandler, Event, StreamHandler, json_line
+from .timings import Timings, timed
+from .writers import OUTPUT_WRITERS, parse_target
+
+# The render, batch and watch machinery is imported by run() when it is
+# needed, so that --check-changed in a pre-commit hook stays fast
+if tp.TYPE_CHECKING:
+    import cProfile
+
+    from .batch import BatchResult
+    from .checks import CheckResult
+    from .generator import MCPConfigGenerator
+    from .memory import MemoryProfile
+    from .packs import PackResult
+    from .prepare import PrepareResult
+
+
+_PREPARE_MODES = {
+    "steps": "Running preparation steps",
+    "in process": "Running preparation script in process",
+    "subprocess": "Running preparation script",
+}
+_CHANGE_ICONS = {"added": "➕", "changed": "🔄", "unchanged": "✓", "removed": "➖"}
+_STEP_ICONS = {"up to date": "✓", "ran": "✅"}
+_MAX_LISTED_SERVERS = 50
+
+
+def format_prepare_result(result: "PrepareResult") -> str:
+    """Describe the outcome of a prepare run."""
+    if result.seconds < 0.001:
+        duration = f"{result.seconds * 1e6:.0f} µs"
+    else:
+        duration = f"{result.seconds * 1000:.0f} ms"
+    if result.in_process:
+        duration += ", in process"
+    if result.ok:
+        return f"✅ Preparation script {result.script} finished in {duration}."
+    return (f"❌ Error running preparation script {result.script}: "
+            f"{result.error} ({duration})")
+
+
+def format_event(event: Event) -> str | None:
+    """The console text of a library event, or None if it is not shown."""
+    f = event.fields
+    kind = event.kind
+    if kind == "packs.missing":
+        return f"⚠️  MCP agent packs directory not found: {f['path']}"
+    if kind == "template.loaded":
+        cached = " (cached)" if f["cached"] else ""
+        return f"✓ Loaded template from {f['path']}{cached}"
+    if kind == "generation.started":
+        return "\n🚀 Starting MCP configuration generation..."
+    if kind == "server.started":
+        return f"\n📋 Processing server: {f['server']}"
+    if kind == "server.no_placeholders":
+        return f"  ℹ️  No placeholders found for {f['server']}"
+    if kind == "server.placeholders":
+        placeholders = ', '.join(f'%%{p}%%' for p in f["placeholders"])
+        return f"  🔍 Found placeholders: {placeholders}"
+    if kind == "credentials.loaded":
+        return f"✓ Loaded credentials for {f['server']}"
+    if kind == "server.unused_credentials":
+        return f"  ⚠️  Unused credentials in {f['server']}: {', '.join(f['keys'])}"
+    if kind == "server.rendered":
+        return f"  ✅ Successfully processed {f['placeholders']} placeholders"
+    if kind == "output.unchanged":
+        return f"\n✅ Configuration unchanged: {f['path']}"
+    if kind == "output.saved":
+        changes = f["changes"]
+        # Large configurations list only what changed
+        shown = {name: change for name, change in changes.items()
+                 if len(changes) <= _MAX_LISTED_SERVERS or change != "unchanged"}
+        lines = ["\n📋 Server changes:"]
+        lines.extend(f"  {_CHANGE_ICONS[change]} {name}: {change}"
+                     for name, change in shown.items())
+        if len(shown) < len(changes):
+            lines.append(f"  {_CHANGE_ICONS['unchanged']} "
+                         f"{len(changes) - len(shown)} other servers: unchanged")
+        lines.append(f"\n✅ Configuration saved to {f['path']}")
+        return "\n".join(lines)
+    if kind == "prepare.started":
+        return f"  [{f['pack']}] 🔧 {_PREPARE_MODES[f['mode']]}: {f['script']}"
+    if kind == "prepare.output":
+        return f"  [{f['pack']}] {f['line']}"
+    if kind == "prepare.step_output":
+        return f"  [{f['pack']}]     {f['line']}"
+    if kind == "prepare.step":
+        if f["status"] == "ran":
+            return (f"  [{f['pack']}] ✅ {f['step']}: "
+                    f"done in {f['seconds'] * 1000:.1f} ms")
+        if f["status"] == "up to date":
+            return f"  [{f['pack']}] ✓ {f['step']}: up to date"
+        return f"  [{f['pack']}] ❌ {f['step']}: {f['error']}"
+    if kind == "prepare.finished":
+        return format_prepare_result(f["result"])
+    if kind == "watch.waiting":
+        return (f"\n👀 Watching {f['files']} file(s) ({f['backend']}), "
+                f"press Ctrl+C to stop...")
+    if kind == "watch.changed":
+        return f"\n🔄 Change detected: {', '.join(f['paths'])}"
+    if kind == "watch.error":
+        return f"❌ Error: {f['error']}"
+    return None
+
+
+def event_handler(args: argparse.Namespace) -> StreamHandler | BufferedHandler:
+    """The handler for the requested log level, format and quiet mode."""
+    level = DEBUG if args.verbose else LEVELS[args.log_level]
+    render = json_line if args.log_format == "jsonl" else format_event
+    # With --json, stdout carries only the result summary
+    handler = StreamHandler(render, to_stderr=args.json, level=level)
+    return BufferedHandler(handler) if args.quiet else handler
+
+
+def select_configuration(generator: "MCPConfigGenerator") -> dict[str, str]:
+    """Let user select an MCP configuration."""
+    print("🔍 Discovering available MCP configurations...")
+    print()
+
+    configurations = generator.discover_mcp_configurations()
+
+    if not configurations:
+        print("❌ No MCP configurations found!")
+        print(f"Please ensure mcp_template.json files exist in subdirectories of "
+              f"{generator.mcp_agent_packs_dir}")
+        raise FileNotFoundError("No MCP configurations available")
+
+    print(f"Found {len(configurations)} MCP configuration(s):")
+    print()
+
+    # Display available configurations
+    for i, config in enumerate(configurations, 1):
+        print(f"  {i}. {config['name']}")
+        print(f"     📄 {generator.describe_configuration(config)}")
+        print()
+
+    # Get user selection
+    while True:
+        try:
+            choice = input(f"Select configuration (1-{len(configurations)}): ").strip()
+
+            if not choice:
+                print("❌ Please enter a number!")
+                continue
+
+            choice_num = int(choice)
+            if 1 <= choice_num <= len(configurations):
+                selected_config = configurations[choice_num - 1]
+                print(f"✓ Selected: {selected_config['name']}")
+                return selected_config
+            else:
+                print(f"❌ Invalid selection! Please enter a number between 1 and "
+                      f"{len(configurations)}")
+        except ValueError:
+            print("❌ Please enter a valid number!")
+        except KeyboardInterrupt:
+            print("\n❌ Operation cancelled by user")
+            raise
+
+
+def print_success(outputs: list[Path]) -> None:
+    print("\n🎉 MCP configuration generated successfully!")
+    for path in outputs:
+        print(f"📄 Output file: {path}")
+    print("\n💡 Remember to:")
+    print("   - Add mcp.json to .gitignore")
+    print("   - Keep credentials/ folder secure")
+    print("   - Only commit mcp_template.json to version control")
+
+
+def print_batch_report(results: "list[BatchResult]", total_seconds: float) -> None:
+    """Print per-target timings and overall throughput."""
+    print("\n📊 Batch summary:")
+    for result in results:
+        status = "✅" if result.error is None else "❌"
+        print(f"  {status} {result.output_path} "
+              f"({result.credentials_dir}) {result.seconds * 1000:.1f} ms")
+        if result.error:
+            print(f"     {result.error}")
+    failed = sum(1 for r in results if r.error)
+    per_target = total_seconds / len(results) * 1000 if results else 0.0
+    print(f"\n  {len(results) - failed}/{len(results)} targets in "
+          f"{total_seconds:.3f} s ({per_target:.1f} ms per target)")
+
+
+def report_timings(timings: Timings, path: str, to_stderr: bool = False) -> None:
+    """Print the phase and server timings as a table, or write them as JSON."""
+    stream = sys.stderr if to_stderr else sys.stdout
+    if path:
+        data = {"generator_version": GENERATOR_VERSION, **timings.to_dict()}
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        print(f"\n⏱️  Timings written to {path}", file=stream)
+        return
+    total = timings.elapsed
+    lines = ["\n⏱️  Timings:"]
+    lines.extend(f"  {name:<18} {seconds * 1000:9.1f} ms {seconds / total:6.1%}"
+                 for name, seconds in timings.phases.items())
+    lines.append(f"  {'total':<18} {total * 1000:9.1f} ms")
+    if timings.prepare_scripts:
+        lines.append("\n  Prepare scripts (in the background):")
+        lines.extend(f"  {name:<18} {seconds * 1000:9.1f} ms"
+                     for name, seconds in timings.prepare_scripts.items())
+    slowest = timings.slowest_servers()
+    if slowest:
+        lines.append(f"\n  Slowest of {len(timings.servers)} server(s):")
+        for name, seconds in slowest:
+            phases = ", ".join(
+                f"{phase} {phase_seconds * 1000:.2f}"
+                for phase, phase_seconds in timings.servers[name].items())
+            lines.append(f"  {name:<18} {seconds * 1000:9.2f} ms ({phases})")
+    print("\n".join(lines), file=stream)
+
+
+def report_memory(profile: "MemoryProfile", path: str, to_stderr: bool = False) -> None:
+    """Print the memory use of each phase as a table, or write it as JSON."""
+    stream = sys.stderr if to_stderr else sys.stdout
+    if path:
+        data = {"generator_version": GENERATOR_VERSION, **profile.to_dict()}
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        print(f"\n🧠 Memory profile written to {path}", file=stream)
+        return
+    lines = ["\n🧠 Memory by phase:",
+             f"  {'phase':<18} {'peak':>10} {'retained':>11}"]
+    lines.extend(f"  {name:<18} {_size(memory.peak):>10} "
+                 f"{_size(memory.retained, '+'):>11}"
+                 for name, memory in profile.memory.items())
+    lines.append(f"\n  Peak traced: {_size(profile.peak)}")
+    peak_rss = profile.peak_rss()
+    if peak_rss is not None:
+        lines.append(f"  Peak RSS:    {_size(peak_rss)} (includes tracing overhead)")
+    for name, memory in profile.memory.items():
+        if memory.top_lines:
+            lines.append(f"\n  Top allocations kept by {name}:")
+            # The package or library directory is enough to place a file
+            lines.extend(f"  {_size(size, '+'):>11} {count:>8} blocks  "
+                         f"{'/'.join(Path(line).parts[-2:])}"
+                         for line, size, count in memory.top_lines)
+    print("\n".join(lines), file=stream)
+
+
+def _size(size: int, sign: str = "") -> str:
+    if abs(size) < 2**10:
+        return f"{size:{sign}d} B"
+    if abs(size) < 2**20:
+        return f"{size / 2**10:{sign}.1f} KiB"
+    return f"{size / 2**20:{sign}.1f} MiB"
+
+
+def report_profile(profile: "cProfile.Profile", prefix: str, to_stderr: bool = False,
+                   count: int = 15) -> None:
+    """Write the profile files and print the top functions by cumulative time."""
+    import pstats
+
+    from .profiling import hotspots, write_profile
+
+    pstats_path, collapsed_path = write_profile(profile, prefix)
+    lines = [f"\n🔬 Profile written to {pstats_path} and {collapsed_path}",
+             f"\n  Top {count} functions by cumulative time:",
+             f"  {'cumulative':>11} {'own':>10} {'calls':>9}  function"]
+    lines.extend(f"  {total * 1000:8.1f} ms {own * 1000:7.1f} ms {calls:9}  {name}"
+                 for name, calls, own, total in hotspots(pstats.Stats(profile), count))
+    print("\n".join(lines), file=sys.stderr if to_stderr else sys.stdout)
+
+
+def print_check_report(results: "list[CheckResult]", total_seconds: float,
+                       as_json: bool = False) -> None:
+    """Print one aggregated report for validated packs."""
+    if as_json:
+        print(json.dumps({
+            "ok": all(r.ok for r in results),
+            "seconds": total_seconds,
+            "packs": [{**vars(r), "ok": r.ok} for r in results],
+        }, indent=2))
+        return
+    print("🔎 Pack validation:")
+    for result in results:
+        status = "✅" if result.ok else "❌"
+        count = sum(len(p) for p in result.placeholders.values())
+        phases = ", ".join(f"{name} {seconds * 1000:.1f}"
+                           for name, seconds in result.timings.items())
+        print(f"  {status} {result.name}: {count} placeholder(s), "
+              f"{result.seconds * 1000:.1f} ms ({phases})")
+        for error in result.errors:
+            print(f"     - {error}")
+    failed = sum(1 for r in results if not r.ok)
+    print(f"\n  {len(results) - failed}/{len(results)} packs valid in "
+          f"{total_seconds:.3f} s")
+
+
+def print_pack_results(results: "list[PackResult]", as_json: bool = False) -> None:
+    """Print the outcome of rendering several packs."""
+    if as_json:
+        print(json.dumps([vars(r) for r in results], indent=2))
+        return
+    icons = {"written": "✅", "unchanged": "✓", "up to date": "✓", "failed": "❌"}
+    print("\n📊 Summary:")
+    for result in results:
+        print(f"  {icons[result.status]} {result.name} → {result.output_path}: "
+              f"{result.status} ({result.seconds * 1000:.1f} ms)")
+        if result.error:
+            print(f"     {result.error}")
+
+
+def list_configurations(generator: "MCPConfigGenerator", as_json: bool = False) -> None:
+    """Print the discovered packs with their descriptions."""
+    configurations = generator.discover_mcp_configurations()
+    for config in configurations:
+        generator.describe_configuration(config)
+    if as_json:
+        print(json.dumps(configurations, indent=2, ensure_ascii=False))
+        return
+    for config in configurations:
+        print(f"{config['name']}: {config['description']}")
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Generate mcp.json from an MCP agent pack template. "
+                    "Without --pack or --all the pack is selected interactively.")
+    selection = parser.add_mutually_exclusive_group()
+    selection.add_argument(
+        "--pack", action="append", default=[], metavar="NAME",
+        help="pack to render; may be a glob pattern and may be repeated")
+    selection.add_argument(
+        "--all", action="store_true", help="render every pack")
+    selection.add_argument(
+        "--list", action="store_true", help="list the available packs and exit")
+    selection.add_argument(
+        "--check-all", action="store_true",
+        help="validate every pack in parallel and exit; writes no output, "
+             "only the local caches")
+    selection.add_argument(
+        "--check-changed", nargs="?", const="", metavar="REF",
+        help="validate only the packs affected by the changes git reports: the "
+             "staged changes, or the changes since REF; for pre-commit hooks")
+    parser.add_argument(
+        "--fixtures", metavar="DIR",
+        help="with --check-all or --check-changed, also resolve placeholders "
+             "against the credential files in DIR")
+    parser.add_argument(
+        "--json", action="store_true",
+        help="print machine-readable JSON (with --list, or a result summary)")
+    parser.add_argument(
+        "--log-level", choices=list(LEVELS), default="info",
+        help="report progress at or above this level (default: %(default)s)")
+    parser.add_argument(
+        "-v", "--verbose", action="store_true",
+        help="report progress for every server and prepare step; --log-level debug")
+    parser.add_argument(
+        "-q", "--quiet", action="store_true",
+        help="hold progress back and report it only if the run fails")
+    parser.add_argument(
+        "--log-format", choices=["text", "jsonl"], default="text",
+        help="report progress as text or as JSON lines (default: %(default)s)")
+    parser.add_argument(
+        "--timings", nargs="?", const="", metavar="JSON",
+        help="report how long each phase and server took: as a table, or "
+             "written to the JSON file given")
+    parser.add_argument(
+        "--memory-profile", nargs="?", const="", metavar="JSON",
+        help="trace allocations with tracemalloc and report the peak and "
+             "retained memory and top allocating lines of each phase: as a "
+             "table, or written to the JSON file given")
+    parser.add_argument(
+        "--profile", nargs="?", const=str(CACHE_DIR / "profile" / "generate"),
+        metavar="PREFIX",
+        help="run under cProfile, write PREFIX.pstats and PREFIX.collapsed "
+             "(for flame graphs) and print the hotspots "
+             "(default: %(const)s); worker processes are not profiled")
+    parser.add_argument(
+        "--compose", action="store_true",
+        help="combine the selected packs into one output instead of one "
+             "output per pack")
+    parser.add_argument(
+        "--output", default=".vscode/mcp.json", metavar="PATH",
+        help="output file; '{pack}' is replaced by the pack name "
+             "(default: %(default)s, or mcp.{pack}.json for several packs)")
+    parser.add_argument(
+        "--target", action="append", default=[], metavar="NAME[=PATH]",
+        help=f"client format to write, one of {', '.join(OUTPUT_WRITERS)}; may be "
+             "repeated to write all formats from one render (vscode defaults to "
+             "--output, the others to the client's usual location)")
+    parser.add_argument(
+        "--credentials-dir", default="credentials", metavar="DIR",
+        help="directory with the credential files (default: %(default)s)")
+    parser.add_argument(
+        "--jobs", type=int, metavar="N",
+        help="worker processes used when several packs are rendered (default: 1) "
+             "or validated (default: number of CPUs)")
+    parser.add_argument(
+        "--batch", metavar="TARGETS_JSON",
+        help="render the selected pack for every (credentials_dir, output_path) "
+             "target listed in this JSON file")
+    parser.add_argument(
+        "--force", action="store_true",
+        help="regenerate even if the manifest shows that nothing has changed")
+    parser.add_argument(
+        "--prepare-timeout", type=float, default=120.0, metavar="SECONDS",
+        help="abort a pack's prepare.py after this many seconds "
+             "(default: %(default)s)")
+    parser.add_argument(
+        "--fsync", action="store_true",
+        help="fsync the output file and its directory after writing")
+    parser.add_argument(
+        "--watch", action="store_true",
+        help="stay resident and regenerate when the template, prepare.py or "
+             "a consumed credential file changes")
+    parser.add_argument(
+        "--debounce", type=float, default=0.3, metavar="SECONDS",
+        help="quiet period that coalesces bursts of changes in --watch mode "
+             "(default: %(default)s)")
+    args = parser.parse_args(argv)
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.quiet and args.watch:
+        parser.error("--quiet cannot be combined with --watch")
+    # Banners and hints are for people; JSON output and quiet runs go without
+    args.console = not (args.json or args.quiet or args.log_format == "jsonl")
+    return args
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Main entry point."""
+    args = parse_args(argv)
+    if args.profile is None:
+        return _main(args)
+
+    # Imported here so that runs without --profile do not load the profiler
+    from .profiling import profile_call
+    exit_code, profile = profile_call(lambda: _main(args))
+    report_profile(profile, args.profile, args.json)
+    return exit_code
+
+
+def _main(args: argparse.Namespace) -> int:
+    if args.console:
+        print("🔧 MCP Configuration Generator")
+        print("=" * 35)
+        print()
+
+    printer = event_handler(args)
+    timings: Timings | None = None
+    memory = None
+    if args.memory_profile is not None:
+        # Imported here so that other runs do not load tracemalloc; the
+        # memory profile also takes the timings
+        from .memory import MemoryProfile
+        timings = memory = MemoryProfile()
+    elif args.timings is not None:
+        timings = Timings()
+    # A quiet run reports the progress it held back if it fails
+    flush = printer.flush if isinstance(printer, BufferedHandler) else lambda: None
+    try:
+        exit_code = run(args, printer, timings)
+    except (FileNotFoundError, ValueError) as e:
+        flush()
+        print(f"❌ Error: {e}")
+        print()
+        print("💡 Make sure you have:")
+        print("   - MCP template files in mcp_agent_packs subdirectories")
+        print("   - Corresponding credential files in the credentials folder")
+        return 1
+    except KeyboardInterrupt:
+        print("\n❌ Operation cancelled by user")
+        return 1
+    except Exception as e:
+        flush()
+        print(f"❌ Unexpected error: {e}")
+        return 1
+    finally:
+        if timings is not None and args.timings is not None:
+            report_timings(timings, args.timings, args.json)
+        if memory is not None:
+            memory.stop()
+            report_memory(memory, args.memory_profile, args.json)
+    if exit_code:
+        flush()
+    return exit_code
+
+
+def run(args: argparse.Namespace, printer: StreamHandler | BufferedHandler,
+        timings: Timings | None = None) -> int:
+    """Run the command line ``args``, reporting progress to ``printer``."""
+    from .generator import MCPConfigGenerator
+
+    # Create generator with the requested paths
+    generator = MCPConfigGenerator(
+        credentials_dir=args.credentials_dir,
+        output_path=args.output
+    )
+    generator.on_event = printer
+    generator.timings = timings
+
+    if args.list:
+        list_configurations(generator, args.json)
+        return 0
+
+    if args.check_all:
+        from .checks import ValidationCache, check_packs
+
+        start = time.perf_counter()
+        check_results = check_packs(generator.discover_mcp_configurations(),
+                                    args.fixtures, args.jobs)
+        # Seed the cache used by --check-changed
+        cache = ValidationCache()
+        for check_result in check_results:
+            cache.put(check_result, args.fixtures)
+        cache.save()
+        print_check_report(check_results, time.perf_counter() - start, args.json)
+        return 0 if all(r.ok for r in check_results) else 1
+
+    if args.check_changed is not None:
+        from .checks import check_changed
+
+        start = time.perf_counter()
+        check_results = check_changed(generator.discover_mcp_configurations(),
+                                      args.check_changed or None, args.fixtures,
+                                      args.jobs)
+        print_check_report(check_results, time.perf_counter() - start, args.json)
+        return 0 if all(r.ok for r in check_results) else 1
+
+    from .batch import generate_batch, load_batch_targets
+    from .generator import RenderCache
+    from .packs import generate_packs, output_path_for
+    from .pipeline import Pipeline
+    from .watch import watch
+
+    requested_targets = [parse_target(spec) for spec in args.target]
+    pipeline = Pipeline(generator, args.prepare_timeout)
+
+    if args.pack or args.all:
+        selected = pipeline.discover(args.pack, args.all)
+        if not selected:
+            raise FileNotFoundError("No MCP configurations available")
+    else:
+        # Let user select configuration
+        selected = [select_configuration(generator)]
+
+    if not args.compose and (len(selected) > 1 or args.json):
+        if args.batch or args.watch or requested_targets or timings:
+            raise ValueError("--batch, --watch, --target, --timings and "
+                             "--memory-profile need exactly one pack")
+        pack_results = generate_packs(
+            selected, args.output, args.credentials_dir, args.force, args.jobs,
+            args.prepare_timeout, args.fsync, on_event=printer)
+        print_pack_results(pack_results, args.json)
+        return 1 if any(r.status == "failed" for r in pack_results) else 0
+
+    generator.fsync = args.fsync
+
+    # Update template and output path
+    pipeline.select(selected)
+    generator.output_path = Path(output_path_for(
+        args.output, "+".join(config["name"] for config in selected), several=False))
+    if requested_targets and args.batch:
+        raise ValueError("--target cannot be combined with --batch")
+    # vscode writes to --output unless given a path of its own
+    targets = [(writer, path or (generator.output_path if writer.name == "vscode"
+                                 else writer.default_path()))
+               for writer, path in requested_targets]
+    outputs = [generator.for_target(*target) for target in targets] or [generator]
+    # Skip the run if the outputs are current or can be restored from cache
+    with timed(timings, "up-to-date check"):
+        # Targets may merge into existing client files, so only the plain
+        # output is cached
+        render_cache = None if args.batch or targets else RenderCache()
+        if args.batch or args.force:
+            current = False
+        elif all(output.is_up_to_date() for output in outputs):
+            if args.console:
+                for output in outputs:
+                    print(f"\n✅ {output.output_path} is up to date, nothing to do.")
+            current = True
+        elif render_cache and render_cache.restore(generator):
+            render_cache.save()
+            if args.console:
+                print(f"\n✅ Restored {generator.output_path} from the render cache.")
+            current = True
+        else:
+            current = False
+    if current:
+        if args.watch:
+            generator.compile()
+            watch(generator, args.debounce, args.prepare_timeout, targets)
+        return 0
+
+    # The prepare.py scripts run in the background while the template is
+    # loaded and credentials are read
+    pipeline_result = pipeline.run(selected, targets, write=not args.batch)
+    if not pipeline_result.ok:
+        return 1
+
+    if args.batch:
+        batch_targets = load_batch_targets(args.batch)
+        start = time.perf_counter()
+        with timed(timings, "batch"):
+            batch_results = generate_batch(generator.template_path, batch_targets,
+                                           generator.compose_with,
+                                           pipeline_result.compiled, printer)
+        print_batch_report(batch_results, time.perf_counter() - start)
+        return 1 if any(r.error for r in batch_results) else 0
+
+    if args.console:
+        print_success([path for _, path in targets] or [generator.output_path])
+    if render_cache:
+        render_cache.store(generator)
+        render_cache.save()
+
+    if args.watch:
+        watch(generator, args.debounce, args.prepare_timeout, targets)
+
+    return 0
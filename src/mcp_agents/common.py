@@ -0,0 +1,91 @@
+"""Version, cache location and file hashing shared by the generator modules."""
+
+import functools
+import hashlib
+import typing as tp
+from pathlib import Path
+
+
+GENERATOR_VERSION = "0.1.0"
+
+# Local state of the generator (prepare stamps, caches); not version controlled
+CACHE_DIR = Path(".mcp_cache")
+
+
+@functools.cache
+def cache_key() -> str:
+    """Key of the cached state: a hash of the generator's own sources.
+
+    Manifests, the render cache, the discovery index, the validation cache
+    and the pickled compiled templates are valid only for the code that
+    wrote them, so any change to the package invalidates them, just as
+    ``--check-changed`` takes it for a change to every pack.
+    """
+    digest = hashlib.sha256(GENERATOR_VERSION.encode())
+    for path in sorted(Path(__file__).resolve().parent.glob("*.py")):
+        with open(path, 'rb') as f:
+            source_digest = hashlib.sha256(f.read()).hexdigest()
+        digest.update(f"{path.name}:{source_digest}".encode())
+    return digest.hexdigest()[:16]
+
+
+def file_digest(path: Path) -> str | None:
+    """SHA-256 of a file's contents, or None if it does not exist."""
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def stat_signature(paths: tp.Iterable[Path]) -> tuple[tuple[int, int] | None, ...]:
+    """(mtime, size) of each path, None for missing files."""
+    signature: list[tuple[int, int] | None] = []
+    for path in paths:
+        try:
+            stat = path.stat()
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+class DigestIndex:
+    """SHA-256 digests of files, hashed again only after their stat changes.
+
+    One index is shared by the stages of a run, so the up-to-date check,
+    template loading, the compiled cache and the manifest hash each file
+    once.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[Path, tuple[tuple[int, int] | None, str | None]] = {}
+
+    def get(self, path: Path) -> str | None:
+        """The digest of ``path``, or None if it does not exist."""
+        key = path.absolute()
+        signature = stat_signature([path])[0]
+        entry = self._entries.get(key)
+        if entry is None or signature is None or entry[0] != signature:
+            entry = (signature, file_digest(path))
+            self._entries[key] = entry
+        return entry[1]
+
+    def read(self, path: Path) -> bytes:
+        """Read a file and record the digest of the bytes read."""
+        signature = stat_signature([path])[0]
+        data = path.read_bytes()
+        self.record(path, signature, data)
+        return data
+
+    def record(self, path: Path, signature: tuple[int, int] | None, data: bytes) -> str:
+        """Record that ``path`` held ``data`` while its stat was ``signature``.
+
+        The signature must be taken before the data was read, or after it was
+        written, so that a later change of the file is noticed.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        self._entries[path.absolute()] = (signature, digest)
+        return digest
+
+
+digest_index = DigestIndex()
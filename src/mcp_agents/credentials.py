@@ -0,0 +1,97 @@
+"""Credential files, flattened and cached."""
+
+import json
+import typing as tp
+from pathlib import Path
+
+from .common import digest_index
+
+
+class FlatCredentials:
+    """A credential file flattened into path → value entries.
+
+    Paths use dotted keys and list indices (``google.accounts[0].user_email``).
+    Placeholders are looked up by the last key of a path; a key that occurs
+    several times with different values is ambiguous and is reported instead
+    of silently picking one of them.
+    """
+
+    def __init__(self, path: Path, content: tp.Any, digest: str = ""):
+        self.path = path
+        self.digest = digest
+        self.values: dict[str, str] = {}
+        self.by_key: dict[str, list[str]] = {}
+        self._flatten(content, "", None)
+
+    def _flatten(self, obj: tp.Any, prefix: str, key: str | None) -> None:
+        if isinstance(obj, dict):
+            for child_key, value in obj.items():
+                child_key = str(child_key)
+                child_path = f"{prefix}.{child_key}" if prefix else child_key
+                self._flatten(value, child_path, child_key)
+        elif isinstance(obj, list):
+            for index, item in enumerate(obj):
+                self._flatten(item, f"{prefix}[{index}]", None)
+        elif isinstance(obj, str):
+            self.values[prefix] = obj
+            if key is not None:
+                self.by_key.setdefault(key, []).append(prefix)
+
+    def ambiguous_keys(self) -> dict[str, list[str]]:
+        """Keys that occur more than once with different values."""
+        return {key: paths for key, paths in self.by_key.items()
+                if len({self.values[p] for p in paths}) > 1}
+
+    def lookup(self, key: str) -> str | None:
+        """Return the value for ``key``, or None if it does not occur."""
+        paths = self.by_key.get(key)
+        if not paths:
+            return None
+        value = self.values[paths[0]]
+        if len(paths) > 1 and any(self.values[p] != value for p in paths[1:]):
+            raise ValueError(
+                f"Ambiguous credential '{key}' in {self.path}: "
+                f"defined with different values at {', '.join(paths)}")
+        return value
+
+    def resolve(self, keys: tp.Iterable[str]) -> dict[str, str]:
+        """Look up several keys, skipping those that are not defined."""
+        credentials = {}
+        for key in keys:
+            value = self.lookup(key)
+            if value is not None:
+                credentials[key] = value
+        return credentials
+
+
+class CredentialIndex:
+    """Cache of flattened credential files.
+
+    Entries are keyed on the file path and invalidated when the file's
+    modification time or size changes, so a long-running process re-parses a
+    credential file only after it was edited.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[Path, tuple[tuple[int, int], FlatCredentials]] = {}
+
+    def get(self, path: Path) -> FlatCredentials:
+        """Return the flattened contents of ``path``."""
+        path = path.absolute()
+        stat = path.stat()
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._entries.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        data = path.read_bytes()
+        try:
+            content = json.loads(data.decode('utf-8'))
+        except json.JSONDecodeError as e:
+            raise ValueError(
+                f"Invalid JSON in credentials file {path}: {e}")
+        # Shared with the up-to-date check, which then need not read it again
+        flat = FlatCredentials(path, content,
+                               digest_index.record(path, signature, data))
+        self._entries[path] = (signature, flat)
+        return flat
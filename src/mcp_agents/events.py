@@ -0,0 +1,153 @@
+"""Progress events reported by the library instead of printing.
+
+``emit`` checks the handler's level before building an event, and handlers
+format events only when they report them, so an event below the handler's
+level costs a dictionary lookup. The console text of the CLI is one renderer;
+``json_line`` is another.
+"""
+
+import json
+import threading
+import time
+import typing as tp
+from collections import deque
+from dataclasses import dataclass, field
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+# Level of a missing handler: nothing is enabled
+SILENT = 100
+
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR}
+LEVEL_NAMES = {level: name for name, level in LEVELS.items()}
+
+# Level of each event kind; emitters raise it to ERROR for failures
+EVENT_LEVELS = {
+    # Per server and per line of prepare output: one or more per item
+    "server.started": DEBUG,
+    "server.no_placeholders": DEBUG,
+    "server.placeholders": DEBUG,
+    "server.rendered": DEBUG,
+    "credentials.loaded": DEBUG,
+    "prepare.output": DEBUG,
+    "prepare.step_output": DEBUG,
+    "packs.missing": WARNING,
+    "server.unused_credentials": WARNING,
+    "watch.error": ERROR,
+}
+
+
+@dataclass(frozen=True)
+class Event:
+    """Something the generator did, for the caller to report or ignore.
+
+    ``kind`` is a dotted name such as ``server.rendered``; ``fields`` holds
+    the details as plain values. Formatting is left to the handler.
+    """
+
+    kind: str
+    fields: dict[str, tp.Any] = field(default_factory=dict)
+    # Defaults to the level of the kind
+    level: int = 0
+    time: float = field(default_factory=time.time)
+
+    def __post_init__(self) -> None:
+        if not self.level:
+            object.__setattr__(self, "level", EVENT_LEVELS.get(self.kind, INFO))
+
+
+EventHandler = tp.Callable[[Event], None]
+
+
+def handler_level(handler: EventHandler | None) -> int:
+    """Lowest level ``handler`` reports; handlers without a ``level`` take all."""
+    if handler is None:
+        return SILENT
+    return getattr(handler, "level", DEBUG)
+
+
+def emit(handler: EventHandler | None, kind: str, level: int | None = None,
+         **fields: tp.Any) -> None:
+    """Report an event to ``handler`` at or above its level; nothing is built
+    otherwise."""
+    if level is None:
+        level = EVENT_LEVELS.get(kind, INFO)
+    if level >= handler_level(handler):
+        tp.cast(EventHandler, handler)(Event(kind, fields, level))
+
+
+def json_line(event: Event) -> str:
+    """Render an event as one line of JSON."""
+    return json.dumps({"time": event.time,
+                       "level": LEVEL_NAMES.get(event.level, event.level),
+                       "kind": event.kind, **event.fields},
+                      default=_json_default, ensure_ascii=False)
+
+
+def _json_default(value: tp.Any) -> tp.Any:
+    # Results such as PrepareResult become objects, paths strings
+    return vars(value) if hasattr(value, "__dict__") else str(value)
+
+
+# Serializes the output of events reported from several threads
+_write_lock = threading.Lock()
+
+
+class StreamHandler:
+    """Write the events at or above ``level`` to stdout, or stderr.
+
+    ``render`` turns an event into text, or None to skip it. The stream is
+    looked up when the handler is created, so output of an in-process
+    prepare() that redirects sys.stdout is not mixed in. Handlers with a
+    picklable renderer can be handed to worker processes.
+    """
+
+    def __init__(self, render: tp.Callable[[Event], str | None],
+                 to_stderr: bool = False, level: int = INFO):
+        import sys
+
+        self.render = render
+        self.to_stderr = to_stderr
+        self.level = level
+        self._stream = sys.stderr if to_stderr else sys.stdout
+
+    def __reduce__(self) -> tuple[tp.Any, ...]:
+        return StreamHandler, (self.render, self.to_stderr, self.level)
+
+    def __call__(self, event: Event) -> None:
+        if event.level < self.level:
+            return
+        text = self.render(event)
+        if text is None:
+            return
+        with _write_lock:
+            self._stream.write(text + "\n")
+            self._stream.flush()
+
+
+class BufferedHandler:
+    """Hold events back instead of reporting them, for quiet runs.
+
+    ``flush`` passes the buffered events on to ``handler``, typically after
+    a failure; only the last ``capacity`` are kept. Events buffered in a
+    worker process are not sent back.
+    """
+
+    def __init__(self, handler: EventHandler, capacity: int = 1000):
+        self.handler = handler
+        self.capacity = capacity
+        self.level = handler_level(handler)
+        self.events: deque[Event] = deque(maxlen=capacity)
+
+    def __reduce__(self) -> tuple[tp.Any, ...]:
+        return BufferedHandler, (self.handler, self.capacity)
+
+    def __call__(self, event: Event) -> None:
+        if event.level >= self.level:
+            self.events.append(event)
+
+    def flush(self) -> None:
+        while self.events:
+            self.handler(self.events.popleft())
@@ -0,0 +1,818 @@
+"""The MCP configuration generator."""
+
+import copy
+import hashlib
+import json
+import os
+import time
+import typing as tp
+from pathlib import Path
+
+from .common import CACHE_DIR, cache_key, digest_index, stat_signature
+from .credentials import CredentialIndex, FlatCredentials
+from .events import EVENT_LEVELS, INFO, Event, EventHandler, handler_level
+from .templates import (CompiledServer, CompiledTemplate, compile_template,
+                        compose_templates, load_compiled_template,
+                        save_compiled_template, template_resolver)
+from .timings import Timings
+from .writers import OutputWriter, VSCodeWriter, write_targets
+
+
+class MCPConfigGenerator:
+    """Generates MCP configuration by merging template with credentials."""
+
+    def __init__(self, template_path: str = "mcp_template.json",
+                 credentials_dir: str = "credentials",
+                 output_path: str = "mcp.json",
+                 credential_index: CredentialIndex | None = None):
+        self.template_path = Path(template_path)
+        # Further templates composed into the primary one, in order
+        self.compose_with: list[Path] = []
+        self.credentials_dir = Path(credentials_dir)
+        self.output_path = Path(output_path)
+        # May be shared between generators so that batch targets load each
+        # credential file only once.
+        self.credential_index = credential_index or CredentialIndex()
+        self.prepare_scripts: list[Path] = []
+        # Flush the output to disk before renaming it into place
+        self.fsync = False
+        # Layout of the output file for the target MCP client
+        self.writer: OutputWriter = VSCodeWriter()
+        # Credential files read by the last render, with their digests
+        self.consumed_credentials: dict[Path, str] = {}
+        # Last compiled template with the (path, mtime, size) it was read from
+        self._compiled: tuple[tuple, CompiledTemplate] | None = None
+        self.template_sources: list[Path] = []
+        # Reverse index of the last render: credential file -> servers, and
+        # the credential values each server was rendered with
+        self.dependents: dict[Path, set[str]] = {}
+        self.resolved_credentials: dict[str, dict[str, str]] = {}
+        self.last_config: dict[str, tp.Any] | None = None
+        self._last_compiled: CompiledTemplate | None = None
+        # The bytes last written to, or found unchanged in, the output
+        self.last_output: bytes | None = None
+        self.mcp_agent_packs_dir = Path("mcp_agent_packs")
+        # Receives progress events; without a handler the generator is silent
+        self.on_event = None
+        # Per-server render times are recorded here when it is set
+        self.timings: Timings | None = None
+
+    @property
+    def on_event(self) -> EventHandler | None:
+        return self._on_event
+
+    @on_event.setter
+    def on_event(self, handler: EventHandler | None) -> None:
+        self._on_event = handler
+        # Looked up once, as events are emitted several times per server
+        self._event_level = handler_level(handler)
+
+    def enabled(self, kind: str) -> bool:
+        """Whether ``on_event`` reports events of ``kind``."""
+        return EVENT_LEVELS.get(kind, INFO) >= self._event_level
+
+    def emit(self, kind: str, level: int | None = None, **fields: tp.Any) -> None:
+        """Report an event to ``on_event``; nothing is built below its level."""
+        if level is None:
+            level = EVENT_LEVELS.get(kind, INFO)
+        if level >= self._event_level:
+            tp.cast(EventHandler, self._on_event)(Event(kind, fields, level))
+
+    def discover_mcp_configurations(self) -> list[dict[str, str]]:
+        """Discover available MCP template configurations.
+
+        Results are kept in a persisted index that is invalidated by the
+        modification times of the packs directory and of each pack
+        directory, so unchanged packs cost one stat call. Descriptions are
+        not part of the result; see describe_configuration().
+        """
+        try:
+            packs_mtime = self.mcp_agent_packs_dir.stat().st_mtime_ns
+        except FileNotFoundError:
+            self.emit("packs.missing", path=str(self.mcp_agent_packs_dir))
+            return []
+
+        index = self._load_discovery_index()
+        packs = index["packs"]
+        changed = False
+
+        if index["mtime_ns"] != packs_mtime:
+            # Packs were added or removed: rescan the directory listing
+            with os.scandir(self.mcp_agent_packs_dir) as entries:
+                names = {entry.name for entry in entries if entry.is_dir()}
+            packs = {name: packs[name] for name in names if name in packs}
+            packs.update({name: {} for name in names - packs.keys()})
+            index["mtime_ns"] = packs_mtime
+            changed = True
+
+        for name, entry in packs.items():
+            pack_dir = self.mcp_agent_packs_dir / name
+            try:
+                mtime = pack_dir.stat().st_mtime_ns
+            except FileNotFoundError:
+                continue
+            if entry.get("mtime_ns") != mtime:
+                packs[name] = self._scan_pack(pack_dir, mtime)
+                changed = True
+
+        if changed:
+            index["packs"] = packs
+            self._save_discovery_index(index)
+
+        configurations = []
+        for name in sorted(packs):
+            entry = packs[name]
+            if not entry.get("template"):
+                continue
+            pack_dir = self.mcp_agent_packs_dir / name
+            config_data = {
+                "name": name,
+                "path": str(pack_dir / "mcp_template.json"),
+            }
+            if entry.get("prepare"):
+                config_data["prepare_script"] = str(pack_dir / "prepare.py")
+            configurations.append(config_data)
+
+        return configurations
+
+    @staticmethod
+    def _scan_pack(pack_dir: Path, mtime_ns: int) -> dict[str, tp.Any]:
+        with os.scandir(pack_dir) as entries:
+            files = {entry.name for entry in entries if entry.is_file()}
+        return {
+            "mtime_ns": mtime_ns,
+            "template": "mcp_template.json" in files,
+            "prepare": "prepare.py" in files,
+        }
+
+    @property
+    def discovery_index_path(self) -> Path:
+        return CACHE_DIR / "discovery.json"
+
+    def _load_discovery_index(self) -> dict[str, tp.Any]:
+        packs_dir = str(self.mcp_agent_packs_dir.absolute())
+        try:
+            with open(self.discovery_index_path, 'r', encoding='utf-8') as f:
+                index: dict[str, tp.Any] = json.load(f)
+            if (index.get("cache_key") == cache_key()
+                    and index.get("packs_dir") == packs_dir):
+                return index
+        except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+            pass
+        return {"cache_key": cache_key(), "packs_dir": packs_dir,
+                "mtime_ns": None, "packs": {}}
+
+    def _save_discovery_index(self, index: dict[str, tp.Any]) -> None:
+        try:
+            self.discovery_index_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.discovery_index_path, 'w', encoding='utf-8') as f:
+                json.dump(index, f, indent=2)
+        except OSError:
+            # The index is only a cache; discovery works without it
+            pass
+
+    def describe_configuration(self, config: dict[str, str]) -> str:
+        """Return a configuration's description, reading its README on demand."""
+        if "description" not in config:
+            description = ""
+            readme_file = Path(config["path"]).parent / "README.md"
+            try:
+                with open(readme_file, 'r', encoding='utf-8') as f:
+                    # Read first line as description
+                    first_line = f.readline().strip()
+                    if first_line.startswith('# '):
+                        description = first_line[2:]
+            except Exception:
+                pass
+            config["description"] = description or "No description available"
+        return config["description"]
+
+    @property
+    def template_paths(self) -> list[Path]:
+        return [self.template_path, *self.compose_with]
+
+    def load_template(self, template_path: Path | None = None) -> dict[str, tp.Any]:
+        """Load the MCP template file, resolving inheritance and fragments.
+
+        The files the template was resolved from are added to
+        ``template_sources``.
+        """
+        template_path = template_path or self.template_path
+        resolver = template_resolver(template_path.parent.parent)
+        template, sources = resolver.resolve(template_path)
+        self.template_sources.extend(
+            p for p in sources if p not in self.template_sources)
+        self.emit("template.loaded", path=str(template_path), cached=False)
+        return template
+
+    def load_credentials(self, server_name: str, placeholder_list: set[str],
+                         flat: FlatCredentials | None = None) -> dict[str, str]:
+        """Load credentials for a specific server.
+
+        ``flat`` is the server's credential file if it was read already.
+        """
+        credentials_file = self.credentials_dir / f"{server_name}.json"
+
+        if flat is None:
+            flat = self.read_credentials(server_name)
+        self.consumed_credentials[credentials_file] = flat.digest
+        self.emit("credentials.loaded", server=server_name)
+        placeholder_list = set(x.strip('%') for x in placeholder_list)
+        return flat.resolve(placeholder_list)
+
+    def read_credentials(self, server_name: str) -> FlatCredentials:
+        """Read and flatten the credential file of a server."""
+        credentials_file = self.credentials_dir / f"{server_name}.json"
+        if not credentials_file.exists():
+            raise FileNotFoundError(
+                f"Credentials file not found: {credentials_file}")
+        return self.credential_index.get(credentials_file)
+
+    def validate_template(self, template: tp.Any) -> list[str]:
+        """Validate the template structure."""
+        errors = []
+
+        if not isinstance(template, dict):
+            errors.append("Template must be a JSON object")
+            return errors
+
+        if "servers" not in template:
+            errors.append("Template must contain a 'servers' section")
+            return errors
+
+        servers = template["servers"]
+        if not isinstance(servers, dict):
+            errors.append("'servers' section must be a JSON object")
+            return errors
+
+        if not servers:
+            errors.append("'servers' section cannot be empty")
+
+        return errors
+
+    def check_file_permissions(self, write: bool = True) -> None:
+        """Check if we have the necessary file permissions.
+
+        ``write=False`` checks only what reading the credentials needs, for
+        checks that write no output.
+        """
+        # Check if credentials directory exists
+        if not self.credentials_dir.exists():
+            raise FileNotFoundError(
+                f"Credentials directory not found: {self.credentials_dir}")
+
+        # Check if credentials directory is readable
+        if not os.access(self.credentials_dir, os.R_OK):
+            raise PermissionError(
+                f"Cannot read credentials directory: {self.credentials_dir}")
+
+        # Check if we can write to output directory
+        output_dir = self.output_path.parent
+        if write and not os.access(output_dir, os.W_OK):
+            raise PermissionError(
+                f"Cannot write to output directory: {output_dir}")
+
+    def generate_config(self) -> dict[str, tp.Any]:
+        """Generate the MCP configuration."""
+        self.emit("generation.started")
+
+        # Check file permissions
+        self.check_file_permissions()
+
+        return self.render_config(self.compile())
+
+    def compile(self) -> CompiledTemplate:
+        """Load, validate and compile the template.
+
+        Templates in ``compose_with`` are composed into the primary template
+        first. The compiled template is kept and reused until the
+        modification time or size of one of its source files changes.
+        """
+        if self._compiled:
+            signature, compiled = self._compiled
+            if signature == (tuple(self.template_paths),
+                             stat_signature(compiled.sources)):
+                return compiled
+
+        if not self.compose_with:
+            cached = self.load_cached_template()
+            if cached:
+                return cached
+
+        templates = self.load_templates()
+        self.validate_templates(templates)
+        return self.compile_templates(templates)
+
+    def load_templates(self) -> list[tuple[Path, dict[str, tp.Any]]]:
+        """Parse every selected template, resolving inheritance and fragments."""
+        self.template_sources = []
+        return [(template_path, self.load_template(template_path))
+                for template_path in self.template_paths]
+
+    def source_digests(self) -> dict[str, str | None]:
+        """Digests of the template sources, as hashed when they were read."""
+        return {str(path): digest_index.get(path) for path in self.template_sources}
+
+    def validate_templates(self, templates: list[tuple[Path, dict[str, tp.Any]]]
+                           ) -> None:
+        """Raise ValueError listing the problems of the first invalid template."""
+        for template_path, template in templates:
+            errors = self.validate_template(template)
+            if errors:
+                source = f" ({template_path})" if self.compose_with else ""
+                error_msg = (f"Template validation failed{source}:\n" +
+                             "\n".join(f"  - {error}" for error in errors))
+                raise ValueError(error_msg)
+
+    def compile_templates(self, templates: list[tuple[Path, dict[str, tp.Any]]],
+                          digests: dict[str, str | None] | None = None
+                          ) -> CompiledTemplate:
+        """Compose and compile validated templates, and keep the result."""
+        if len(templates) > 1:
+            template = compose_templates(
+                [(str(template_path), template)
+                 for template_path, template in templates])
+        else:
+            template = templates[0][1]
+        if digests is None:
+            digests = self.source_digests()
+        compiled = compile_template(template, self.template_sources, digests)
+        if not self.compose_with:
+            save_compiled_template(self.template_path, compiled)
+        self._compiled = ((tuple(self.template_paths),
+                           stat_signature(compiled.sources)), compiled)
+        return compiled
+
+    def load_cached_template(self) -> CompiledTemplate | None:
+        """Use the template's cached compiled form, skipping parsing and analysis."""
+        compiled = load_compiled_template(self.template_path)
+        if compiled is None:
+            return None
+        self.emit("template.loaded", path=str(self.template_path), cached=True)
+        self.template_sources = list(compiled.sources)
+        self._compiled = ((tuple(self.template_paths),
+                           stat_signature(compiled.sources)), compiled)
+        return compiled
+
+    def input_paths(self) -> set[Path]:
+        """Files whose changes affect the generated configuration."""
+        paths = set(self.template_paths)
+        paths.update(self.template_sources)
+        paths.update(self.prepare_scripts)
+        paths.update(self.consumed_credentials)
+        if self._compiled:
+            paths.update(self.credentials_dir / f"{name}.json"
+                         for name, server in self._compiled[1].servers.items()
+                         if server.placeholders)
+        return paths
+
+    def render_config(self, compiled: CompiledTemplate,
+                      credentials: dict[str, FlatCredentials] | None = None
+                      ) -> dict[str, tp.Any]:
+        """Render a compiled template with this generator's credentials.
+
+        ``credentials`` holds credential files already read, by server name;
+        other servers' files are read through the credential index.
+        """
+        credentials = credentials or {}
+        self.consumed_credentials = {}
+        self.dependents = {}
+        self.resolved_credentials = {}
+
+        # Process each server
+        processed_servers = {}
+
+        timings = self.timings
+        for server_name, server in compiled.servers.items():
+            if timings is None:
+                processed_servers[server_name] = self.render_server(
+                    server, credentials.get(server_name))
+                continue
+            start = time.perf_counter()
+            processed_servers[server_name] = self.render_server(
+                server, credentials.get(server_name))
+            timings.add_server(server_name, "render", time.perf_counter() - start)
+
+        # Create final configuration
+        final_config = compiled.template.copy()
+        final_config["servers"] = processed_servers
+
+        self.last_config = final_config
+        self._last_compiled = compiled
+        return final_config
+
+    def render_server(self, server: CompiledServer,
+                      flat: FlatCredentials | None = None) -> tp.Any:
+        """Render one server and record which credential file it depends on."""
+        server_name = server.name
+        self.emit("server.started", server=server_name)
+
+        placeholders = set(server.placeholders)
+
+        if not placeholders:
+            self.emit("server.no_placeholders", server=server_name)
+            return server.config
+
+        if self.enabled("server.placeholders"):
+            self.emit("server.placeholders", server=server_name,
+                      placeholders=sorted(placeholders))
+
+        # Load credentials for this server
+        credentials = self.load_credentials(server_name, placeholders, flat)
+
+        # Check if all placeholders have corresponding credentials
+        missing_credentials = placeholders - set(credentials.keys())
+        if missing_credentials:
+            missing_list = ', '.join(f'%{p}%' for p in missing_credentials)
+            raise ValueError(
+                f"Missing credentials for {server_name}: {missing_list}")
+
+        # Check for unused credentials
+        unused_credentials = set(credentials.keys()) - placeholders
+        if unused_credentials:
+            self.emit("server.unused_credentials", server=server_name,
+                      keys=sorted(unused_credentials))
+
+        credentials_file = (self.credentials_dir / f"{server_name}.json").absolute()
+        self.dependents.setdefault(credentials_file, set()).add(server_name)
+        self.resolved_credentials[server_name] = credentials
+
+        # Replace placeholders, touching only the compiled slots
+        rendered = server.render(credentials)
+
+        self.emit("server.rendered", server=server_name, placeholders=len(placeholders))
+        return rendered
+
+    def regenerate(self, changed: set[Path]) -> dict[str, tp.Any]:
+        """Re-render after ``changed`` files were modified.
+
+        If only credential files changed, the reverse index from credential
+        file to servers selects the affected servers. Of those, only servers
+        whose placeholder values actually differ are re-rendered and spliced
+        into the previous configuration. Any other change renders everything.
+        """
+        changed = {path.absolute() for path in changed}
+        compiled = self._last_compiled
+        if (compiled is None or self.last_config is None
+                or not changed <= self.dependents.keys()):
+            return self.render_config(self.compile())
+
+        servers = dict(self.last_config["servers"])
+        for path in changed:
+            flat = self.credential_index.get(path)
+            for consumed in self.consumed_credentials:
+                if consumed.absolute() == path:
+                    self.consumed_credentials[consumed] = flat.digest
+            for server_name in sorted(self.dependents[path]):
+                previous = self.resolved_credentials[server_name]
+                if flat.resolve(previous) == previous:
+                    continue
+                servers[server_name] = self.render_server(compiled.servers[server_name])
+
+        final_config = self.last_config.copy()
+        final_config["servers"] = servers
+        self.last_config = final_config
+        return final_config
+
+    def for_target(self, writer: "OutputWriter",
+                   output_path: str | Path | None = None) -> "MCPConfigGenerator":
+        """A shallow copy of this generator that writes another format.
+
+        The copy shares the compiled template and consumed credentials as of
+        now, so take it after rendering.
+        """
+        target = copy.copy(self)
+        target.writer = writer
+        target.output_path = Path(output_path) if output_path else writer.default_path()
+        return target
+
+    @property
+    def manifest_path(self) -> Path:
+        """Where the manifest of the output is kept.
+
+        Manifests record credential digests, so they stay in the untracked
+        local cache rather than next to outputs in tracked directories such
+        as ``.vscode`` or in another application's directory.
+        """
+        output = Path(os.path.abspath(self.output_path))
+        key = hashlib.sha256(str(output).encode()).hexdigest()
+        return CACHE_DIR / "manifests" / f"{key}.json"
+
+    def serialize_config(self, config: dict[str, tp.Any],
+                         previous: bytes | None = None,
+                         owned: tp.AbstractSet[str] = frozenset()) -> bytes:
+        """Serialize a configuration exactly as it is written to disk.
+
+        ``previous`` is the current content of the output; writers for
+        shared client configuration files keep its unrelated settings and
+        the servers not in ``owned``, the servers written there before.
+        """
+        try:
+            existing = json.loads(previous) if previous else None
+        except ValueError:
+            existing = None
+        document = self.writer.document(
+            config, existing if isinstance(existing, dict) else None, owned)
+        return json.dumps(document, indent=2, ensure_ascii=False).encode('utf-8')
+
+    def save_config(self, config: dict[str, tp.Any]) -> bool:
+        """Save the generated configuration to file.
+
+        The file is written to a temporary file in the same directory and
+        renamed over the output, so readers never see a partial file. Returns
+        False if the file already had identical contents and was left
+        untouched, so editors watching it do not reload.
+        """
+        try:
+            previous = self.output_path.read_bytes()
+        except FileNotFoundError:
+            previous = None
+        owned = self.owned_servers() if self.writer.shared else frozenset()
+        data = self.serialize_config(config, previous, owned)
+        self.last_output = data
+        if previous == data:
+            self.emit("output.unchanged", path=str(self.output_path))
+            return False
+
+        try:
+            self.write_output(data)
+        except Exception as e:
+            raise IOError(f"Failed to save configuration: {e}")
+        if self.enabled("output.saved"):
+            changes = self.server_changes(previous, data)
+            if self.writer.shared:
+                # The servers the user added are none of the generator's changes
+                changes = {name: change for name, change in changes.items()
+                           if name in config["servers"] or name in owned}
+            self.emit("output.saved", path=str(self.output_path), changes=changes)
+        return True
+
+    def owned_servers(self) -> frozenset[str]:
+        """Names of the servers the last run wrote to the output."""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                servers = json.load(f).get("servers", [])
+        except (OSError, ValueError, AttributeError):
+            return frozenset()
+        return frozenset(servers) if isinstance(servers, list) else frozenset()
+
+    def write_output(self, data: bytes) -> None:
+        """Atomically replace the output file with ``data``.
+
+        The new file keeps the permissions of the one it replaces; a new
+        output gets the usual 0666 less the umask. If the output is a
+        symbolic link, the file it points to is replaced and the link kept.
+        """
+        path = Path(os.path.realpath(self.output_path))
+        try:
+            mode: int | None = path.stat().st_mode & 0o7777
+        except FileNotFoundError:
+            mode = None
+
+        tmp_name = path.with_name(f".{path.name}.{os.urandom(6).hex()}.tmp")
+        # Unlike mkstemp, which always uses 0600, os.open applies the umask
+        fd = os.open(tmp_name, os.O_WRONLY | os.O_CREAT | os.O_EXCL
+                     | getattr(os, "O_BINARY", 0), 0o666)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+                stat = os.fstat(f.fileno())
+            if mode is not None:
+                os.chmod(tmp_name, mode)
+            os.replace(tmp_name, path)
+        except BaseException:
+            tmp_name.unlink(missing_ok=True)
+            raise
+        # The next up-to-date check need not read the output back
+        digest_index.record(self.output_path, (stat.st_mtime_ns, stat.st_size), data)
+        if self.fsync and hasattr(os, "O_DIRECTORY"):
+            dir_fd = os.open(path.parent, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def server_changes(self, previous: bytes | None, data: bytes) -> dict[str, str]:
+        """Classify each server as added, changed, unchanged or removed.
+
+        Compares the servers of the previous and the new output file by their
+        serialized JSON fragments, which are byte-identical for unchanged
+        servers because key order follows the template.
+        """
+        key = self.writer.servers_key
+        try:
+            old_servers = json.loads(previous)[key] if previous else {}
+            if not isinstance(old_servers, dict):
+                old_servers = {}
+        except (ValueError, KeyError, TypeError):
+            old_servers = {}
+        new_servers = json.loads(data)[key]
+
+        changes = {}
+        for name, server in new_servers.items():
+            if name not in old_servers:
+                changes[name] = "added"
+            elif self._fragment(old_servers[name]) == self._fragment(server):
+                changes[name] = "unchanged"
+            else:
+                changes[name] = "changed"
+        for name in old_servers:
+            if name not in new_servers:
+                changes[name] = "removed"
+        return changes
+
+    @staticmethod
+    def _fragment(server: tp.Any) -> str:
+        return json.dumps(server, indent=2, ensure_ascii=False)
+
+    def build_manifest(self) -> dict[str, tp.Any]:
+        """Describe the inputs of the last generation by content hash.
+
+        The template sources and the output are not read again: their
+        digests were taken when the template was loaded and the output
+        written.
+        """
+        if self._last_compiled is not None:
+            sources = dict(self._last_compiled.digests)
+        else:
+            sources = {str(path): digest_index.get(path)
+                       for path in [*self.template_paths, *self.template_sources]}
+        return {
+            "cache_key": cache_key(),
+            # The selected templates in order, and every file they were
+            # resolved from: the templates, their bases and fragments
+            "selected": [str(path) for path in self.template_paths],
+            "sources": sources,
+            "prepare": {str(path): digest_index.get(path)
+                        for path in self.prepare_scripts},
+            "credentials_dir": str(self.credentials_dir),
+            "credentials": {str(path): digest
+                            for path, digest in self.consumed_credentials.items()},
+            # The servers written, which a shared client file may hold with
+            # servers of the user's own
+            "servers": list(self.last_config["servers"]) if self.last_config else [],
+            "output": (hashlib.sha256(self.last_output).hexdigest()
+                       if self.last_output is not None
+                       else digest_index.get(self.output_path)),
+        }
+
+    def write_manifest(self, manifest: dict[str, tp.Any] | None = None) -> None:
+        """Record the inputs of the last generation for the output."""
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest or self.build_manifest(), f, indent=2)
+
+    def is_up_to_date(self) -> bool:
+        """Check whether the output matches the manifest of the last run.
+
+        True only if the cache key, template, prepare script, every
+        consumed credential file and the output itself still hash to the
+        recorded values.
+        """
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+
+        # The inputs first: when they changed, the output is read only once,
+        # to be replaced
+        return (manifest.get("output") is not None
+                and self.inputs_match(manifest)
+                and manifest.get("output") == digest_index.get(self.output_path))
+
+    def inputs_match(self, manifest: dict[str, tp.Any]) -> bool:
+        """Check whether a manifest was generated from the current inputs."""
+        if (manifest.get("cache_key") != cache_key()
+                or manifest.get("credentials_dir") != str(self.credentials_dir)):
+            return False
+
+        expected_prepare = {str(path) for path in self.prepare_scripts}
+        # A composition of the same packs in another order is another output
+        if (manifest.get("selected") != [str(path) for path in self.template_paths]
+                or set(manifest.get("prepare", {})) != expected_prepare):
+            return False
+
+        recorded = {**manifest.get("sources", {}), **manifest["prepare"],
+                    **manifest.get("credentials", {})}
+        return all(digest_index.get(Path(path)) == digest
+                   for path, digest in recorded.items())
+
+    def run(self, targets: list[tuple[OutputWriter, Path]] | None = None) -> list[bool]:
+        """Run the configuration generation process.
+
+        With ``targets``, the configuration is rendered once and written in
+        each (writer, path) format instead of to ``output_path``. Returns
+        whether each output was written or already up to date.
+        """
+        return self.write(self.generate_config(), targets)
+
+    def write(self, config: dict[str, tp.Any],
+              targets: list[tuple[OutputWriter, Path]] | None = None) -> list[bool]:
+        """Write the configuration and its manifest to the output or targets."""
+        if targets:
+            return write_targets(self, config, targets)
+        written = self.save_config(config)
+        self.write_manifest()
+        return [written]
+
+
+class RenderCache:
+    """Rendered outputs by content hash, so switching back to a pack is cheap.
+
+    Entries are keyed by the selected templates and credential folder and
+    hold the manifest of their render. An entry is used only while every
+    input recorded in it still hashes to the recorded value. Rendered files
+    are stored once per output hash, readable only by the owner, and least
+    recently used entries are evicted beyond ``max_bytes``.
+    """
+
+    def __init__(self, root: Path = CACHE_DIR / "render",
+                 max_bytes: int = 8 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        try:
+            with open(root / "index.json", 'r', encoding='utf-8') as f:
+                self.entries: dict[str, dict[str, tp.Any]] = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+
+    @staticmethod
+    def key(generator: MCPConfigGenerator) -> str:
+        selection = [generator.writer.name, str(generator.credentials_dir),
+                     *(str(path) for path in generator.template_paths)]
+        return hashlib.sha256("\0".join(selection).encode()).hexdigest()
+
+    def restore(self, generator: MCPConfigGenerator) -> bool:
+        """Write the cached output for the generator's inputs, if any."""
+        entry = self.entries.get(self.key(generator))
+        if not entry or not generator.inputs_match(entry["manifest"]):
+            return False
+        digest = entry["manifest"]["output"]
+        try:
+            data = (self.root / digest).read_bytes()
+        except OSError:
+            return False
+        if hashlib.sha256(data).hexdigest() != digest:
+            return False
+
+        generator.write_output(data)
+        generator.write_manifest(entry["manifest"])
+        entry["used"] = time.time()
+        return True
+
+    def store(self, generator: MCPConfigGenerator) -> None:
+        """Remember the output of the generator's last run."""
+        data = generator.last_output
+        if data is None:
+            return
+        manifest = generator.build_manifest()
+        try:
+            self.root.mkdir(mode=0o700, parents=True, exist_ok=True)
+            blob = self.root / manifest["output"]
+            if not blob.exists():
+                self._write(blob, data)
+        except OSError:
+            return
+        self.entries[self.key(generator)] = {
+            "manifest": manifest, "size": len(data), "used": time.time()}
+        self._evict()
+
+    def _evict(self) -> None:
+        total = 0
+        sizes: dict[str, int] = {}
+        for key, entry in sorted(self.entries.items(),
+                                 key=lambda item: item[1]["used"], reverse=True):
+            digest = entry["manifest"]["output"]
+            if digest not in sizes:
+                if total + entry["size"] > self.max_bytes and sizes:
+                    del self.entries[key]
+                    continue
+                sizes[digest] = entry["size"]
+                total += entry["size"]
+        for blob in self.root.iterdir():
+            if blob.name not in sizes and blob.name != "index.json":
+                blob.unlink(missing_ok=True)
+
+    def _write(self, path: Path, data: bytes) -> None:
+        import tempfile
+
+        # mkstemp creates the file with mode 0600
+        fd, tmp_name = tempfile.mkstemp(dir=self.root, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+    def save(self) -> None:
+        try:
+            self.root.mkdir(mode=0o700, parents=True, exist_ok=True)
+            self._write(self.root / "index.json", json.dumps(self.entries).encode())
+        except OSError:
+            pass
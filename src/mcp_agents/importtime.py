@@ -0,0 +1,85 @@
+"""Import-time budget of the library.
+
+Services embed the generator and import it often, so import cost is part of
+its interface. ``python -m mcp_agents.importtime`` measures each budgeted
+module in a fresh interpreter and exits non-zero if one is over budget or
+loads one of the slow standard-library modules the library imports lazily.
+Wall time depends on the machine, so the check is opt-in; the test suite
+asserts the deterministic part, the modules each import loads.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# Best-of-N wall time in milliseconds, with headroom for slow CI machines
+IMPORT_BUDGETS_MS = {
+    "mcp_agents": 10.0,
+    "mcp_agents.generator": 80.0,
+    "mcp_agents.pipeline": 120.0,
+}
+
+# Imported by the functions that use them, never by importing the library
+LAZY_MODULES = ("subprocess", "pickle", "tempfile", "concurrent.futures")
+
+
+def _run_import(module: str, code: str) -> str:
+    env = dict(os.environ)
+    src = str(Path(__file__).resolve().parent.parent)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [src, env.get("PYTHONPATH")]))
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True,
+                            text=True, env=env)
+    if result.returncode:
+        raise ValueError(f"Cannot import {module}: {result.stderr.strip()}")
+    return result.stdout
+
+
+def imported_modules(module: str) -> set[str]:
+    """Names of the modules importing ``module`` loads in a fresh interpreter."""
+    code = ("import sys; before = set(sys.modules); "
+            f"import {module}; print(*sorted(set(sys.modules) - before))")
+    return set(_run_import(module, code).split())
+
+
+def measure_import_ms(module: str, runs: int = 5) -> float:
+    """Best-of-``runs`` wall time of importing ``module`` in a fresh interpreter."""
+    code = ("import time; start = time.perf_counter(); "
+            f"import {module}; print(time.perf_counter() - start)")
+    return min(float(_run_import(module, code)) * 1000 for _ in range(runs))
+
+
+def check_import_budget(budgets: dict[str, float] | None = None,
+                        runs: int = 5) -> dict[str, tuple[float, float]]:
+    """Measure each module; returns module -> (milliseconds, budget)."""
+    budgets = IMPORT_BUDGETS_MS if budgets is None else budgets
+    return {module: (measure_import_ms(module, runs), budget)
+            for module, budget in budgets.items()}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Check the import time of mcp_agents against its budget.")
+    parser.add_argument("--runs", type=int, default=5,
+                        help="imports per module; the fastest counts (default: 5)")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="multiply every budget, for slower machines")
+    args = parser.parse_args(argv)
+
+    budgets = {module: budget * args.scale
+               for module, budget in IMPORT_BUDGETS_MS.items()}
+    over = 0
+    for module, (ms, budget) in check_import_budget(budgets, args.runs).items():
+        status = "✅" if ms <= budget else "❌"
+        over += ms > budget
+        print(f"{status} {module}: {ms:.1f} ms (budget {budget:.0f} ms)")
+        eager = sorted(imported_modules(module).intersection(LAZY_MODULES))
+        if eager:
+            over += 1
+            print(f"❌ {module} imports {', '.join(eager)}")
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
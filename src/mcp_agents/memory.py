@@ -0,0 +1,109 @@
+"""Memory use of the phases of a generation run, traced with tracemalloc."""
+
+import contextlib
+import sys
+import tracemalloc
+import typing as tp
+from dataclasses import dataclass, field
+
+from .timings import Timings
+
+# Allocation sites listed per phase, if they kept at least MIN_LINE_BYTES
+TOP_LINES = 5
+MIN_LINE_BYTES = 1024
+
+
+@dataclass
+class PhaseMemory:
+    """Allocations of one phase, in bytes."""
+
+    # Highest traced memory during the phase, above what was traced before
+    peak: int = 0
+    # Traced memory still allocated when the phase ended, minus before
+    retained: int = 0
+    # (file:line, bytes, blocks) of the lines that allocated the most and
+    # kept it when the phase ended
+    top_lines: list[tuple[str, int, int]] = field(default_factory=list)
+
+
+class MemoryProfile(Timings):
+    """Timings that also snapshot traced memory at every phase boundary.
+
+    Tracing starts when the profile is created and stops with ``stop``.
+    Tracing slows allocations down, so the durations measured alongside
+    are inflated. Phases must not nest.
+
+    Peak and retained memory are exact per phase. Grouping a snapshot by
+    line takes seconds for large templates, so each boundary is grouped
+    once: the lines of a phase are compared with the end of the previous
+    phase, and allocations made between two phases count towards the
+    second.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.memory: dict[str, PhaseMemory] = {}
+        # Highest traced memory seen during a phase
+        self.peak = 0
+        self._started_tracing = not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+        self._lines = self._line_sizes()
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> tp.Iterator[None]:
+        before = self._lines
+        traced_before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        try:
+            with super().phase(name):
+                yield
+        finally:
+            traced, peak = tracemalloc.get_traced_memory()
+            self._lines = after = self._line_sizes()
+            memory = self.memory.setdefault(name, PhaseMemory())
+            memory.peak = max(memory.peak, peak - traced_before)
+            memory.retained += traced - traced_before
+            self.peak = max(self.peak, peak)
+            grown = [(line, size - before.get(line, (0, 0))[0],
+                      count - before.get(line, (0, 0))[1])
+                     for line, (size, count) in after.items()]
+            top = [site for site in grown if site[1] >= MIN_LINE_BYTES]
+            # A phase entered again keeps the largest sites of all entries
+            memory.top_lines = sorted(memory.top_lines + top, key=lambda site: site[1],
+                                      reverse=True)[:TOP_LINES]
+
+    @staticmethod
+    def _line_sizes() -> dict[str, tuple[int, int]]:
+        """Traced (bytes, blocks) by ``file:line``, without the profiler's own."""
+        own = (tracemalloc.__file__, __file__)
+        return {f"{frame.filename}:{frame.lineno}": (stat.size, stat.count)
+                for stat in tracemalloc.take_snapshot().statistics("lineno")
+                if (frame := stat.traceback[0]).filename not in own}
+
+    @staticmethod
+    def peak_rss() -> int | None:
+        """Peak resident set size of the process in bytes, where known."""
+        try:
+            import resource
+        except ImportError:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Reported in kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+
+    def stop(self) -> None:
+        if self._started_tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def to_dict(self) -> dict[str, tp.Any]:
+        return {
+            **super().to_dict(),
+            "peak": self.peak,
+            "peak_rss": self.peak_rss(),
+            "memory": {name: {"peak": memory.peak, "retained": memory.retained,
+                              "top_lines": [{"line": line, "bytes": size,
+                                             "blocks": count}
+                                            for line, size, count in memory.top_lines]}
+                       for name, memory in self.memory.items()},
+        }
@@ -0,0 +1,134 @@
+"""Selecting and rendering several packs, each to its own output."""
+
+import fnmatch
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from .events import ERROR, EventHandler, emit
+from .generator import MCPConfigGenerator
+from .prepare import PrepareScheduler
+
+
+@dataclass
+class PackResult:
+    """Outcome of generating the output of one pack."""
+
+    name: str
+    output_path: str
+    status: str  # "written", "unchanged", "up to date" or "failed"
+    seconds: float
+    error: str | None = None
+
+
+def select_packs(configurations: list[dict[str, str]], patterns: list[str],
+                 select_all: bool = False) -> list[dict[str, str]]:
+    """Select packs by name or glob pattern, in discovery order."""
+    if select_all:
+        return list(configurations)
+    selected: list[dict[str, str]] = []
+    for pattern in patterns:
+        matches = [c for c in configurations if fnmatch.fnmatchcase(c["name"], pattern)]
+        if not matches:
+            raise ValueError(f"No MCP configuration matches '{pattern}'")
+        selected.extend(c for c in matches if c not in selected)
+    return selected
+
+
+def output_path_for(output: str, pack_name: str, several: bool) -> str:
+    """Output path of a pack; ``{pack}`` in ``output`` is the pack name.
+
+    When several packs are rendered and ``output`` has no ``{pack}`` field,
+    the pack name is inserted before the suffix (``mcp.<pack>.json``).
+    """
+    if "{pack}" not in output and several:
+        path = Path(output)
+        output = str(path.with_name(f"{path.stem}.{{pack}}{path.suffix}"))
+    return output.replace("{pack}", pack_name)
+
+
+def render_pack(config: dict[str, str], credentials_dir: str, output_path: str,
+                force: bool = False, fsync: bool = False,
+                on_event: EventHandler | None = None) -> PackResult:
+    """Render one pack to ``output_path``; usable in a worker process.
+
+    ``on_event`` must be picklable to be used in a worker process. The
+    pack's prepare script is left to the caller.
+    """
+    # Imported here: the pipeline module imports this one
+    from .pipeline import Pipeline
+
+    start = time.perf_counter()
+    generator = MCPConfigGenerator(credentials_dir=credentials_dir,
+                                   output_path=output_path)
+    generator.fsync = fsync
+    generator.on_event = on_event
+    pipeline = Pipeline(generator)
+    try:
+        pipeline.select([config])
+        if not force and generator.is_up_to_date():
+            status = "up to date"
+        else:
+            generator.output_path.parent.mkdir(parents=True, exist_ok=True)
+            compiled = pipeline.validate(pipeline.load())
+            rendered = pipeline.render(compiled, pipeline.resolve(compiled))
+            [written] = pipeline.write(rendered)
+            status = "written" if written else "unchanged"
+    except (OSError, ValueError) as e:
+        return PackResult(config["name"], output_path, "failed",
+                          time.perf_counter() - start, str(e))
+    return PackResult(config["name"], output_path, status, time.perf_counter() - start)
+
+
+def generate_packs(configurations: list[dict[str, str]], output: str,
+                   credentials_dir: str = "credentials", force: bool = False,
+                   jobs: int | None = None, prepare_timeout: float | None = 120.0,
+                   fsync: bool = False, on_event: EventHandler | None = None
+                   ) -> list[PackResult]:
+    """Prepare and render several packs, each to its own output file.
+
+    Prepare scripts of packs that are not up to date run concurrently;
+    rendering uses ``jobs`` worker processes.
+    """
+    from .pipeline import Pipeline
+
+    several = len(configurations) > 1
+    outputs = {c["name"]: output_path_for(output, c["name"], several)
+               for c in configurations}
+    results: dict[str, PackResult] = {}
+
+    stale = []
+    for config in configurations:
+        generator = MCPConfigGenerator(credentials_dir=credentials_dir,
+                                       output_path=outputs[config["name"]])
+        Pipeline(generator).select([config])
+        if not force and generator.is_up_to_date():
+            results[config["name"]] = PackResult(
+                config["name"], outputs[config["name"]], "up to date", 0.0)
+        else:
+            stale.append(config)
+
+    jobs = jobs or 1
+    with PrepareScheduler(max_workers=jobs, timeout=prepare_timeout,
+                          on_event=on_event) as scheduler:
+        prepared = scheduler.run_all(
+            (c["name"], c["prepare_script"]) for c in stale if "prepare_script" in c)
+    for result in prepared:
+        emit(on_event, "prepare.finished", None if result.ok else ERROR, result=result)
+        if not result.ok:
+            results[result.name] = PackResult(
+                result.name, outputs[result.name], "failed", result.seconds,
+                f"prepare.py {result.error}")
+
+    to_render = [c for c in stale if c["name"] not in results]
+    render_jobs = [(c, credentials_dir, outputs[c["name"]], True, fsync, on_event)
+                   for c in to_render]
+    if jobs > 1 and len(render_jobs) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            rendered = list(executor.map(render_pack, *zip(*render_jobs)))
+    else:
+        rendered = [render_pack(*job) for job in render_jobs]
+    results.update((r.name, r) for r in rendered)
+
+    return [results[c["name"]] for c in configurations]
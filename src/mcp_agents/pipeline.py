@@ -0,0 +1,227 @@
+"""The generation run as explicit stages.
+
+discover → prepare → load → validate → resolve → render → write
+
+Each stage returns the artifacts the next one consumes, so every template,
+prepare script and credential file is read and parsed once per run. The
+template sources are hashed as they are read; their digests travel with the
+loaded templates to the manifest and the render cache.
+"""
+
+import time
+import typing as tp
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .credentials import FlatCredentials
+from .events import DEBUG, ERROR, Event, handler_level
+from .generator import MCPConfigGenerator
+from .packs import select_packs
+from .prepare import PrepareResult, PrepareScheduler
+from .templates import CompiledTemplate
+from .timings import timed
+from .writers import OutputWriter
+
+if tp.TYPE_CHECKING:
+    from concurrent.futures import Future
+
+
+@dataclass
+class LoadedTemplates:
+    """Output of the load stage."""
+
+    templates: list[tuple[Path, dict[str, tp.Any]]] = field(default_factory=list)
+    # A current compiled cache entry; it was validated before it was cached
+    cached: CompiledTemplate | None = None
+    # The digest of every source file, by path, as it was read
+    digests: dict[str, str | None] = field(default_factory=dict)
+
+
+@dataclass
+class PipelineResult:
+    """Artifacts of one pipeline run, filled in stage by stage."""
+
+    selected: list[dict[str, str]]
+    prepare_results: list[PrepareResult] = field(default_factory=list)
+    compiled: CompiledTemplate | None = None
+    digests: dict[str, str | None] = field(default_factory=dict)
+    credentials: dict[str, FlatCredentials] = field(default_factory=dict)
+    config: dict[str, tp.Any] | None = None
+    written: list[bool] = field(default_factory=list)
+    events: list[Event] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return all(result.ok for result in self.prepare_results)
+
+
+class Pipeline:
+    """Run the stages of a generation for one generator.
+
+    ``run`` chains all stages; the stage methods can also be called one by
+    one. The pack selection is applied to the generator by ``select``; its
+    output path is left to the caller. With ``generator.timings`` set, each
+    stage records its duration there, and resolve and render record each
+    server's.
+    """
+
+    def __init__(self, generator: MCPConfigGenerator,
+                 prepare_timeout: float | None = 120.0):
+        self.generator = generator
+        self.prepare_timeout = prepare_timeout
+
+    def discover(self, patterns: tp.Sequence[str] = (),
+                 select_all: bool = False) -> list[dict[str, str]]:
+        """Discover the packs and select them by name or glob pattern."""
+        with timed(self.generator.timings, "discover"):
+            return select_packs(self.generator.discover_mcp_configurations(),
+                                list(patterns), select_all)
+
+    def select(self, selected: list[dict[str, str]]) -> None:
+        """Point the generator at the selected packs, composed in order."""
+        if not selected:
+            raise ValueError("No MCP configuration selected")
+        self.generator.template_path = Path(selected[0]["path"])
+        self.generator.compose_with = [Path(config["path"]) for config in selected[1:]]
+        self.generator.prepare_scripts = [Path(config["prepare_script"])
+                                          for config in selected
+                                          if "prepare_script" in config]
+
+    def prepare(self, scheduler: PrepareScheduler,
+                selected: list[dict[str, str]]) -> "list[Future[PrepareResult]]":
+        """Start the packs' prepare scripts in the background."""
+        with timed(self.generator.timings, "prepare"):
+            return [scheduler.submit(config["name"], Path(config["prepare_script"]))
+                    for config in selected if "prepare_script" in config]
+
+    def load(self) -> LoadedTemplates:
+        """Parse the selected templates, or load their compiled cache."""
+        generator = self.generator
+        with timed(generator.timings, "load"):
+            if not generator.compose_with:
+                cached = generator.load_cached_template()
+                if cached:
+                    return LoadedTemplates(cached=cached, digests=cached.digests)
+            templates = generator.load_templates()
+            return LoadedTemplates(templates, digests=generator.source_digests())
+
+    def validate(self, loaded: LoadedTemplates) -> CompiledTemplate:
+        """Validate the parsed templates and compile them."""
+        if loaded.cached:
+            return loaded.cached
+        with timed(self.generator.timings, "validate"):
+            self.generator.validate_templates(loaded.templates)
+            return self.generator.compile_templates(loaded.templates, loaded.digests)
+
+    def resolve(self, compiled: CompiledTemplate,
+                write: bool = True) -> dict[str, FlatCredentials]:
+        """Read the credential file of every server that has placeholders.
+
+        ``write=False`` skips the check that the output can be written, for
+        runs that only validate.
+        """
+        generator = self.generator
+        timings = generator.timings
+        with timed(timings, "resolve"):
+            generator.check_file_permissions(write)
+            if timings is None:
+                return {name: generator.read_credentials(name)
+                        for name, server in compiled.servers.items()
+                        if server.placeholders}
+            credentials = {}
+            for name, server in compiled.servers.items():
+                if server.placeholders:
+                    start = time.perf_counter()
+                    credentials[name] = generator.read_credentials(name)
+                    timings.add_server(name, "resolve", time.perf_counter() - start)
+            return credentials
+
+    def render(self, compiled: CompiledTemplate,
+               credentials: dict[str, FlatCredentials]) -> dict[str, tp.Any]:
+        """Substitute the credentials into the compiled template."""
+        self.generator.emit("generation.started")
+        with timed(self.generator.timings, "render"):
+            return self.generator.render_config(compiled, credentials)
+
+    def write(self, config: dict[str, tp.Any],
+              targets: list[tuple[OutputWriter, Path]] | None = None) -> list[bool]:
+        """Write the configuration and manifest to the output or each target."""
+        with timed(self.generator.timings, "write"):
+            return self.generator.write(config, targets)
+
+    def run(self, selected: list[dict[str, str]],
+            targets: list[tuple[OutputWriter, Path]] | None = None,
+            write: bool = True) -> PipelineResult:
+        """Run every stage for the selected packs.
+
+        Prepare scripts run while the templates are loaded and validated and
+        the credentials are read. Rendering starts once all of them have
+        succeeded; a failed prepare stops the run, with ``ok`` False. The
+        credential files are then checked again, so files a prepare script
+        wrote are rendered with their new contents. With
+        ``write`` False the run stops after validation, for callers that
+        render the compiled template themselves.
+
+        The events of the run are collected in the result and also passed
+        on to the generator's own ``on_event`` handler. Without a handler
+        every event is collected, otherwise those at or above its level.
+        """
+        generator = self.generator
+        result = PipelineResult(selected)
+        forward = generator.on_event
+
+        def record(event: Event) -> None:
+            result.events.append(event)
+            if forward is not None:
+                forward(event)
+
+        # Events below the handler's level are neither built nor collected
+        setattr(record, "level", DEBUG if forward is None else handler_level(forward))
+        generator.on_event = record
+        try:
+            self._run(result, targets, write)
+        finally:
+            generator.on_event = forward
+        return result
+
+    def _run(self, result: PipelineResult,
+             targets: list[tuple[OutputWriter, Path]] | None, write: bool) -> None:
+        self.select(result.selected)
+        error = None
+        with PrepareScheduler(timeout=self.prepare_timeout,
+                              on_event=self.generator.on_event) as scheduler:
+            prepares = self.prepare(scheduler, result.selected)
+            try:
+                loaded = self.load()
+                result.digests = loaded.digests
+                result.compiled = self.validate(loaded)
+                if write:
+                    try:
+                        result.credentials = self.resolve(result.compiled)
+                    except (OSError, ValueError):
+                        # A prepare script may still create or fix the file;
+                        # the credentials are resolved again once they finish
+                        if not prepares:
+                            raise
+            except (OSError, ValueError) as e:
+                error = e
+            with timed(self.generator.timings, "prepare"):
+                result.prepare_results = [prepare.result() for prepare in prepares]
+
+        for prepared in result.prepare_results:
+            if self.generator.timings is not None:
+                self.generator.timings.prepare_scripts[prepared.name] = prepared.seconds
+            self.generator.emit("prepare.finished", None if prepared.ok else ERROR,
+                                result=prepared)
+        if error:
+            raise error
+        if not result.ok or not write:
+            return
+        # Without an error, the load stage has compiled the template
+        assert result.compiled is not None
+        if prepares:
+            # Prepare scripts may have written credential files after they
+            # were read; the credential index re-reads only changed files
+            result.credentials = self.resolve(result.compiled)
+        result.config = self.render(result.compiled, result.credentials)
+        result.written = self.write(result.config, targets)
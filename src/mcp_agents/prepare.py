@@ -0,0 +1,599 @@
+"""Running the prepare.py scripts of packs."""
+
+import contextlib
+import hashlib
+import importlib.util
+import io
+import json
+import os
+import sys
+import threading
+import time
+import typing as tp
+from dataclasses import dataclass
+from pathlib import Path
+
+from .common import CACHE_DIR, file_digest
+from .events import ERROR, EventHandler, emit
+
+if tp.TYPE_CHECKING:
+    import subprocess
+    from concurrent.futures import Future
+
+
+@dataclass
+class PrepareResult:
+    """Outcome of one prepare.py run."""
+
+    name: str
+    script: Path
+    returncode: int | None
+    seconds: float
+    timed_out: bool = False
+    error: str | None = None
+    in_process: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+
+# How long the output of a finished script is still read; processes it left
+# behind may hold its stdout open indefinitely
+_OUTPUT_GRACE_SECONDS = 1.0
+
+# Prepare modules loaded in process, keyed by path, with their stat signature
+_prepare_modules: dict[Path, tuple[tuple[int, int], tp.Any]] = {}
+_load_lock = threading.Lock()
+
+
+def declares_in_process_hooks(source: str | bytes) -> bool:
+    """Whether a prepare script can run in process, judged from its source.
+
+    True if it defines a ``prepare()`` function or assigns ``PREPARE_STEPS``
+    at the top level and does not set ``PREPARE_IN_PROCESS = False``.
+    """
+    import ast
+
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return False
+    hooks = False
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and node.name == "prepare":
+            hooks = True
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)) and node.value is not None:
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            names = {target.id for target in targets if isinstance(target, ast.Name)}
+            if "PREPARE_STEPS" in names:
+                hooks = True
+            if ("PREPARE_IN_PROCESS" in names and isinstance(node.value, ast.Constant)
+                    and node.value.value is False):
+                return False
+    return hooks
+
+
+def load_prepare_module(script: Path) -> tp.Any | None:
+    """Import a prepare.py for in-process execution.
+
+    Returns None for scripts that run in a subprocess instead: those that
+    do not declare hooks (see ``declares_in_process_hooks``), which are
+    never imported, and those whose import fails or exits. Output of the
+    import is discarded.
+    """
+    path = script.absolute()
+    try:
+        stat = path.stat()
+        source = path.read_bytes()
+    except OSError:
+        return None
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _load_lock:
+        cached = _prepare_modules.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        module = _import_prepare_module(path, source) \
+            if declares_in_process_hooks(source) else None
+        _prepare_modules[path] = (signature, module)
+    return module
+
+
+def _import_prepare_module(path: Path, source: bytes) -> tp.Any | None:
+    spec = importlib.util.spec_from_file_location(
+        f"_mcp_prepare_{path.parent.name}", path)
+    if spec is None:
+        return None
+    module = importlib.util.module_from_spec(spec)
+    sys.path.insert(0, str(path.parent))
+    try:
+        with _captured_output(io.StringIO()):
+            exec(compile(source, str(path), "exec"), module.__dict__)
+    except KeyboardInterrupt:
+        raise
+    except BaseException:
+        # Includes sys.exit() at the top level; the subprocess reports it
+        return None
+    finally:
+        sys.path.remove(str(path.parent))
+
+    has_hook = (callable(getattr(module, "prepare", None))
+                or isinstance(getattr(module, "PREPARE_STEPS", None), list))
+    return module if has_hook else None
+
+
+class _ThreadOutput:
+    """Stands in for sys.stdout or sys.stderr while prepare code runs.
+
+    Text written by a thread with a capture buffer goes to that buffer and
+    all other text to the replaced stream, so that concurrently running
+    prepare() functions each capture their own output.
+    """
+
+    def __init__(self, stream: tp.TextIO):
+        self.stream = stream
+
+    def write(self, text: str) -> int:
+        return _capture_buffers.get(threading.get_ident(), self.stream).write(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+    def __getattr__(self, name: str) -> tp.Any:
+        return getattr(self.stream, name)
+
+
+_capture_buffers: dict[int, tp.TextIO] = {}
+_capture_lock = threading.Lock()
+_replaced_streams: tuple[tp.Any, tp.Any] | None = None
+
+
+@contextlib.contextmanager
+def _captured_output(buffer: tp.TextIO) -> tp.Iterator[None]:
+    """Capture what the current thread writes to sys.stdout and sys.stderr."""
+    global _replaced_streams
+    thread = threading.get_ident()
+    with _capture_lock:
+        if not _capture_buffers:
+            _replaced_streams = (sys.stdout, sys.stderr)
+            sys.stdout = tp.cast(tp.TextIO, _ThreadOutput(sys.stdout))
+            sys.stderr = tp.cast(tp.TextIO, _ThreadOutput(sys.stderr))
+        _capture_buffers[thread] = buffer
+    try:
+        yield
+    finally:
+        with _capture_lock:
+            del _capture_buffers[thread]
+            if not _capture_buffers and _replaced_streams is not None:
+                sys.stdout, sys.stderr = _replaced_streams
+                _replaced_streams = None
+
+
+@dataclass
+class StepResult:
+    """Outcome of one declarative prepare step."""
+
+    id: str
+    status: str  # "ran", "up to date", "failed" or "blocked"
+    seconds: float = 0.0
+    error: str | None = None
+
+
+class PrepareStepRunner:
+    """Run declarative prepare steps, skipping those that are up to date.
+
+    A step is a dict with an ``id``, an ``action`` and optional ``inputs``,
+    ``outputs`` and ``depends_on`` lists:
+
+    - ``mkdir``: create ``path``
+    - ``copy``: copy file or directory ``src`` to ``dst``
+    - ``mirror``: copy ``file`` from the local mirror ``mirror`` (a directory
+      or ``file://`` URL, default ``$MCP_AGENTS_MIRROR``) to ``dst``
+    - ``run``: run ``command`` (a list) in ``cwd``
+
+    Paths may contain environment variables and ``~``. Every completed step
+    records a stamp: a hash of its definition, the contents of its inputs
+    and the stamps of the steps it depends on. A step whose stamp is
+    unchanged and whose outputs all exist is skipped. Steps that do not
+    depend on each other, explicitly or through one's outputs being the
+    other's inputs, run in parallel.
+    """
+
+    def __init__(self, steps: list[dict[str, tp.Any]], stamp_file: Path,
+                 max_workers: int | None = None,
+                 on_event: EventHandler | None = None):
+        self.steps = {step["id"]: step for step in steps}
+        if len(self.steps) != len(steps):
+            raise ValueError("Prepare step ids must be unique")
+        self.stamp_file = stamp_file
+        self.max_workers = max_workers
+        self.on_event = on_event
+        self.dependencies = self._dependencies()
+
+    def emit(self, kind: str, level: int | None = None, **fields: tp.Any) -> None:
+        emit(self.on_event, kind, level, **fields)
+
+    @staticmethod
+    def _expand(path: str) -> Path:
+        return Path(os.path.expanduser(os.path.expandvars(path)))
+
+    @staticmethod
+    def _mirror_source(step: dict[str, tp.Any]) -> Path:
+        mirror: str | None = step.get("mirror") or os.environ.get("MCP_AGENTS_MIRROR")
+        if not mirror:
+            raise ValueError(
+                f"Step '{step['id']}' needs a mirror or $MCP_AGENTS_MIRROR")
+        mirror = mirror.removeprefix("file://")
+        return PrepareStepRunner._expand(mirror).joinpath(step["file"])
+
+    def inputs(self, step: dict[str, tp.Any]) -> list[Path]:
+        paths = [self._expand(p) for p in step.get("inputs", [])]
+        if step["action"] == "copy":
+            paths.append(self._expand(step["src"]))
+        elif step["action"] == "mirror":
+            paths.append(self._mirror_source(step))
+        return paths
+
+    def outputs(self, step: dict[str, tp.Any]) -> list[Path]:
+        paths = [self._expand(p) for p in step.get("outputs", [])]
+        if step["action"] == "mkdir":
+            paths.append(self._expand(step["path"]))
+        elif step["action"] in ("copy", "mirror"):
+            paths.append(self._expand(step["dst"]))
+        return paths
+
+    def _dependencies(self) -> dict[str, set[str]]:
+        producers = {path: step_id for step_id, step in self.steps.items()
+                     for path in self.outputs(step)}
+        dependencies = {}
+        for step_id, step in self.steps.items():
+            deps = set(step.get("depends_on", []))
+            deps.update(producers[path] for path in self.inputs(step)
+                        if path in producers)
+            deps.discard(step_id)
+            unknown = deps - self.steps.keys()
+            if unknown:
+                raise ValueError(f"Step '{step_id}' depends on unknown steps: "
+                                 f"{', '.join(sorted(unknown))}")
+            dependencies[step_id] = deps
+        return dependencies
+
+    def _order(self) -> list[str]:
+        """Steps in dependency order; raises ValueError on cycles."""
+        order: list[str] = []
+        state: dict[str, int] = {}
+
+        def visit(step_id: str) -> None:
+            if state.get(step_id) == 2:
+                return
+            if state.get(step_id) == 1:
+                raise ValueError(f"Prepare steps form a cycle through '{step_id}'")
+            state[step_id] = 1
+            for dep in sorted(self.dependencies[step_id]):
+                visit(dep)
+            state[step_id] = 2
+            order.append(step_id)
+
+        for step_id in self.steps:
+            visit(step_id)
+        return order
+
+    def _stamp(self, step_id: str, stamps: dict[str, str]) -> str:
+        """Stamp of a step whose dependencies have the given stamps.
+
+        Computed right before the step would run, so that inputs produced by
+        other steps are hashed in their current state.
+        """
+        step = self.steps[step_id]
+        digest = hashlib.sha256(json.dumps(step, sort_keys=True).encode())
+        for path in self.inputs(step):
+            if path.is_dir():
+                digest.update(f"{path}:{self._tree_digest(path)}".encode())
+            else:
+                digest.update(f"{path}:{file_digest(path)}".encode())
+        for dep in sorted(self.dependencies[step_id]):
+            digest.update(stamps[dep].encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def _tree_digest(root: Path) -> str:
+        """Hash of a directory tree: its relative paths and file contents."""
+        digest = hashlib.sha256()
+        for path in sorted(root.rglob("*")):
+            name = path.relative_to(root).as_posix()
+            if path.is_dir():
+                digest.update(f"{name}/\0".encode())
+            else:
+                digest.update(f"{name}:{file_digest(path)}\0".encode())
+        return digest.hexdigest()
+
+    def _execute(self, step: dict[str, tp.Any]) -> None:
+        import shutil
+        import subprocess
+
+        action = step["action"]
+        if action == "mkdir":
+            self._expand(step["path"]).mkdir(parents=True, exist_ok=True)
+        elif action in ("copy", "mirror"):
+            src = self.inputs(step)[-1]
+            dst = self._expand(step["dst"])
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            if src.is_dir():
+                shutil.copytree(src, dst, dirs_exist_ok=True)
+            else:
+                shutil.copy2(src, dst)
+        elif action == "run":
+            cwd = self._expand(step["cwd"]) if "cwd" in step else None
+            result = subprocess.run(
+                [os.path.expandvars(arg) for arg in step["command"]], cwd=cwd,
+                capture_output=True, text=True, encoding='utf-8', errors='replace')
+            for line in (result.stdout + result.stderr).splitlines():
+                self.emit("prepare.step_output", step=step["id"], line=line)
+            if result.returncode:
+                raise RuntimeError(f"command exited with code {result.returncode}")
+        else:
+            raise ValueError(f"Unknown prepare action: {action}")
+
+    def run(self) -> list[StepResult]:
+        """Run all steps that are not up to date."""
+        self._order()
+        try:
+            with open(self.stamp_file, 'r', encoding='utf-8') as f:
+                previous = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            previous = {}
+
+        results: dict[str, StepResult] = {}
+        done: dict[str, str] = {}
+        stamps: dict[str, str] = {}
+
+        def run_step(step_id: str) -> StepResult:
+            step = self.steps[step_id]
+            if (previous.get(step_id) == stamps[step_id]
+                    and all(path.exists() for path in self.outputs(step))):
+                return StepResult(step_id, "up to date")
+            start = time.perf_counter()
+            try:
+                self._execute(step)
+            except Exception as e:
+                return StepResult(step_id, "failed", time.perf_counter() - start,
+                                  str(e))
+            return StepResult(step_id, "ran", time.perf_counter() - start)
+
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+        pending = dict(self.dependencies)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            running: "dict[Future[StepResult], str]" = {}
+            while pending or running:
+                for step_id, deps in list(pending.items()):
+                    if any(results.get(dep)
+                           and results[dep].status in ("failed", "blocked")
+                           for dep in deps):
+                        results[step_id] = StepResult(step_id, "blocked")
+                        del pending[step_id]
+                    elif deps <= done.keys():
+                        stamps[step_id] = self._stamp(step_id, done)
+                        running[executor.submit(run_step, step_id)] = step_id
+                        del pending[step_id]
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    result = future.result()
+                    step_id = running.pop(future)
+                    results[step_id] = result
+                    if result.status in ("ran", "up to date"):
+                        done[step_id] = stamps[step_id]
+                    level = ERROR if result.status == "failed" else None
+                    self.emit("prepare.step", level,
+                              step=step_id, status=result.status,
+                              seconds=result.seconds, error=result.error)
+
+        self.stamp_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.stamp_file, 'w', encoding='utf-8') as f:
+            json.dump(done, f, indent=2)
+        return [results[step_id] for step_id in self.steps]
+
+
+class PrepareScheduler:
+    """Run prepare scripts concurrently in a bounded pool of workers.
+
+    Scripts that declare a ``prepare()`` function or ``PREPARE_STEPS`` are
+    imported and run in this process, which avoids starting another
+    interpreter; output they print is captured and reported when they
+    finish. All other scripts run in their own interpreter and their output
+    is reported line by line, as ``prepare.output`` events, as it is
+    produced. Both are subject to ``timeout``; a subprocess is killed, while
+    in-process code, which cannot be stopped, is abandoned and keeps running
+    in the background.
+    """
+
+    def __init__(self, max_workers: int | None = None, timeout: float | None = 120.0,
+                 in_process: bool = True, on_event: EventHandler | None = None):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.timeout = timeout
+        self.in_process = in_process
+        self.on_event = on_event
+        # Workers mostly wait on child processes, so the default bound is
+        # ThreadPoolExecutor's rather than the CPU count
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="prepare")
+
+    def submit(self, name: str, script: str | Path) -> "Future[PrepareResult]":
+        """Start a prepare script; the future resolves when it has finished."""
+        return self._executor.submit(self._run_script, name, Path(script))
+
+    def _run_script(self, name: str, script: Path) -> PrepareResult:
+        module = load_prepare_module(script) if self.in_process else None
+        if module is None:
+            return self._run(name, script)
+        if isinstance(getattr(module, "PREPARE_STEPS", None), list):
+            return self._run_steps(name, script, module.PREPARE_STEPS)
+        return self._run_in_process(name, script, module)
+
+    def _call(self, name: str, func: tp.Callable[[], None], output: tp.TextIO) -> bool:
+        """Call ``func`` with its output captured; False if it timed out."""
+        def target() -> None:
+            with _captured_output(output):
+                func()
+
+        # A daemon thread, so that a call that outlives the timeout does not
+        # keep the process from exiting
+        thread = threading.Thread(target=target, name=f"prepare-{name}", daemon=True)
+        thread.start()
+        thread.join(self.timeout)
+        return not thread.is_alive()
+
+    def _timed_out(self, name: str, script: Path, start: float) -> PrepareResult:
+        return PrepareResult(name, script, None, time.perf_counter() - start, True,
+                             f"timed out after {self.timeout:g} s and was left running "
+                             f"in the background", in_process=True)
+
+    def _run_steps(self, name: str, script: Path,
+                   steps: list[dict[str, tp.Any]]) -> PrepareResult:
+        self._emit("prepare.started", pack=name, script=str(script), mode="steps")
+        start = time.perf_counter()
+        outcome: dict[str, tp.Any] = {}
+
+        def run_steps() -> None:
+            try:
+                runner = PrepareStepRunner(
+                    steps, CACHE_DIR / "prepare" / f"{name}.json",
+                    on_event=lambda event: self._emit(event.kind, event.level,
+                                                      pack=name, **event.fields))
+                outcome["results"] = runner.run()
+            except (OSError, ValueError, KeyError) as e:
+                outcome["error"] = e
+
+        if not self._call(name, run_steps, io.StringIO()):
+            return self._timed_out(name, script, start)
+        seconds = time.perf_counter() - start
+        if "error" in outcome:
+            return PrepareResult(name, script, 1, seconds,
+                                 error=f"invalid prepare steps: {outcome['error']}",
+                                 in_process=True)
+        failed = [r.id for r in outcome["results"] if r.status in ("failed", "blocked")]
+        error = f"steps failed: {', '.join(failed)}" if failed else None
+        return PrepareResult(name, script, 1 if failed else 0, seconds,
+                             error=error, in_process=True)
+
+    def _run_in_process(self, name: str, script: Path, module: tp.Any) -> PrepareResult:
+        self._emit("prepare.started", pack=name, script=str(script), mode="in process")
+        output = io.StringIO()
+        errors: list[str] = []
+
+        def prepare() -> None:
+            try:
+                module.prepare()
+            except SystemExit as e:
+                if e.code not in (0, None):
+                    errors.append(f"prepare() exited with code {e.code}")
+            except BaseException as e:
+                errors.append(f"prepare() raised {type(e).__name__}: {e}")
+
+        start = time.perf_counter()
+        finished = self._call(name, prepare, output)
+        seconds = time.perf_counter() - start
+        for line in output.getvalue().splitlines():
+            self._emit("prepare.output", pack=name, line=line)
+        if not finished:
+            return self._timed_out(name, script, start)
+        error = errors[0] if errors else None
+        return PrepareResult(name, script, 0 if error is None else 1, seconds,
+                             error=error, in_process=True)
+
+    def run_all(self, scripts: tp.Iterable[tuple[str, str | Path]]
+                ) -> list[PrepareResult]:
+        """Run several prepare scripts and wait for all of them."""
+        futures = [self.submit(name, script) for name, script in scripts]
+        return [future.result() for future in futures]
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> "PrepareScheduler":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.shutdown()
+
+    def _emit(self, kind: str, level: int | None = None, **fields: tp.Any) -> None:
+        # Called from worker threads; handlers must be thread-safe
+        emit(self.on_event, kind, level, **fields)
+
+    def _run(self, name: str, script: Path) -> PrepareResult:
+        import subprocess
+
+        self._emit("prepare.started", pack=name, script=str(script), mode="subprocess")
+        start = time.perf_counter()
+        try:
+            # Use the same python interpreter that runs this script
+            process = subprocess.Popen(
+                [sys.executable, "-u", str(script)],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                encoding='utf-8',
+                errors='replace',
+                # Its own process group, so that a timeout also kills the
+                # processes the script started
+                start_new_session=True,
+            )
+        except OSError as e:
+            return PrepareResult(name, script, None, time.perf_counter() - start,
+                                 error=f"Cannot start {sys.executable}: {e}")
+
+        assert process.stdout is not None
+        stdout = process.stdout
+
+        def stream() -> None:
+            for line in stdout:
+                self._emit("prepare.output", pack=name, line=line.rstrip())
+
+        reader = threading.Thread(target=stream, daemon=True)
+        reader.start()
+        timed_out = False
+        try:
+            process.wait(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            self._kill_group(process)
+            process.wait()
+        reader.join(_OUTPUT_GRACE_SECONDS)
+        # A reader still blocked on a pipe held by a leftover process would
+        # block close(); it is a daemon thread and ends with that process
+        if not reader.is_alive():
+            stdout.close()
+
+        result = PrepareResult(name, script, process.returncode,
+                               time.perf_counter() - start, timed_out)
+        if timed_out:
+            result.error = f"timed out after {self.timeout:g} s"
+        elif not result.ok:
+            result.error = f"exited with code {process.returncode}"
+        return result
+
+    @staticmethod
+    def _kill_group(process: "subprocess.Popen[str]") -> None:
+        """Kill a script together with the processes it started."""
+        if os.name != "posix":
+            process.kill()
+            return
+        import signal
+
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+def run_prepare_script(prepare_script_path: str | Path,
+                       timeout: float | None = 120.0,
+                       on_event: EventHandler | None = None) -> PrepareResult:
+    """Run a single pack's prepare.py and wait for it."""
+    script = Path(prepare_script_path)
+    with PrepareScheduler(max_workers=1, timeout=timeout,
+                          on_event=on_event) as scheduler:
+        return scheduler.submit(script.parent.name, script).result()
@@ -0,0 +1,103 @@
+"""Profiling a generator run with cProfile.
+
+The profile is written as a ``.pstats`` file for pstats and snakeviz, and as
+collapsed stacks (``frame;frame;frame microseconds`` per line) for
+flamegraph.pl, speedscope and similar tools.
+"""
+
+import cProfile
+import pstats
+import typing as tp
+from pathlib import Path
+
+T = tp.TypeVar("T")
+
+# pstats key of a function: (file, line, name)
+FunctionKey = tuple[str, int, str]
+
+# Call paths are followed this deep, and branches below this many seconds
+# are dropped, which keeps the collapsed file small for large runs
+_MAX_DEPTH = 100
+_MIN_SECONDS = 1e-6
+
+
+def profile_call(func: tp.Callable[[], T]) -> tuple[T, cProfile.Profile]:
+    """Call ``func`` under cProfile; returns its result and the profile."""
+    profile = cProfile.Profile()
+    result = profile.runcall(func)
+    return result, profile
+
+
+def frame_label(key: FunctionKey) -> str:
+    file, line, name = key
+    if file == "~":
+        # Built-in functions have no file
+        label = name
+    else:
+        label = f"{name} ({Path(file).name}:{line})"
+    # ';' separates frames in the collapsed format
+    return label.replace(";", ",")
+
+
+def collapsed_stacks(stats: pstats.Stats) -> dict[str, float]:
+    """Self time in seconds per call path, from cProfile's caller graph.
+
+    cProfile records callers, not full stacks, so a function called from
+    several places has its time split across its callers in proportion to
+    the time each call edge took.
+    """
+    entries: dict[FunctionKey, tp.Any] = stats.stats  # type: ignore[attr-defined]
+    callees: dict[FunctionKey, list[tuple[FunctionKey, float]]] = {}
+    for key, (_, _, _, _, callers) in entries.items():
+        for caller, (_, _, _, edge_seconds) in callers.items():
+            callees.setdefault(caller, []).append((key, edge_seconds))
+
+    stacks: dict[str, float] = {}
+
+    def walk(key: FunctionKey, seconds: float, path: list[str],
+             on_path: set[FunctionKey]) -> None:
+        total_seconds, self_seconds = entries[key][3], entries[key][2]
+        share = seconds / total_seconds if total_seconds else 0.0
+        path.append(frame_label(key))
+        on_path.add(key)
+        stack = ";".join(path)
+        stacks[stack] = stacks.get(stack, 0.0) + self_seconds * share
+        if len(path) < _MAX_DEPTH:
+            for callee, edge_seconds in callees.get(key, ()):
+                if callee not in on_path and edge_seconds * share >= _MIN_SECONDS:
+                    walk(callee, edge_seconds * share, path, on_path)
+        on_path.discard(key)
+        path.pop()
+
+    for key, (_, _, _, total_seconds, callers) in entries.items():
+        if not callers:
+            walk(key, total_seconds, [], set())
+    return stacks
+
+
+def hotspots(stats: pstats.Stats, count: int = 20
+             ) -> list[tuple[str, int, float, float]]:
+    """The ``count`` functions with the most cumulative time.
+
+    Returns (function, calls, own seconds, cumulative seconds) tuples.
+    """
+    entries: dict[FunctionKey, tp.Any] = stats.stats  # type: ignore[attr-defined]
+    rows = [(frame_label(key), calls, self_seconds, total_seconds)
+            for key, (_, calls, self_seconds, total_seconds, _) in entries.items()]
+    return sorted(rows, key=lambda row: row[3], reverse=True)[:count]
+
+
+def write_profile(profile: cProfile.Profile, prefix: str | Path) -> tuple[Path, Path]:
+    """Write ``<prefix>.pstats`` and ``<prefix>.collapsed``; returns both paths."""
+    prefix = Path(prefix)
+    prefix.parent.mkdir(parents=True, exist_ok=True)
+    pstats_path = prefix.with_name(prefix.name + ".pstats")
+    collapsed_path = prefix.with_name(prefix.name + ".collapsed")
+    profile.dump_stats(pstats_path)
+    stacks = collapsed_stacks(pstats.Stats(profile))
+    with open(collapsed_path, 'w', encoding='utf-8') as f:
+        for stack, seconds in stacks.items():
+            microseconds = round(seconds * 1e6)
+            if microseconds:
+                f.write(f"{stack} {microseconds}\n")
+    return pstats_path, collapsed_path
@@ -0,0 +1,375 @@
+"""Template parsing, inheritance, composition and compilation."""
+
+import json
+import os
+import re
+import typing as tp
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .common import cache_key, digest_index, stat_signature
+
+PLACEHOLDER_REGEX = r'%%([a-zA-Z_][a-zA-Z0-9_]*)%%'
+_placeholder_pattern: "re.Pattern[str] | None" = None
+
+
+def placeholder_pattern() -> "re.Pattern[str]":
+    """The compiled placeholder pattern, compiled on first use."""
+    global _placeholder_pattern
+    if _placeholder_pattern is None:
+        _placeholder_pattern = re.compile(PLACEHOLDER_REGEX)
+    return _placeholder_pattern
+
+
+@dataclass(frozen=True)
+class PlaceholderSlot:
+    """A string in a server configuration that contains placeholders.
+
+    ``path`` is relative to the server configuration. ``segments`` holds the
+    pre-split string: literal text at even indices, placeholder names at odd
+    indices (the layout produced by ``re.split`` with one group).
+    """
+
+    server: str
+    path: tuple[str | int, ...]
+    segments: tuple[str, ...]
+
+    @property
+    def placeholders(self) -> tuple[str, ...]:
+        return self.segments[1::2]
+
+    @property
+    def json_path(self) -> str:
+        """Absolute JSON path of this slot, e.g. ``$.servers.x.env.KEY``."""
+        parts = ["$", "servers", self.server]
+        parts.extend(f"[{p}]" if isinstance(p, int) else p for p in self.path)
+        return ".".join(parts).replace(".[", "[")
+
+    def render(self, credentials: dict[str, str]) -> str:
+        """Join the segments, substituting credential values."""
+        parts = list(self.segments)
+        for i in range(1, len(parts), 2):
+            placeholder = parts[i]
+            if placeholder not in credentials:
+                raise ValueError(
+                    f"Missing credential for placeholder: %{placeholder}%")
+            parts[i] = credentials[placeholder]
+        return "".join(parts)
+
+
+@dataclass
+class CompiledServer:
+    """A server configuration together with its placeholder slots."""
+
+    name: str
+    config: tp.Any
+    slots: list[PlaceholderSlot] = field(default_factory=list)
+    placeholders: frozenset[str] = frozenset()
+
+    def render(self, credentials: dict[str, str]) -> tp.Any:
+        """Render the server configuration.
+
+        Only the containers on the path to a slot are copied; all other
+        subtrees are shared with the template, so the cost depends on the
+        number of slots and not on the size of the configuration.
+        """
+        if not self.slots:
+            return self.config
+        if not isinstance(self.config, (dict, list)):
+            return self.slots[0].render(credentials)
+
+        result = _shallow_copy(self.config)
+        copied = {id(result)}
+        for slot in self.slots:
+            node = result
+            for key in slot.path[:-1]:
+                child = node[key]
+                if id(child) not in copied:
+                    child = _shallow_copy(child)
+                    node[key] = child
+                    copied.add(id(child))
+                node = child
+            node[slot.path[-1]] = slot.render(credentials)
+        return result
+
+
+@dataclass
+class CompiledTemplate:
+    """A parsed template analyzed once and rendered any number of times."""
+
+    template: dict[str, tp.Any]
+    servers: dict[str, CompiledServer]
+    # Every file the template was resolved from: templates, bases, fragments
+    sources: list[Path] = field(default_factory=list)
+    # The digest of each source as it was read, by path
+    digests: dict[str, str | None] = field(default_factory=dict)
+
+    @property
+    def slots(self) -> list[PlaceholderSlot]:
+        return [slot for server in self.servers.values() for slot in server.slots]
+
+    def render(self, credentials_by_server: dict[str, dict[str, str]]
+               ) -> dict[str, tp.Any]:
+        """Render the whole template from per-server credential maps."""
+        config = dict(self.template)
+        config["servers"] = {
+            name: server.render(credentials_by_server.get(name, {}))
+            for name, server in self.servers.items()
+        }
+        return config
+
+
+def _shallow_copy(obj: tp.Any) -> tp.Any:
+    return dict(obj) if isinstance(obj, dict) else list(obj)
+
+
+def _collect_slots(server: str, obj: tp.Any, path: tuple[str | int, ...],
+                   slots: list[PlaceholderSlot]) -> None:
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            _collect_slots(server, value, path + (key,), slots)
+    elif isinstance(obj, list):
+        for index, item in enumerate(obj):
+            _collect_slots(server, item, path + (index,), slots)
+    elif isinstance(obj, str) and '%%' in obj:
+        segments = placeholder_pattern().split(obj)
+        if len(segments) > 1:
+            slots.append(PlaceholderSlot(server, path, tuple(segments)))
+
+
+def compile_template(template: dict[str, tp.Any], sources: tp.Sequence[Path] = (),
+                     digests: dict[str, str | None] | None = None) -> CompiledTemplate:
+    """Analyze a validated template into a reusable CompiledTemplate."""
+    servers = {}
+    for server_name, server_config in template["servers"].items():
+        slots: list[PlaceholderSlot] = []
+        _collect_slots(server_name, server_config, (), slots)
+        placeholders = frozenset(p for slot in slots for p in slot.placeholders)
+        servers[server_name] = CompiledServer(
+            server_name, server_config, slots, placeholders)
+    if digests is None:
+        digests = {str(source): digest_index.get(source) for source in sources}
+    return CompiledTemplate(template, servers, list(sources), digests)
+
+
+# Parsed and compiled templates are cached per pack, like __pycache__
+TEMPLATE_CACHE_DIR = "__mcpcache__"
+
+
+def compiled_template_cache_path(template_path: Path) -> Path:
+    return template_path.parent / TEMPLATE_CACHE_DIR / f"{template_path.stem}.pickle"
+
+
+def load_compiled_template(template_path: Path) -> CompiledTemplate | None:
+    """Load the cached compiled template, if it is still current.
+
+    The cache file starts with a small header recording the cache key of
+    the generator code and the hash of every source file; the compiled
+    template is only unpickled if all of them still match, so classes
+    pickled by other code are never loaded.
+    """
+    import pickle
+
+    try:
+        with open(compiled_template_cache_path(template_path), 'rb') as f:
+            header = pickle.load(f)
+            if (header.get("cache_key") != cache_key()
+                    or any(digest_index.get(Path(path)) != digest
+                           for path, digest in header["sources"].items())):
+                return None
+            compiled = pickle.load(f)
+    except (OSError, EOFError, pickle.PickleError, AttributeError, KeyError, TypeError):
+        return None
+    if not isinstance(compiled, CompiledTemplate):
+        return None
+    # The sources were just hashed; their digests serve the rest of the run
+    compiled.digests = dict(header["sources"])
+    return compiled
+
+
+def save_compiled_template(template_path: Path, compiled: CompiledTemplate) -> None:
+    """Cache a compiled template next to its source; errors are ignored."""
+    import pickle
+    import tempfile
+
+    path = compiled_template_cache_path(template_path)
+    header = {
+        "cache_key": cache_key(),
+        "sources": {str(source): compiled.digests.get(str(source))
+                    for source in compiled.sources},
+    }
+    try:
+        path.parent.mkdir(exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(header, f, pickle.HIGHEST_PROTOCOL)
+                pickle.dump(compiled, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+    except OSError:
+        pass
+
+
+def _inherit(base: dict[str, tp.Any], child: dict[str, tp.Any]) -> dict[str, tp.Any]:
+    """Overlay ``child`` on ``base``.
+
+    Servers are merged by name, a ``null`` server removes an inherited one,
+    top-level lists are concatenated without duplicates and other keys of
+    the child replace those of the base.
+    """
+    merged = dict(base)
+    for key, value in child.items():
+        if (key == "servers" and isinstance(value, dict)
+                and isinstance(merged.get(key), dict)):
+            servers = dict(merged[key])
+            for name, server in value.items():
+                if server is None:
+                    servers.pop(name, None)
+                else:
+                    servers[name] = server
+            merged[key] = servers
+        elif isinstance(merged.get(key), list) and isinstance(value, list):
+            merged[key] = merged[key] + [v for v in value if v not in merged[key]]
+        else:
+            merged[key] = value
+    return merged
+
+
+class TemplateResolver:
+    """Resolve template inheritance and shared server fragments.
+
+    A template may name other packs in ``"extends"`` (a string or a list);
+    their resolved templates are overlaid in order, then the template's own
+    keys. A server defined as ``{"$fragment": "name"}`` is replaced by the
+    server in ``_fragments/name.json`` of the packs directory, with any
+    other keys of the reference overriding the fragment's.
+
+    Resolved templates and fragments are memoized, so bases shared by many
+    packs are parsed once; an entry is re-resolved when one of the files it
+    was built from changes. Resolved templates are shared and must not be
+    modified.
+    """
+
+    FRAGMENTS_DIR = "_fragments"
+
+    def __init__(self, packs_dir: Path):
+        self.packs_dir = packs_dir
+        self._templates: dict[Path, tuple[tuple, dict[str, tp.Any], list[Path]]] = {}
+        self._fragments: dict[str, tuple[tuple, tp.Any, Path]] = {}
+
+    @staticmethod
+    def _read(path: Path, kind: str) -> tp.Any:
+        # The file is hashed while it is read, for the manifest and caches
+        try:
+            return json.loads(digest_index.read(path).decode('utf-8'))
+        except FileNotFoundError:
+            raise FileNotFoundError(f"{kind} file not found: {path}")
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON in {kind.lower()} file {path}: {e}")
+
+    def fragment(self, name: str) -> tuple[tp.Any, Path]:
+        """Return a shared server fragment and the file it was read from."""
+        path = self.packs_dir / self.FRAGMENTS_DIR / f"{name}.json"
+        cached = self._fragments.get(name)
+        if cached and cached[0] == stat_signature([path]):
+            return cached[1], cached[2]
+        fragment = self._read(path, "Fragment")
+        self._fragments[name] = (stat_signature([path]), fragment, path)
+        return fragment, path
+
+    def resolve(self, template_path: Path,
+                _stack: tuple[Path, ...] = ()) -> tuple[dict[str, tp.Any], list[Path]]:
+        """Return the resolved template and every file it was built from."""
+        cached = self._templates.get(template_path)
+        if cached and cached[0] == stat_signature(cached[2]):
+            return cached[1], cached[2]
+        if template_path in _stack:
+            chain = " -> ".join(str(p) for p in (*_stack, template_path))
+            raise ValueError(f"Template inheritance cycle: {chain}")
+
+        raw = self._read(template_path, "Template")
+        if not isinstance(raw, dict):
+            return raw, [template_path]
+
+        sources = [template_path]
+        extends = raw.get("extends", [])
+        resolved: dict[str, tp.Any] = {}
+        for base in [extends] if isinstance(extends, str) else extends:
+            base_path = self.packs_dir / base / "mcp_template.json"
+            base_template, base_sources = self.resolve(base_path,
+                                                       (*_stack, template_path))
+            if not isinstance(base_template, dict):
+                raise ValueError(f"Base template must be a JSON object: {base_path}")
+            resolved = _inherit(resolved, base_template)
+            sources.extend(p for p in base_sources if p not in sources)
+
+        own = {key: value for key, value in raw.items() if key != "extends"}
+        if isinstance(own.get("servers"), dict):
+            servers = {}
+            for name, server in own["servers"].items():
+                if isinstance(server, dict) and "$fragment" in server:
+                    fragment, fragment_path = self.fragment(server["$fragment"])
+                    if not isinstance(fragment, dict):
+                        raise ValueError(
+                            f"Fragment must be a JSON object: {fragment_path}")
+                    overrides = {k: v for k, v in server.items() if k != "$fragment"}
+                    server = {**fragment, **overrides}
+                    if fragment_path not in sources:
+                        sources.append(fragment_path)
+                servers[name] = server
+            own["servers"] = servers
+        resolved = _inherit(resolved, own)
+
+        self._templates[template_path] = (stat_signature(sources), resolved, sources)
+        return resolved, sources
+
+
+_resolvers: dict[Path, TemplateResolver] = {}
+
+
+def template_resolver(packs_dir: Path) -> TemplateResolver:
+    """The resolver shared by all generators working on ``packs_dir``."""
+    key = packs_dir.absolute()
+    if key not in _resolvers:
+        _resolvers[key] = TemplateResolver(packs_dir)
+    return _resolvers[key]
+
+
+def compose_templates(templates: list[tuple[str, dict[str, tp.Any]]]
+                      ) -> dict[str, tp.Any]:
+    """Merge several validated templates into one.
+
+    Servers defined identically in several templates are kept once. Other
+    top-level lists such as ``inputs`` are concatenated without duplicates.
+    A server or top-level key defined differently in two templates is a
+    conflict; all conflicts are reported together as a ValueError.
+    """
+    composed: dict[str, tp.Any] = {"servers": {}}
+    origins: dict[str, str] = {}
+    conflicts = []
+
+    for source, template in templates:
+        for key, value in template.items():
+            if key == "servers":
+                for name, server in value.items():
+                    if name not in composed["servers"]:
+                        composed["servers"][name] = server
+                        origins[name] = source
+                    elif composed["servers"][name] != server:
+                        conflicts.append(f"server '{name}' is defined differently "
+                                         f"in {origins[name]} and {source}")
+            elif key not in composed:
+                composed[key] = value
+            elif isinstance(composed[key], list) and isinstance(value, list):
+                composed[key] = composed[key] + [v for v in value
+                                                 if v not in composed[key]]
+            elif composed[key] != value:
+                conflicts.append(f"'{key}' is defined differently in {source}")
+
+    if conflicts:
+        raise ValueError("Cannot compose templates:\n" +
+                         "\n".join(f"  - {conflict}" for conflict in conflicts))
+    return composed
@@ -0,0 +1,61 @@
+"""Wall-clock timings of the phases of a generation run."""
+
+import contextlib
+import time
+import typing as tp
+
+
+class Timings:
+    """Durations of a run's phases and of each server, in seconds.
+
+    Code measures only when it is given a Timings object, so runs without
+    one pay for a None check per phase and per server. Durations come from
+    the monotonic ``time.perf_counter``; a phase entered several times adds
+    up.
+    """
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.phases: dict[str, float] = {}
+        # Pack name -> duration of its prepare script, which runs in the
+        # background while the next phases proceed
+        self.prepare_scripts: dict[str, float] = {}
+        # Server name -> phase -> seconds
+        self.servers: dict[str, dict[str, float]] = {}
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> tp.Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def add_server(self, server: str, phase: str, seconds: float) -> None:
+        phases = self.servers.setdefault(server, {})
+        phases[phase] = phases.get(phase, 0.0) + seconds
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def slowest_servers(self, count: int = 10) -> list[tuple[str, float]]:
+        """The ``count`` servers that took longest over all their phases."""
+        totals = [(name, sum(phases.values())) for name, phases in self.servers.items()]
+        return sorted(totals, key=lambda item: item[1], reverse=True)[:count]
+
+    def to_dict(self) -> dict[str, tp.Any]:
+        return {
+            "total": self.elapsed,
+            "phases": self.phases,
+            "prepare_scripts": self.prepare_scripts,
+            "servers": self.servers,
+        }
+
+
+def timed(timings: Timings | None, name: str) -> tp.ContextManager[None]:
+    """Time the block as phase ``name`` of ``timings``, if there is one."""
+    return contextlib.nullcontext() if timings is None else timings.phase(name)
@@ -0,0 +1,168 @@
+"""Regenerating the configuration when its inputs change."""
+
+import os
+import select
+import struct
+import time
+import typing as tp
+from pathlib import Path
+
+from .events import ERROR
+from .generator import MCPConfigGenerator
+from .prepare import run_prepare_script
+from .writers import OutputWriter
+
+
+class _Inotify:
+    """Minimal ctypes binding to Linux inotify, watching directories."""
+
+    # IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    MASK = 0x004 | 0x008 | 0x040 | 0x080 | 0x100 | 0x200
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self) -> None:
+        import ctypes
+        import ctypes.util
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: dict[int, Path] = {}
+
+    def add_directory(self, directory: Path) -> bool:
+        if directory in self._dirs.values():
+            return True
+        wd = self._libc.inotify_add_watch(
+            self._fd, os.fsencode(directory), self.MASK)
+        if wd < 0:
+            return False
+        self._dirs[wd] = directory
+        return True
+
+    def read(self, timeout: float | None) -> set[Path]:
+        """Paths touched within ``timeout`` seconds (None blocks)."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+        data = os.read(self._fd, 64 * 1024)
+        paths = set()
+        offset = 0
+        while offset < len(data):
+            wd, _, _, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if wd in self._dirs and name:
+                paths.add(self._dirs[wd] / os.fsdecode(name))
+        return paths
+
+
+class FileWatcher:
+    """Block until watched files change, coalescing bursts of changes.
+
+    Uses inotify where it is available and falls back to polling the files'
+    stat signatures otherwise.
+    """
+
+    def __init__(self, debounce: float = 0.3, poll_interval: float = 0.5):
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self._paths: set[Path] = set()
+        self._signatures: dict[Path, tuple[int, int] | None] = {}
+        try:
+            self._inotify: _Inotify | None = _Inotify()
+        except (OSError, AttributeError, TypeError):
+            self._inotify = None
+
+    @property
+    def backend(self) -> str:
+        return "inotify" if self._inotify else "polling"
+
+    @property
+    def paths(self) -> set[Path]:
+        return self._paths
+
+    def set_paths(self, paths: tp.Iterable[Path]) -> None:
+        self._paths = {path.absolute() for path in paths}
+        self._signatures = {path: self._signature(path) for path in self._paths}
+        if self._inotify:
+            for directory in {path.parent for path in self._paths}:
+                if not self._inotify.add_directory(directory):
+                    # Directory missing or not watchable: poll instead
+                    self._inotify = None
+                    break
+
+    @staticmethod
+    def _signature(path: Path) -> tuple[int, int] | None:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _poll(self, timeout: float | None) -> set[Path]:
+        if self._inotify:
+            return self._inotify.read(timeout) & self._paths
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = set()
+            for path in self._paths:
+                signature = self._signature(path)
+                if signature != self._signatures[path]:
+                    self._signatures[path] = signature
+                    changed.add(path)
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            interval = self.poll_interval
+            if deadline is not None:
+                interval = min(interval, max(deadline - time.monotonic(), 0))
+            time.sleep(interval)
+
+    def wait(self) -> set[Path]:
+        """Wait for a change, then for ``debounce`` seconds of quiet."""
+        changed: set[Path] = set()
+        while not changed:
+            changed = self._poll(None)
+        while more := self._poll(self.debounce):
+            changed |= more
+        return changed
+
+
+def watch(generator: MCPConfigGenerator, debounce: float = 0.3,
+          prepare_timeout: float | None = 120.0,
+          targets: list[tuple[OutputWriter, Path]] | None = None) -> None:
+    """Regenerate the configuration whenever one of its inputs changes.
+
+    The compiled template and the credential index stay in memory between
+    runs, so only changed files are read again. Progress, including errors
+    of a regeneration, is reported through the generator's ``on_event``.
+    Runs until interrupted.
+    """
+    watcher = FileWatcher(debounce)
+    while True:
+        watcher.set_paths(generator.input_paths())
+        generator.emit("watch.waiting", files=len(watcher.paths),
+                       backend=watcher.backend)
+        changed = watcher.wait()
+        cwd = Path.cwd()
+        generator.emit("watch.changed", paths=sorted(
+            str(p.relative_to(cwd)) if p.is_relative_to(cwd) else str(p)
+            for p in changed))
+
+        rerun = [script for script in generator.prepare_scripts
+                 if script.absolute() in changed]
+        results = [run_prepare_script(script, prepare_timeout, generator.on_event)
+                   for script in rerun]
+        for result in results:
+            generator.emit("prepare.finished", None if result.ok else ERROR,
+                           result=result)
+        if not all(result.ok for result in results):
+            continue
+        try:
+            generator.write(generator.regenerate(changed), targets)
+        except (FileNotFoundError, ValueError) as e:
+            generator.emit("watch.error", error=str(e))
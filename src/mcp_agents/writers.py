@@ -0,0 +1,128 @@
+"""Output formats of the MCP clients the configuration is written for."""
+
+import os
+import sys
+import typing as tp
+from pathlib import Path
+
+if tp.TYPE_CHECKING:
+    from .generator import MCPConfigGenerator
+
+
+class OutputWriter:
+    """Layout of the configuration file of one MCP client."""
+
+    name = ""
+    servers_key = "servers"
+    # Whether the file also holds servers the generator did not write
+    shared = False
+
+    def default_path(self) -> Path:
+        raise NotImplementedError
+
+    def document(self, config: dict[str, tp.Any], existing: dict[str, tp.Any] | None,
+                 owned: tp.AbstractSet[str] = frozenset()) -> dict[str, tp.Any]:
+        """Build the file content from a rendered configuration.
+
+        ``owned`` names the servers the generator wrote to the file before.
+        """
+        raise NotImplementedError
+
+
+class VSCodeWriter(OutputWriter):
+    """``.vscode/mcp.json``: the template layout, written as is."""
+
+    name = "vscode"
+
+    def default_path(self) -> Path:
+        return Path(".vscode/mcp.json")
+
+    def document(self, config: dict[str, tp.Any], existing: dict[str, tp.Any] | None,
+                 owned: tp.AbstractSet[str] = frozenset()) -> dict[str, tp.Any]:
+        return config
+
+
+class MCPServersWriter(OutputWriter):
+    """Clients that read servers from an ``mcpServers`` object.
+
+    The transport is implied by the server entry, so ``"type": "stdio"`` and
+    VS Code's ``inputs`` are dropped. Other settings of an existing file are
+    kept, and so are the servers the user added: only the servers the
+    generator wrote before are replaced or removed.
+    """
+
+    servers_key = "mcpServers"
+    shared = True
+
+    def document(self, config: dict[str, tp.Any], existing: dict[str, tp.Any] | None,
+                 owned: tp.AbstractSet[str] = frozenset()) -> dict[str, tp.Any]:
+        document = dict(existing or {})
+        previous = document.get(self.servers_key)
+        servers = {
+            name: server for name, server in
+            (previous.items() if isinstance(previous, dict) else ())
+            if name not in owned or name in config["servers"]
+        }
+        for name, server in config["servers"].items():
+            if isinstance(server, dict) and server.get("type") == "stdio":
+                server = {k: v for k, v in server.items() if k != "type"}
+            servers[name] = server
+        document[self.servers_key] = servers
+        return document
+
+
+class ClaudeDesktopWriter(MCPServersWriter):
+    """Claude Desktop's ``claude_desktop_config.json``."""
+
+    name = "claude"
+
+    def default_path(self) -> Path:
+        if sys.platform == "win32":
+            base = Path(os.environ.get("APPDATA", Path.home() / "AppData" / "Roaming"))
+        elif sys.platform == "darwin":
+            base = Path.home() / "Library" / "Application Support"
+        else:
+            base = Path(os.environ.get("XDG_CONFIG_HOME", Path.home() / ".config"))
+        return base / "Claude" / "claude_desktop_config.json"
+
+
+class CursorWriter(MCPServersWriter):
+    """Cursor's project-level ``.cursor/mcp.json``."""
+
+    name = "cursor"
+
+    def default_path(self) -> Path:
+        return Path(".cursor/mcp.json")
+
+
+OUTPUT_WRITERS: dict[str, type[OutputWriter]] = {
+    writer.name: writer for writer in (VSCodeWriter, ClaudeDesktopWriter, CursorWriter)
+}
+
+
+def parse_target(spec: str) -> tuple[OutputWriter, Path | None]:
+    """Parse a ``NAME[=PATH]`` output target."""
+    name, _, path = spec.partition("=")
+    if name not in OUTPUT_WRITERS:
+        raise ValueError(f"Unknown output target '{name}'; "
+                         f"choose from {', '.join(OUTPUT_WRITERS)}")
+    return OUTPUT_WRITERS[name](), Path(path) if path else None
+
+
+def write_targets(generator: "MCPConfigGenerator", config: dict[str, tp.Any],
+                  targets: list[tuple[OutputWriter, Path]]) -> list[bool]:
+    """Write one rendered configuration to several targets concurrently.
+
+    Each target gets its own manifest, so ``is_up_to_date`` holds per file.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def write(target: tuple[OutputWriter, Path]) -> bool:
+        output = generator.for_target(*target)
+        output.output_path.parent.mkdir(parents=True, exist_ok=True)
+        written = output.save_config(config)
+        output.write_manifest()
+        return written
+
+    with ThreadPoolExecutor(max_workers=len(targets) or 1) as executor:
+        return list(executor.map(write, targets))
@@ -0,0 +1,52 @@
+"""Fixtures: a throwaway project with packs and credentials."""
+
+import json
+from pathlib import Path
+
+import pytest
+
+
+def write_json(path: Path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, indent=2), encoding='utf-8')
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch) -> Path:
+    """A project directory, made the working directory, with two packs.
+
+    ``base`` has a server from a shared fragment and one with placeholders;
+    ``extra`` adds a second server with placeholders.
+    """
+    packs = tmp_path / "mcp_agent_packs"
+    write_json(packs / "_fragments" / "time.json",
+               {"command": "uvx", "args": ["mcp-server-time"], "type": "stdio"})
+    write_json(packs / "base" / "mcp_template.json", {
+        "servers": {
+            "time": {"$fragment": "time"},
+            "api": {"command": "api-mcp", "env": {"API_KEY": "%%api_key%%",
+                                                  "USER": "%%user%%"},
+                    "type": "stdio"},
+        },
+        "inputs": [],
+    })
+    (packs / "base" / "README.md").write_text("# Base pack\n", encoding='utf-8')
+    write_json(packs / "extra" / "mcp_template.json", {
+        "servers": {
+            "search": {"command": "search-mcp", "args": ["--token", "%%token%%"]},
+        },
+    })
+    write_json(tmp_path / "credentials" / "api.json",
+               {"api_key": "key-1", "account": {"user": "me"}})
+    write_json(tmp_path / "credentials" / "search.json", {"token": "tok-1"})
+    (tmp_path / ".vscode").mkdir()
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def read_json():
+    def read(path) -> dict:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return read
@@ -0,0 +1,57 @@
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+from conftest import write_json
+from mcp_agents.batch import generate_batch, load_batch_targets
+from mcp_agents.generator import MCPConfigGenerator
+
+BASE = "mcp_agent_packs/base/mcp_template.json"
+
+
+def test_load_batch_targets(project):
+    write_json(project / "targets.json", [
+        {"credentials_dir": "credentials", "output_path": "out/a.json", "note": "x"}])
+    assert load_batch_targets("targets.json") == [("credentials", "out/a.json")]
+
+    write_json(project / "targets.json", [{"credentials_dir": "credentials"}])
+    with pytest.raises(ValueError, match="Batch target 1 .* needs 'credentials_dir'"):
+        load_batch_targets("targets.json")
+
+    (project / "targets.json").write_text("[", encoding='utf-8')
+    with pytest.raises(ValueError, match="Invalid JSON in batch file"):
+        load_batch_targets("targets.json")
+
+
+def test_batch_parses_the_template_and_credentials_once(
+        project, monkeypatch, read_json):
+    reads: Counter[str] = Counter()
+    read_bytes = Path.read_bytes
+
+    def counting_read_bytes(path: Path) -> bytes:
+        reads[path.name] += 1
+        return read_bytes(path)
+
+    monkeypatch.setattr(Path, "read_bytes", counting_read_bytes)
+    targets = [("credentials", f"out/{i}/mcp.json") for i in range(3)]
+    results = generate_batch(BASE, targets)
+
+    assert [result.error for result in results] == [None, None, None]
+    assert reads["mcp_template.json"] == 1 and reads["api.json"] == 1
+    for i in range(3):
+        assert read_json(f"out/{i}/mcp.json")["servers"]["api"]["env"]["USER"] == "me"
+        output = MCPConfigGenerator(BASE, "credentials", f"out/{i}/mcp.json")
+        assert output.is_up_to_date()
+
+
+def test_failing_target_does_not_stop_the_others(project, read_json):
+    write_json(project / "broken" / "api.json", {"user": "me"})
+    results = generate_batch(BASE, [("broken", "out/a.json"), ("missing", "out/b.json"),
+                                    ("credentials", "out/c.json")])
+
+    assert "Missing credentials for api" in results[0].error
+    assert "Credentials directory not found" in results[1].error
+    assert results[2].error is None
+    assert not Path("out/a.json").exists()
+    assert read_json("out/c.json")["servers"]["api"]["env"]["API_KEY"] == "key-1"
@@ -0,0 +1,79 @@
+import os
+from pathlib import Path
+
+from conftest import write_json
+from mcp_agents.checks import (ValidationCache, check_pack, check_packs,
+                               packs_affected_by)
+from mcp_agents.generator import MCPConfigGenerator
+
+
+def configurations() -> list[dict[str, str]]:
+    return MCPConfigGenerator().discover_mcp_configurations()
+
+
+def test_check_pack_reports_placeholders_and_sources(project):
+    base = configurations()[0]
+    result = check_pack(base, "credentials")
+    assert result.ok
+    assert result.placeholders == {"api": ["api_key", "user"]}
+    assert result.sources == [base["path"], "mcp_agent_packs/_fragments/time.json"]
+    assert set(result.timings) == {"parse", "structure", "placeholders", "credentials"}
+
+
+def test_check_pack_reports_errors_by_phase(project):
+    write_json(project / "credentials" / "api.json", {"user": "me"})
+    result = check_pack(configurations()[0], "credentials")
+    assert result.errors == ["credentials: Missing credentials for api: %api_key%"]
+
+    (project / "mcp_agent_packs" / "extra" / "mcp_template.json").write_text("{")
+    assert check_pack(configurations()[1]).errors[0].startswith("parse: Invalid JSON")
+
+
+def test_check_pack_needs_no_writable_directories(project, monkeypatch):
+    access = os.access
+    monkeypatch.setattr("os.access",
+                        lambda path, mode: mode != os.W_OK and access(path, mode))
+
+    def read_only(*args, **kwargs):
+        raise PermissionError("read-only file system")
+
+    monkeypatch.setattr("tempfile.mkstemp", read_only)
+    result = check_pack(configurations()[0], "credentials")
+    assert result.ok, result.errors
+    assert "credentials" in result.timings
+
+
+def seeded_cache(project) -> ValidationCache:
+    cache = ValidationCache()
+    for result in check_packs(configurations(), jobs=1):
+        cache.put(result, None)
+    return cache
+
+
+def test_packs_affected_by_changes(project):
+    cache = seeded_cache(project)
+
+    def affected(*paths: str) -> list[str]:
+        return [config["name"] for config in packs_affected_by(
+            {Path(path) for path in paths}, configurations(), cache, ["credentials"])]
+
+    assert affected("README.md") == []
+    assert affected("mcp_agent_packs/extra/README.md") == ["extra"]
+    assert affected("mcp_agent_packs/_fragments/time.json") == ["base"]
+    assert affected("credentials/search.json") == ["extra"]
+    assert affected("generate_mcp_config.py") == ["base", "extra"]
+
+
+def test_validation_cache_key_follows_contents(project):
+    cache = seeded_cache(project)
+    cache.save()
+    assert ValidationCache().get("base", None) is not None
+
+    write_json(project / "mcp_agent_packs" / "_fragments" / "time.json",
+               {"command": "t2"})
+    assert ValidationCache().get("base", None) is None
+    assert ValidationCache().get("extra", None) is not None
+    # Credential files count only when placeholders are resolved
+    write_json(project / "credentials" / "search.json", {"token": "tok-2"})
+    assert ValidationCache().get("extra", None) is not None
+    assert ValidationCache().get("extra", "credentials") is None
@@ -0,0 +1,277 @@
+import json
+import shutil
+import subprocess
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+from conftest import write_json
+from mcp_agents.cli import main
+
+
+def run(capsys, *argv: str) -> tuple[int, str]:
+    code = main(list(argv))
+    return code, capsys.readouterr().out
+
+
+def test_pack_is_rendered_then_up_to_date(project, capsys, read_json):
+    code, out = run(capsys, "--pack", "base")
+    assert code == 0
+    assert "MCP configuration generated successfully" in out
+    assert read_json(".vscode/mcp.json")["servers"]["api"]["env"]["API_KEY"] == "key-1"
+
+    code, out = run(capsys, "--pack", "base")
+    assert code == 0
+    assert ".vscode/mcp.json is up to date, nothing to do" in out
+
+    code, out = run(capsys, "--pack", "base", "--force", "-v")
+    assert code == 0
+    assert "Processing server: api" in out
+    assert "Configuration unchanged" in out
+
+
+def test_every_file_is_read_once_per_run(project, capsys, monkeypatch):
+    reads: Counter[str] = Counter()
+    read_bytes = Path.read_bytes
+
+    def counting_read_bytes(path: Path) -> bytes:
+        reads[path.name] += 1
+        return read_bytes(path)
+
+    monkeypatch.setattr(Path, "read_bytes", counting_read_bytes)
+    run(capsys, "--pack", "base")
+    # The output is read once, to keep it untouched if nothing changed
+    assert reads == {"mcp_template.json": 1, "time.json": 1, "api.json": 1,
+                     "mcp.json": 1}
+
+    # Unchanged files are not hashed again for the up-to-date check
+    reads.clear()
+    code, out = run(capsys, "--pack", "base")
+    assert "up to date" in out
+    assert not reads
+
+
+def test_interactive_selection(project, capsys, monkeypatch, read_json):
+    answers = iter(["", "x", "9", "2"])
+    monkeypatch.setattr("builtins.input", lambda prompt: next(answers))
+    code, out = run(capsys)
+    assert code == 0
+    assert "Please enter a number!" in out
+    assert "Please enter a valid number!" in out
+    assert "Invalid selection" in out
+    assert "Selected: extra" in out
+    search = read_json(".vscode/mcp.json")["servers"]["search"]
+    assert search["args"] == ["--token", "tok-1"]
+
+
+def test_errors_are_reported_with_exit_code(project, capsys):
+    (project / "credentials" / "api.json").unlink()
+    code, out = run(capsys, "--pack", "base")
+    assert code == 1
+    assert "Credentials file not found" in out
+
+    code, out = run(capsys, "--pack", "nope")
+    assert code == 1
+    assert "No MCP configuration matches 'nope'" in out
+
+
+def test_quiet_run_reports_progress_only_on_failure(project, capsys):
+    code, out = run(capsys, "--pack", "base", "-q")
+    assert code == 0
+    assert out == ""
+
+    write_json(project / "credentials" / "api.json", {"user": "me"})
+    code, out = run(capsys, "--pack", "base", "-q")
+    assert code == 1
+    assert "Loaded template" in out
+    assert "Missing credentials for api" in out
+
+
+def test_jsonl_progress(project, capsys):
+    code, out = run(capsys, "--pack", "base", "--log-format", "jsonl",
+                    "--log-level", "debug")
+    assert code == 0
+    kinds = [json.loads(line)["kind"] for line in out.splitlines()]
+    assert "server.rendered" in kinds and "output.saved" in kinds
+
+
+def test_list(project, capsys):
+    code, out = run(capsys, "--list")
+    assert code == 0
+    assert "base: Base pack" in out
+
+    code, out = run(capsys, "--list", "--json")
+    assert [config["name"] for config in json.loads(out)] == ["base", "extra"]
+
+
+def test_check_all(project, capsys):
+    code, out = run(capsys, "--check-all", "--fixtures", "credentials", "--jobs", "1")
+    assert code == 0
+    assert "2/2 packs valid" in out
+
+    write_json(project / "mcp_agent_packs" / "extra" / "mcp_template.json",
+               {"servers": []})
+    code, out = run(capsys, "--check-all", "--json", "--jobs", "2")
+    assert code == 1
+    report = json.loads(out)
+    assert not report["ok"]
+    assert [pack["ok"] for pack in report["packs"]] == [True, False]
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+def test_check_changed(project, capsys):
+    def git(*args: str):
+        subprocess.run(["git", *args], check=True, capture_output=True)
+
+    git("init", "-q")
+    git("-c", "user.name=t", "-c", "user.email=t@example.org", "commit", "-q",
+        "--allow-empty", "-m", "init")
+    # Seeds the validation cache
+    run(capsys, "--check-all", "--jobs", "1")
+
+    code, out = run(capsys, "--check-changed", "--json")
+    assert code == 0
+    assert json.loads(out)["packs"] == []
+
+    write_json(project / "mcp_agent_packs" / "_fragments" / "time.json",
+               {"command": "t2"})
+    git("add", "mcp_agent_packs/_fragments/time.json")
+    code, out = run(capsys, "--check-changed")
+    assert code == 0
+    assert "base:" in out and "extra:" not in out
+
+
+def test_all_packs_render_to_their_own_outputs(project, capsys, read_json):
+    code, out = run(capsys, "--all", "--jobs", "2", "--json")
+    assert code == 0
+    results = json.loads(out)
+    assert {r["name"]: r["status"] for r in results} == {"base": "written",
+                                                         "extra": "written"}
+    assert "api" in read_json(".vscode/mcp.base.json")["servers"]
+    assert "search" in read_json(".vscode/mcp.extra.json")["servers"]
+
+    code, out = run(capsys, "--all", "--output", "out/{pack}.json")
+    assert code == 0
+    assert "base → out/base.json: written" in out
+
+    code, out = run(capsys, "--all", "--output", "out/{pack}.json")
+    assert "base → out/base.json: up to date" in out
+
+    with pytest.raises(SystemExit):
+        main(["--all", "--jobs", "0"])
+    code, out = run(capsys, "--all", "--timings")
+    assert code == 1
+    assert "need exactly one pack" in out
+
+
+def test_compose(project, capsys, read_json):
+    code, _ = run(capsys, "--pack", "base", "--pack", "extra", "--compose")
+    assert code == 0
+    assert list(read_json(".vscode/mcp.json")["servers"]) == ["time", "api", "search"]
+
+    # The composed output is no up-to-date rendering of one of its packs
+    code, out = run(capsys, "--pack", "base")
+    assert code == 0
+    assert "up to date" not in out
+    assert "search" not in read_json(".vscode/mcp.json")["servers"]
+
+    write_json(project / "mcp_agent_packs" / "extra" / "mcp_template.json",
+               {"servers": {"time": {"command": "other"}}})
+    code, out = run(capsys, "--pack", "base", "--pack", "extra", "--compose")
+    assert code == 1
+    assert "server 'time' is defined differently" in out
+
+
+def test_render_cache_restores_a_pack(project, capsys):
+    run(capsys, "--pack", "base")
+    base = Path(".vscode/mcp.json").read_bytes()
+    run(capsys, "--pack", "extra")
+    code, out = run(capsys, "--pack", "base")
+    assert code == 0
+    assert "Restored .vscode/mcp.json from the render cache" in out
+    assert Path(".vscode/mcp.json").read_bytes() == base
+
+
+def test_targets(project, capsys, read_json):
+    code, out = run(capsys, "--pack", "base", "--target", "vscode",
+                    "--target", "cursor", "--target", "claude=client/claude.json")
+    assert code == 0
+    assert "Output file: .cursor/mcp.json" in out
+    assert "api" in read_json(".vscode/mcp.json")["servers"]
+    assert "api" in read_json(".cursor/mcp.json")["mcpServers"]
+    assert "api" in read_json("client/claude.json")["mcpServers"]
+
+    code, out = run(capsys, "--pack", "base", "--target", "cursor", "--batch", "t.json")
+    assert code == 1
+    assert "--target cannot be combined with --batch" in out
+
+
+def test_batch(project, capsys, read_json):
+    write_json(project / "other" / "api.json", {"api_key": "key-2", "user": "you"})
+    write_json(project / "targets.json", [
+        {"credentials_dir": "credentials", "output_path": "out/a/mcp.json"},
+        {"credentials_dir": "other", "output_path": "out/b/mcp.json"},
+        {"credentials_dir": "missing", "output_path": "out/c/mcp.json"},
+    ])
+    code, out = run(capsys, "--pack", "base", "--batch", "targets.json")
+    assert code == 1
+    assert "2/3 targets" in out
+    assert read_json("out/a/mcp.json")["servers"]["api"]["env"]["API_KEY"] == "key-1"
+    assert read_json("out/b/mcp.json")["servers"]["api"]["env"]["USER"] == "you"
+
+    write_json(project / "targets.json", {"not": "a list"})
+    code, out = run(capsys, "--pack", "base", "--batch", "targets.json")
+    assert code == 1
+    assert "must contain a JSON list" in out
+
+
+def test_prepare_script_runs_before_rendering(project, capsys):
+    (project / "mcp_agent_packs" / "base" / "prepare.py").write_text(
+        "print('preparing')\n", encoding='utf-8')
+    code, out = run(capsys, "--pack", "base", "-v")
+    assert code == 0
+    assert "[base] preparing" in out
+    assert "Preparation script" in out and "finished" in out
+
+    (project / "mcp_agent_packs" / "base" / "prepare.py").write_text(
+        "raise RuntimeError('fail')\n", encoding='utf-8')
+    code, out = run(capsys, "--pack", "base", "--force")
+    assert code == 1
+
+
+def test_timings(project, capsys, read_json):
+    code, out = run(capsys, "--pack", "base", "--timings")
+    assert code == 0
+    assert "Timings:" in out and "Slowest of 2 server(s)" in out
+
+    code, out = run(capsys, "--pack", "base", "--force", "--timings", "t/timings.json")
+    assert code == 0
+    timings = read_json("t/timings.json")
+    assert {"load", "resolve", "render", "write"} <= timings["phases"].keys()
+    assert set(timings["servers"]) == {"time", "api"}
+
+
+def test_memory_profile(project, capsys, read_json):
+    code, out = run(capsys, "--pack", "base", "--memory-profile")
+    assert code == 0
+    assert "Memory by phase:" in out and "Peak traced" in out
+
+    code, out = run(capsys, "--pack", "base", "--force", "--memory-profile", "m.json")
+    assert code == 0
+    assert "render" in read_json("m.json")["memory"]
+
+
+def test_profile(project, capsys):
+    code, out = run(capsys, "--pack", "base", "--profile", "prof/run")
+    assert code == 0
+    assert "Profile written to prof/run.pstats" in out
+    collapsed = Path("prof/run.collapsed").read_text(encoding='utf-8').splitlines()
+    assert collapsed and all(line.rsplit(" ", 1)[1].isdigit() for line in collapsed)
+
+
+def test_watch_needs_one_pack_and_no_quiet(project, capsys):
+    with pytest.raises(SystemExit):
+        main(["--pack", "base", "--watch", "-q"])
+    code, out = run(capsys, "--all", "--watch")
+    assert code == 1
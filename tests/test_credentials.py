@@ -0,0 +1,89 @@
+import hashlib
+import os
+from pathlib import Path
+
+import pytest
+
+from conftest import write_json
+from mcp_agents.common import digest_index
+from mcp_agents.credentials import CredentialIndex, FlatCredentials
+from mcp_agents.generator import MCPConfigGenerator
+
+
+def test_nested_values_are_found_by_innermost_key(tmp_path):
+    flat = FlatCredentials(tmp_path / "c.json", {
+        "google": {"client_id": "id", "accounts": [{"user_email": "me@example.org"}]},
+        "port": 8080,
+    })
+    assert flat.values == {"google.client_id": "id",
+                           "google.accounts[0].user_email": "me@example.org"}
+    assert flat.resolve(["client_id", "user_email", "port", "missing"]) == {
+        "client_id": "id", "user_email": "me@example.org"}
+
+
+def test_repeated_key_with_equal_values_is_not_ambiguous(tmp_path):
+    flat = FlatCredentials(tmp_path / "c.json", {"a": {"id": "x"}, "b": {"id": "x"}})
+    assert flat.lookup("id") == "x"
+    assert flat.ambiguous_keys() == {}
+
+
+def test_repeated_key_with_different_values_is_ambiguous(tmp_path):
+    flat = FlatCredentials(tmp_path / "c.json", {"a": {"id": "x"}, "b": [{"id": "y"}]})
+    assert flat.ambiguous_keys() == {"id": ["a.id", "b[0].id"]}
+    with pytest.raises(ValueError,
+                       match=r"Ambiguous credential 'id' .* a\.id, b\[0\]\.id"):
+        flat.lookup("id")
+
+
+def test_index_rereads_a_file_only_after_it_changed(tmp_path):
+    path = tmp_path / "c.json"
+    write_json(path, {"key": "one"})
+    index = CredentialIndex()
+    first = index.get(path)
+    assert index.get(path) is first
+
+    write_json(path, {"key": "two!"})
+    second = index.get(path)
+    assert second is not first
+    assert second.lookup("key") == "two!"
+    assert second.digest != first.digest
+
+
+def test_index_reports_invalid_json(tmp_path):
+    path = tmp_path / "c.json"
+    path.write_text("{", encoding='utf-8')
+    with pytest.raises(ValueError, match="Invalid JSON in credentials file"):
+        CredentialIndex().get(path)
+
+
+def test_index_follows_stat_changes(tmp_path):
+    path = tmp_path / "c.json"
+    write_json(path, {"key": "aaa"})
+    index = CredentialIndex()
+    index.get(path)
+    write_json(path, {"key": "bbb"})
+    # Same size: the modification time alone invalidates the entry
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert index.get(path).lookup("key") == "bbb"
+
+
+def test_index_shares_the_digest_of_the_bytes_it_read(tmp_path, monkeypatch):
+    path = tmp_path / "c.json"
+    write_json(path, {"key": "one"})
+    flat = CredentialIndex().get(path)
+    assert flat.digest == hashlib.sha256(path.read_bytes()).hexdigest()
+
+    def no_read(self):
+        raise AssertionError(f"{self} read again")
+
+    monkeypatch.setattr(Path, "read_bytes", no_read)
+    assert digest_index.get(path) == flat.digest
+
+
+def test_ambiguous_credential_fails_the_render(project):
+    write_json(project / "credentials" / "api.json",
+               {"api_key": "k", "work": {"user": "a"}, "home": {"user": "b"}})
+    generator = MCPConfigGenerator("mcp_agent_packs/base/mcp_template.json")
+    with pytest.raises(ValueError, match="Ambiguous credential 'user'"):
+        generator.run()
@@ -0,0 +1,73 @@
+import json
+import pickle
+from pathlib import Path
+
+from mcp_agents.events import (DEBUG, ERROR, INFO, SILENT, WARNING, BufferedHandler,
+                               Event, StreamHandler, emit, handler_level, json_line)
+from mcp_agents.generator import MCPConfigGenerator
+
+
+def test_event_level_defaults_to_the_level_of_its_kind():
+    assert Event("server.rendered").level == DEBUG
+    assert Event("server.unused_credentials").level == WARNING
+    assert Event("output.saved").level == INFO
+    assert Event("server.rendered", level=ERROR).level == ERROR
+
+
+def test_events_below_the_handler_level_are_never_built(monkeypatch):
+    received = []
+
+    class Handler:
+        level = WARNING
+
+        def __call__(self, event):
+            received.append(event)
+
+    built = []
+    monkeypatch.setattr("mcp_agents.events.Event",
+                        lambda *args: built.append(args) or Event(*args))
+    emit(Handler(), "server.rendered", server="a")
+    emit(Handler(), "packs.missing", path="p")
+    emit(None, "watch.error", error="e")
+    assert [event.kind for event in received] == ["packs.missing"]
+    assert len(built) == 1
+    assert handler_level(None) == SILENT
+    assert handler_level(received.append) == DEBUG
+
+
+def test_json_line():
+    event = Event("output.saved", {"path": Path("a/b.json"), "changes": {"x": "added"}})
+    data = json.loads(json_line(event))
+    assert data["level"] == "info" and data["kind"] == "output.saved"
+    assert data["path"] == "a/b.json" and data["changes"] == {"x": "added"}
+
+
+def test_stream_handler_writes_events_at_its_level(capsys):
+    handler = StreamHandler(lambda event: event.kind, level=INFO)
+    handler(Event("server.rendered"))
+    handler(Event("output.saved"))
+    StreamHandler(lambda event: None)(Event("output.saved"))
+    StreamHandler(lambda event: event.kind, to_stderr=True)(Event("watch.error"))
+    captured = capsys.readouterr()
+    assert captured.out == "output.saved\n"
+    assert captured.err == "watch.error\n"
+    # Worker processes get a copy that writes to their own stream
+    handler = StreamHandler(json_line, to_stderr=True, level=ERROR)
+    copy = pickle.loads(pickle.dumps(handler))
+    assert (copy.render, copy.to_stderr, copy.level) == (json_line, True, ERROR)
+
+
+def test_buffered_handler_reports_the_last_events_on_flush():
+    received = []
+    handler = StreamHandler(lambda event: received.append(event.kind) or None)
+    buffered = BufferedHandler(handler, capacity=2)
+    for kind in ("a", "b", "server.rendered", "c"):
+        buffered(Event(kind))
+    assert not received
+    buffered.flush()
+    assert received == ["b", "c"]
+
+
+def test_generator_is_quiet_without_a_handler(project, capsys):
+    MCPConfigGenerator("mcp_agent_packs/base/mcp_template.json").run()
+    assert capsys.readouterr() == ("", "")
@@ -0,0 +1,342 @@
+import hashlib
+import json
+import os
+import stat
+from pathlib import Path
+
+import pytest
+
+from conftest import write_json
+from mcp_agents.generator import MCPConfigGenerator, RenderCache
+
+BASE = "mcp_agent_packs/base/mcp_template.json"
+EXTRA = "mcp_agent_packs/extra/mcp_template.json"
+
+
+def generator_for(template: str = BASE, output: str = ".vscode/mcp.json"
+                  ) -> MCPConfigGenerator:
+    return MCPConfigGenerator(template, "credentials", output)
+
+
+def test_run_renders_credentials_and_fragments(project, read_json):
+    assert generator_for().run() == [True]
+
+    config = read_json(".vscode/mcp.json")
+    assert config["servers"]["time"] == {"command": "uvx", "args": ["mcp-server-time"],
+                                         "type": "stdio"}
+    assert config["servers"]["api"]["env"] == {"API_KEY": "key-1", "USER": "me"}
+
+
+def test_missing_credential_file_is_reported(project):
+    (project / "credentials" / "api.json").unlink()
+    with pytest.raises(FileNotFoundError, match="Credentials file not found"):
+        generator_for().run()
+
+
+def test_manifest_makes_unchanged_inputs_up_to_date(project):
+    generator = generator_for()
+    assert not generator.is_up_to_date()
+    generator.run()
+    assert generator_for().is_up_to_date()
+
+    # Rewriting a file with the same content does not make it stale
+    (project / "credentials" / "api.json").write_bytes(
+        (project / "credentials" / "api.json").read_bytes())
+    assert generator_for().is_up_to_date()
+
+
+@pytest.mark.parametrize("change", ["credentials", "template", "fragment", "output"])
+def test_manifest_detects_changed_inputs(project, change):
+    generator_for().run()
+    if change == "credentials":
+        write_json(project / "credentials" / "api.json",
+                   {"api_key": "key-2", "user": "me"})
+    elif change == "template":
+        write_json(project / BASE, {"servers": {"time": {"$fragment": "time"}}})
+    elif change == "fragment":
+        write_json(project / "mcp_agent_packs" / "_fragments" / "time.json",
+                   {"command": "t"})
+    else:
+        (project / ".vscode" / "mcp.json").write_text("{}", encoding='utf-8')
+    assert not generator_for().is_up_to_date()
+
+
+def test_manifest_depends_on_credentials_dir_and_prepare(project):
+    generator_for().run()
+    other = MCPConfigGenerator(BASE, "other", ".vscode/mcp.json")
+    assert not other.is_up_to_date()
+
+    with_prepare = generator_for()
+    with_prepare.prepare_scripts = [Path("mcp_agent_packs/base/prepare.py")]
+    assert not with_prepare.is_up_to_date()
+
+
+def test_manifest_depends_on_the_selected_templates(project):
+    def composed(*templates: str) -> MCPConfigGenerator:
+        generator = generator_for(templates[0])
+        generator.compose_with = [Path(template) for template in templates[1:]]
+        return generator
+
+    composed(BASE, EXTRA).run()
+    assert composed(BASE, EXTRA).is_up_to_date()
+    # The sources of the composition include those of the base pack alone
+    assert not generator_for().is_up_to_date()
+    assert not composed(EXTRA, BASE).is_up_to_date()
+
+
+def test_other_generator_code_invalidates_the_caches(project, monkeypatch):
+    generator_for().run()
+    assert generator_for().is_up_to_date()
+    assert MCPConfigGenerator().discover_mcp_configurations()
+    events = []
+
+    monkeypatch.setattr("mcp_agents.generator.cache_key", lambda: "changed")
+    monkeypatch.setattr("mcp_agents.templates.cache_key", lambda: "changed")
+    assert not generator_for().is_up_to_date()
+    generator = generator_for()
+    generator.on_event = events.append
+    generator.compile()
+    loaded = [e.fields["cached"] for e in events if e.kind == "template.loaded"]
+    assert loaded == [False]
+    index = MCPConfigGenerator()._load_discovery_index()
+    assert index["cache_key"] == "changed" and not index["packs"]
+
+
+def test_save_leaves_identical_output_untouched(project):
+    generator = generator_for()
+    config = generator.generate_config()
+    assert generator.save_config(config)
+    mtime = Path(".vscode/mcp.json").stat().st_mtime_ns
+    assert not generator.save_config(config)
+    assert Path(".vscode/mcp.json").stat().st_mtime_ns == mtime
+    assert not list(Path(".vscode").glob(".mcp.json.*.tmp"))
+
+
+def test_server_changes_classifies_servers(project):
+    generator = generator_for()
+    previous = json.dumps({"servers": {"time": {"command": "old"}, "gone": {},
+                                       "api": {"command": "api-mcp"}}}).encode()
+    data = json.dumps({"servers": {"time": {"command": "new"},
+                                   "api": {"command": "api-mcp"},
+                                   "added": {}}}).encode()
+    assert generator.server_changes(previous, data) == {
+        "time": "changed", "api": "unchanged", "added": "added", "gone": "removed"}
+
+
+def test_regenerate_rerenders_only_affected_servers(project, read_json):
+    events = []
+    generator = generator_for()
+    generator.on_event = events.append
+    generator.run()
+    rendered_before = generator.last_config
+
+    credentials = project / "credentials" / "search.json"
+    write_json(credentials, {"token": "unused by base"})
+    events.clear()
+    config = generator.regenerate({credentials})
+    # search.json is no input of the base pack: everything is re-rendered
+    assert config["servers"]["api"]["env"]["API_KEY"] == "key-1"
+
+    api = project / "credentials" / "api.json"
+    write_json(api, {"api_key": "key-2", "account": {"user": "me"}})
+    events.clear()
+    config = generator.regenerate({api})
+    assert config["servers"]["api"]["env"]["API_KEY"] == "key-2"
+    # The time server was not touched, nor rendered again
+    assert config["servers"]["time"] is rendered_before["servers"]["time"]
+    started = [e.fields["server"] for e in events if e.kind == "server.started"]
+    assert started == ["api"]
+
+    # A value that did not change does not re-render the server
+    write_json(api, {"api_key": "key-2", "account": {"user": "me"}, "unused": "x"})
+    events.clear()
+    generator.regenerate({api})
+    assert not [e for e in events if e.kind == "server.started"]
+    assert generator.consumed_credentials[Path("credentials/api.json")] == \
+        generator.credential_index.get(api).digest
+
+
+def test_reverse_index_maps_credential_files_to_servers(project):
+    generator = generator_for()
+    generator.compose_with = [Path(EXTRA)]
+    generator.run()
+    assert generator.dependents == {
+        project / "credentials" / "api.json": {"api"},
+        project / "credentials" / "search.json": {"search"},
+    }
+
+    events = []
+    generator.on_event = events.append
+    write_json(project / "credentials" / "search.json", {"token": "tok-2"})
+    config = generator.regenerate({Path("credentials/search.json")})
+    assert config["servers"]["search"]["args"] == ["--token", "tok-2"]
+    started = [e.fields["server"] for e in events if e.kind == "server.started"]
+    assert started == ["search"]
+
+    # A template change is no credential change: every server is rendered
+    events.clear()
+    generator.regenerate({Path(BASE)})
+    assert [e.fields["server"] for e in events if e.kind == "server.started"] == \
+        ["time", "api", "search"]
+
+
+def test_compile_reuses_the_compiled_template(project):
+    generator = generator_for()
+    compiled = generator.compile()
+    assert generator.compile() is compiled
+    write_json(project / BASE, {"servers": {"x": {"command": "x"}}})
+    assert generator.compile() is not compiled
+
+
+def test_compiled_cache_is_used_by_a_new_generator(project):
+    events = []
+    generator_for().compile()
+    generator = generator_for()
+    generator.on_event = events.append
+    generator.compile()
+    assert [e.fields["cached"] for e in events if e.kind == "template.loaded"] == [True]
+
+
+def test_invalid_template_is_reported(project):
+    write_json(project / BASE, {"servers": {}})
+    with pytest.raises(ValueError, match="'servers' section cannot be empty"):
+        generator_for().compile()
+
+
+def test_discovery_uses_and_refreshes_the_index(project):
+    generator = MCPConfigGenerator()
+    names = [config["name"] for config in generator.discover_mcp_configurations()]
+    assert names == ["base", "extra"]
+    assert (project / ".mcp_cache" / "discovery.json").exists()
+
+    (project / "mcp_agent_packs" / "extra" / "prepare.py").write_text(
+        "", encoding='utf-8')
+    write_json(project / "mcp_agent_packs" / "third" / "mcp_template.json",
+               {"servers": {"t": {"command": "t"}}})
+    configurations = MCPConfigGenerator().discover_mcp_configurations()
+    assert [config["name"] for config in configurations] == ["base", "extra", "third"]
+    assert configurations[1]["prepare_script"].endswith("prepare.py")
+    assert generator.describe_configuration(configurations[0]) == "Base pack"
+    assert (generator.describe_configuration(configurations[1])
+            == "No description available")
+
+
+def test_discovery_rescans_only_changed_packs(project, monkeypatch):
+    MCPConfigGenerator().discover_mcp_configurations()
+    scanned = []
+    scan_pack = MCPConfigGenerator._scan_pack
+
+    def counting_scan(pack_dir, mtime_ns):
+        scanned.append(pack_dir.name)
+        return scan_pack(pack_dir, mtime_ns)
+
+    monkeypatch.setattr(MCPConfigGenerator, "_scan_pack", staticmethod(counting_scan))
+    assert len(MCPConfigGenerator().discover_mcp_configurations()) == 2
+    assert scanned == []
+
+    (project / "mcp_agent_packs" / "extra" / "mcp_template.json").unlink()
+    configurations = MCPConfigGenerator().discover_mcp_configurations()
+    names = [config["name"] for config in configurations]
+    assert names == ["base"] and scanned == ["extra"]
+
+
+def test_discovery_reads_no_readme(project, monkeypatch):
+    opened = []
+    real_open = open
+
+    def recording_open(file, *args, **kwargs):
+        opened.append(Path(file).name)
+        return real_open(file, *args, **kwargs)
+
+    monkeypatch.setattr("builtins.open", recording_open)
+    generator = MCPConfigGenerator()
+    configurations = generator.discover_mcp_configurations()
+    assert "README.md" not in opened
+    assert generator.describe_configuration(configurations[0]) == "Base pack"
+    assert "README.md" in opened
+
+
+def test_render_cache_restores_a_previous_output(project, read_json):
+    generator = generator_for()
+    generator.run()
+    cache = RenderCache()
+    cache.store(generator)
+    cache.save()
+    expected = Path(".vscode/mcp.json").read_bytes()
+
+    # Another pack is rendered to the same output in between
+    other = generator_for(EXTRA)
+    other.run()
+    assert not generator_for().is_up_to_date()
+
+    restored = generator_for()
+    assert RenderCache().restore(restored)
+    assert Path(".vscode/mcp.json").read_bytes() == expected
+    assert generator_for().is_up_to_date()
+
+    write_json(project / "credentials" / "api.json", {"api_key": "key-3", "user": "me"})
+    assert not RenderCache().restore(generator_for())
+
+
+def test_render_cache_evicts_the_least_recently_used_entries(project):
+    base, extra = generator_for(), generator_for(EXTRA)
+    base.run()
+    extra.run()
+    size = len(extra.last_output)
+    cache = RenderCache(max_bytes=size)
+    cache.store(base)
+    cache.store(extra)
+    cache.save()
+
+    blobs = {path.name for path in cache.root.iterdir()} - {"index.json"}
+    assert blobs == {hashlib.sha256(extra.last_output).hexdigest()}
+    assert not RenderCache().restore(generator_for())
+
+
+def test_render_cache_rejects_a_changed_blob(project):
+    generator = generator_for()
+    generator.run()
+    cache = RenderCache()
+    cache.store(generator)
+    cache.save()
+    [blob] = [path for path in cache.root.iterdir() if path.name != "index.json"]
+    if os.name != "nt":
+        assert stat.S_IMODE(blob.stat().st_mode) == 0o600
+        assert stat.S_IMODE(cache.root.stat().st_mode) == 0o700
+
+    generator_for(EXTRA).run()
+    blob.write_bytes(b"{}")
+    assert not RenderCache().restore(generator_for())
+
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX permissions")
+def test_write_output_keeps_the_mode_of_the_replaced_file(project):
+    output = project / ".vscode" / "mcp.json"
+    output.write_text("{}", encoding='utf-8')
+    output.chmod(0o640)
+    generator_for().run()
+    assert stat.S_IMODE(output.stat().st_mode) == 0o640
+
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX permissions")
+def test_write_output_creates_files_with_the_umask(project):
+    umask = os.umask(0o027)
+    try:
+        generator_for().run()
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE((project / ".vscode" / "mcp.json").stat().st_mode) == 0o640
+
+
+@pytest.mark.skipif(os.name == "nt", reason="symbolic links need privileges")
+def test_write_output_replaces_the_target_of_a_symlink(project, read_json):
+    target = project / "dotfiles" / "mcp.json"
+    target.parent.mkdir()
+    target.write_text("{}", encoding='utf-8')
+    link = project / ".vscode" / "mcp.json"
+    link.symlink_to(target)
+
+    generator_for().run()
+    assert link.is_symlink()
+    assert "api" in read_json(target)["servers"]
+    assert generator_for().is_up_to_date()
@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from mcp_agents.importtime import (IMPORT_BUDGETS_MS, LAZY_MODULES, imported_modules,
+                                   measure_import_ms)
+
+# Wall time depends on the machine: the budgets are only asserted where
+# $MCP_AGENTS_IMPORT_BUDGET_SCALE is set, e.g. to 1 on a quiet machine
+SCALE = os.environ.get("MCP_AGENTS_IMPORT_BUDGET_SCALE")
+
+
+@pytest.mark.skipif(SCALE is None, reason="MCP_AGENTS_IMPORT_BUDGET_SCALE is not set")
+@pytest.mark.parametrize("module", IMPORT_BUDGETS_MS)
+def test_import_is_within_budget(module):
+    budget = IMPORT_BUDGETS_MS[module] * float(SCALE or 1)
+    assert measure_import_ms(module, runs=5) <= budget
+
+
+@pytest.mark.parametrize("module", [*IMPORT_BUDGETS_MS, "mcp_agents.cli"])
+def test_import_loads_no_slow_standard_modules(module):
+    assert not imported_modules(module).intersection(LAZY_MODULES)
+
+
+def test_cli_import_loads_no_render_machinery():
+    render = {"mcp_agents.batch", "mcp_agents.pipeline", "mcp_agents.prepare",
+              "mcp_agents.watch", "mcp_agents.generator", "mcp_agents.checks"}
+    assert not imported_modules("mcp_agents.cli") & render
+
+
+def test_package_import_loads_no_submodules():
+    code = ("import sys, mcp_agents; "
+            "print(sorted(m for m in sys.modules if m.startswith('mcp_agents.')))")
+    src = str(Path(__file__).resolve().parent.parent / "src")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True,
+                            text=True, env={**os.environ, "PYTHONPATH": src},
+                            check=True)
+    assert result.stdout.strip() == "[]"
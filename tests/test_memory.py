@@ -0,0 +1,51 @@
+import tracemalloc
+
+from mcp_agents.memory import MIN_LINE_BYTES, MemoryProfile
+
+kept: list[bytes] = []
+
+
+def test_phases_record_peak_retained_and_top_lines():
+    profile = MemoryProfile()
+    try:
+        with profile.phase("load"):
+            kept.append(bytes(200_000))
+        with profile.phase("render"):
+            scratch = bytes(500_000)
+            del scratch
+    finally:
+        profile.stop()
+        kept.clear()
+
+    load, render = profile.memory["load"], profile.memory["render"]
+    assert load.retained >= 200_000 and load.peak >= load.retained
+    # Freed memory counts towards the peak only
+    assert render.peak >= 500_000 and render.retained < MIN_LINE_BYTES
+    (line, size, _), *_ = load.top_lines
+    assert line.startswith(__file__) and size >= 200_000
+    assert profile.peak >= render.peak
+    assert profile.phases.keys() == {"load", "render"}
+    assert not tracemalloc.is_tracing()
+
+
+def test_tracing_started_elsewhere_is_left_running():
+    tracemalloc.start()
+    try:
+        profile = MemoryProfile()
+        profile.stop()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_to_dict():
+    profile = MemoryProfile()
+    with profile.phase("write"):
+        kept.append(bytes(50_000))
+    profile.stop()
+    kept.clear()
+
+    data = profile.to_dict()
+    assert {"phases", "servers", "peak", "peak_rss", "memory"} <= data.keys()
+    assert data["memory"]["write"].keys() == {"peak", "retained", "top_lines"}
+    assert data["memory"]["write"]["top_lines"][0].keys() == {"line", "bytes", "blocks"}
@@ -0,0 +1,47 @@
+import pytest
+
+from mcp_agents.generator import MCPConfigGenerator
+from mcp_agents.packs import generate_packs, output_path_for, select_packs
+
+PACKS = [{"name": name, "path": f"mcp_agent_packs/{name}/mcp_template.json"}
+         for name in ("work_base", "work_extra", "home")]
+
+
+def names(configurations: list[dict[str, str]]) -> list[str]:
+    return [config["name"] for config in configurations]
+
+
+def test_select_packs_by_name_and_pattern():
+    assert names(select_packs(PACKS, ["home", "work_*"])) == [
+        "home", "work_base", "work_extra"]
+    # A pack matched by several patterns is selected once
+    assert names(select_packs(PACKS, ["work_base", "work_*"])) == [
+        "work_base", "work_extra"]
+    assert names(select_packs(PACKS, [], select_all=True)) == names(PACKS)
+    with pytest.raises(ValueError, match="No MCP configuration matches 'x_\\*'"):
+        select_packs(PACKS, ["home", "x_*"])
+
+
+@pytest.mark.parametrize("output, several, expected", [
+    (".vscode/mcp.json", False, ".vscode/mcp.json"),
+    (".vscode/mcp.json", True, ".vscode/mcp.home.json"),
+    ("out/{pack}/mcp.json", True, "out/home/mcp.json"),
+    ("out/{pack}.json", False, "out/home.json"),
+])
+def test_output_path_for(output, several, expected):
+    assert output_path_for(output, "home", several) == expected
+
+
+def test_generate_packs_reports_a_status_per_pack(project):
+    configurations = MCPConfigGenerator().discover_mcp_configurations()
+    results = generate_packs(configurations, "out/{pack}.json", jobs=1)
+    statuses = {r.name: r.status for r in results}
+    assert statuses == {"base": "written", "extra": "written"}
+
+    (project / "credentials" / "search.json").unlink()
+    results = generate_packs(configurations, "out/{pack}.json", jobs=1)
+    assert [r.status for r in results] == ["up to date", "failed"]
+    assert "Credentials file not found" in results[1].error
+
+    results = generate_packs(configurations[:1], "out/{pack}.json", force=True, jobs=1)
+    assert [r.status for r in results] == ["unchanged"]
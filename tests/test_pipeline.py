@@ -0,0 +1,104 @@
+import textwrap
+
+import pytest
+
+from conftest import write_json
+from mcp_agents.generator import MCPConfigGenerator
+from mcp_agents.pipeline import Pipeline
+
+
+def pipeline_for(*names: str) -> tuple[Pipeline, list[dict[str, str]]]:
+    pipeline = Pipeline(MCPConfigGenerator(output_path=".vscode/mcp.json"))
+    return pipeline, pipeline.discover(names)
+
+
+def test_run_collects_the_artifacts_of_every_stage(project):
+    pipeline, selected = pipeline_for("base", "extra")
+    result = pipeline.run(selected)
+
+    assert result.ok
+    assert list(result.compiled.servers) == ["time", "api", "search"]
+    assert set(result.credentials) == {"api", "search"}
+    assert result.config["servers"]["search"]["args"] == ["--token", "tok-1"]
+    assert result.written == [True]
+    kinds = {event.kind for event in result.events}
+    assert {"template.loaded", "output.saved"} <= kinds
+
+
+def test_run_without_write_stops_after_validation(project):
+    pipeline, selected = pipeline_for("base")
+    result = pipeline.run(selected, write=False)
+    assert result.compiled is not None
+    assert result.config is None and not result.credentials
+    assert not (project / ".vscode" / "mcp.json").exists()
+
+
+def test_composition_depends_on_every_pack(project):
+    pipeline, selected = pipeline_for("base", "extra")
+    assert pipeline.run(selected).ok
+    assert pipeline.generator.is_up_to_date()
+
+    write_json(project / "mcp_agent_packs" / "extra" / "mcp_template.json",
+               {"servers": {"search": {"command": "search-mcp"}}})
+    pipeline, selected = pipeline_for("base", "extra")
+    pipeline.select(selected)
+    assert not pipeline.generator.is_up_to_date()
+
+
+def test_conflicting_composition_writes_nothing(project):
+    write_json(project / "mcp_agent_packs" / "extra" / "mcp_template.json",
+               {"servers": {"time": {"command": "other"}}})
+    pipeline, selected = pipeline_for("base", "extra")
+    with pytest.raises(ValueError, match="server 'time' is defined differently"):
+        pipeline.run(selected)
+    assert not (project / ".vscode" / "mcp.json").exists()
+
+
+def write_prepare(project, source: str):
+    (project / "mcp_agent_packs" / "base" / "prepare.py").write_text(
+        textwrap.dedent(source), encoding='utf-8')
+
+
+def test_credentials_written_by_prepare_are_rendered(project, read_json):
+    # Runs in a subprocess and writes the file after the credentials were read
+    write_prepare(project, """
+        import json, time
+
+        if __name__ == "__main__":
+            time.sleep(0.5)
+            with open("credentials/api.json", "w") as f:
+                json.dump({"api_key": "key-from-prepare", "user": "me"}, f)
+    """)
+    pipeline, selected = pipeline_for("base")
+    result = pipeline.run(selected)
+
+    assert result.ok
+    assert read_json(".vscode/mcp.json")["servers"]["api"]["env"]["API_KEY"] == \
+        "key-from-prepare"
+    assert pipeline.generator.is_up_to_date()
+
+
+def test_credentials_created_by_prepare_are_rendered(project, read_json):
+    (project / "credentials" / "api.json").unlink()
+    write_prepare(project, """
+        import json, time
+
+        if __name__ == "__main__":
+            time.sleep(0.2)
+            with open("credentials/api.json", "w") as f:
+                json.dump({"api_key": "created", "user": "me"}, f)
+    """)
+    pipeline, selected = pipeline_for("base")
+    assert pipeline.run(selected).ok
+    api = read_json(".vscode/mcp.json")["servers"]["api"]
+    assert api["env"]["API_KEY"] == "created"
+
+
+def test_failed_prepare_stops_before_rendering(project):
+    write_json(project / "credentials" / "api.json", {})
+    write_prepare(project, "raise RuntimeError('no')\n")
+    pipeline, selected = pipeline_for("base")
+    result = pipeline.run(selected)
+    assert not result.ok
+    assert result.config is None
+    assert not (project / ".vscode" / "mcp.json").exists()
@@ -0,0 +1,311 @@
+import json
+import sys
+import textwrap
+import time
+
+import pytest
+
+from mcp_agents.prepare import (PrepareScheduler, PrepareStepRunner,
+                                declares_in_process_hooks, run_prepare_script)
+
+
+def runner(tmp_path, steps, **kwargs) -> PrepareStepRunner:
+    return PrepareStepRunner(steps, tmp_path / "stamps.json", **kwargs)
+
+
+def statuses(results) -> dict[str, str]:
+    return {result.id: result.status for result in results}
+
+
+def test_steps_run_once_then_are_up_to_date(tmp_path):
+    src = tmp_path / "src.txt"
+    src.write_text("one", encoding='utf-8')
+    steps = [
+        {"id": "dir", "action": "mkdir", "path": str(tmp_path / "out")},
+        {"id": "copy", "action": "copy", "src": str(src),
+         "dst": str(tmp_path / "out" / "a")},
+    ]
+    assert statuses(runner(tmp_path, steps).run()) == {"dir": "ran", "copy": "ran"}
+    assert (tmp_path / "out" / "a").read_text(encoding='utf-8') == "one"
+    assert statuses(runner(tmp_path, steps).run()) == {
+        "dir": "up to date", "copy": "up to date"}
+
+    # A changed input invalidates its step's stamp only
+    src.write_text("two", encoding='utf-8')
+    assert statuses(runner(tmp_path, steps).run()) == {"dir": "up to date",
+                                                       "copy": "ran"}
+    assert (tmp_path / "out" / "a").read_text(encoding='utf-8') == "two"
+
+    # A missing output runs the step again
+    (tmp_path / "out" / "a").unlink()
+    assert statuses(runner(tmp_path, steps).run())["copy"] == "ran"
+
+
+def test_directory_inputs_are_stamped_by_their_contents(tmp_path):
+    src = tmp_path / "src"
+    (src / "sub").mkdir(parents=True)
+    (src / "sub" / "a").write_text("one", encoding='utf-8')
+    steps = [{"id": "copy", "action": "copy", "src": str(src),
+              "dst": str(tmp_path / "out")}]
+    assert statuses(runner(tmp_path, steps).run()) == {"copy": "ran"}
+    assert statuses(runner(tmp_path, steps).run()) == {"copy": "up to date"}
+
+    (src / "sub" / "a").write_text("two", encoding='utf-8')
+    assert statuses(runner(tmp_path, steps).run()) == {"copy": "ran"}
+    assert (tmp_path / "out" / "sub" / "a").read_text(encoding='utf-8') == "two"
+
+    (src / "b").write_text("", encoding='utf-8')
+    assert statuses(runner(tmp_path, steps).run()) == {"copy": "ran"}
+
+
+def test_stamps_include_dependencies(tmp_path):
+    steps = [
+        {"id": "a", "action": "run", "command": [sys.executable, "-c", "print(1)"]},
+        {"id": "b", "action": "mkdir", "path": str(tmp_path / "b"),
+         "depends_on": ["a"]},
+    ]
+    runner(tmp_path, steps).run()
+    steps[0]["command"] = [sys.executable, "-c", "print(2)"]
+    assert statuses(runner(tmp_path, steps).run()) == {"a": "ran", "b": "ran"}
+
+
+def test_outputs_of_one_step_order_the_next(tmp_path):
+    steps = [
+        {"id": "use", "action": "copy", "src": str(tmp_path / "made" / "f"),
+         "dst": str(tmp_path / "copy")},
+        {"id": "make", "action": "run", "outputs": [str(tmp_path / "made" / "f")],
+         "command": [sys.executable, "-c",
+                     f"import pathlib; p = pathlib.Path({str(tmp_path / 'made')!r}); "
+                     "p.mkdir(); (p / 'f').write_text('x')"]},
+    ]
+    step_runner = runner(tmp_path, steps)
+    assert step_runner.dependencies == {"use": {"make"}, "make": set()}
+    assert statuses(step_runner.run()) == {"use": "ran", "make": "ran"}
+    assert (tmp_path / "copy").read_text() == "x"
+
+
+def test_failed_step_blocks_its_dependents(tmp_path):
+    events = []
+    steps = [
+        {"id": "fail", "action": "run", "command": [sys.executable, "-c", "exit(3)"]},
+        {"id": "after", "action": "mkdir", "path": str(tmp_path / "x"),
+         "depends_on": ["fail"]},
+        {"id": "other", "action": "mkdir", "path": str(tmp_path / "y")},
+    ]
+    results = runner(tmp_path, steps, on_event=events.append).run()
+    assert statuses(results) == {"fail": "failed", "after": "blocked", "other": "ran"}
+    assert "exited with code 3" in results[0].error
+    # Only completed steps are stamped
+    assert set(json.loads((tmp_path / "stamps.json").read_text())) == {"other"}
+    assert any(e.kind == "prepare.step" and e.fields["step"] == "fail" for e in events)
+
+
+@pytest.mark.parametrize("steps, message", [
+    ([{"id": "a", "action": "mkdir", "path": "x", "depends_on": ["b"]},
+      {"id": "b", "action": "mkdir", "path": "y", "depends_on": ["a"]}], "cycle"),
+    ([{"id": "a", "action": "mkdir", "path": "x", "depends_on": ["nope"]}],
+     "unknown steps"),
+    ([{"id": "a", "action": "mkdir", "path": "x"},
+      {"id": "a", "action": "mkdir", "path": "y"}], "unique"),
+])
+def test_invalid_step_graphs_are_rejected(tmp_path, steps, message):
+    with pytest.raises(ValueError, match=message):
+        runner(tmp_path, steps).run()
+
+
+def test_mirror_step_copies_from_the_mirror(tmp_path, monkeypatch):
+    mirror = tmp_path / "mirror"
+    mirror.mkdir()
+    (mirror / "tool.bin").write_bytes(b"bin")
+    monkeypatch.setenv("MCP_AGENTS_MIRROR", f"file://{mirror}")
+    steps = [{"id": "m", "action": "mirror", "file": "tool.bin",
+              "dst": str(tmp_path / "bin" / "tool.bin")}]
+    assert statuses(runner(tmp_path, steps).run()) == {"m": "ran"}
+    assert (tmp_path / "bin" / "tool.bin").read_bytes() == b"bin"
+
+
+def write_script(path, source: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(textwrap.dedent(source), encoding='utf-8')
+    return path
+
+
+def test_scripts_without_hooks_run_in_a_subprocess(tmp_path):
+    events = []
+    script = write_script(tmp_path / "pack" / "prepare.py", "print('hello')\n")
+    result = run_prepare_script(script, on_event=events.append)
+    assert result.ok and not result.in_process
+    assert [e.fields["line"] for e in events if e.kind == "prepare.output"] == ["hello"]
+
+
+def test_failing_and_slow_subprocess_scripts(tmp_path):
+    failing = write_script(tmp_path / "a" / "prepare.py", "raise RuntimeError('no')\n")
+    slow = write_script(tmp_path / "b" / "prepare.py", "import time; time.sleep(5)\n")
+    with PrepareScheduler(timeout=0.5) as scheduler:
+        failed, timed_out = scheduler.run_all([("a", failing), ("b", slow)])
+    assert failed.returncode == 1 and failed.error == "exited with code 1"
+    assert timed_out.timed_out and timed_out.error == "timed out after 0.5 s"
+
+
+def test_prepare_function_runs_in_process(tmp_path):
+    events = []
+    script = write_script(tmp_path / "pack" / "prepare.py", """
+        def prepare():
+            print("in process")
+    """)
+    result = run_prepare_script(script, on_event=events.append)
+    assert result.ok and result.in_process
+    lines = [e.fields["line"] for e in events if e.kind == "prepare.output"]
+    assert lines == ["in process"]
+
+
+def test_prepare_function_errors_are_reported(tmp_path):
+    script = write_script(tmp_path / "pack" / "prepare.py", """
+        def prepare():
+            raise RuntimeError("boom")
+    """)
+    result = run_prepare_script(script)
+    assert not result.ok
+    assert result.error == "prepare() raised RuntimeError: boom"
+
+
+def test_prepare_steps_of_a_script_are_run(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    script = write_script(tmp_path / "pack" / "prepare.py", f"""
+        PREPARE_STEPS = [
+            {{"id": "d", "action": "mkdir", "path": {str(tmp_path / "d")!r}}}]
+    """)
+    result = run_prepare_script(script)
+    assert result.ok and result.in_process
+    assert (tmp_path / "d").is_dir()
+    assert (tmp_path / ".mcp_cache" / "prepare" / "pack.json").exists()
+
+
+def test_scripts_are_not_imported_to_decide_how_to_run_them(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    script = write_script(tmp_path / "pack" / "prepare.py", """
+        with open("ran.log", "a") as f:
+            f.write("top level\\n")
+    """)
+    result = run_prepare_script(script)
+    assert result.ok and not result.in_process
+    assert (tmp_path / "ran.log").read_text() == "top level\n"
+
+
+def test_top_level_code_of_in_process_scripts_runs_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    script = write_script(tmp_path / "pack" / "prepare.py", """
+        with open("ran.log", "a") as f:
+            f.write("top level\\n")
+
+        def prepare():
+            with open("ran.log", "a") as f:
+                f.write("prepare\\n")
+    """)
+    assert run_prepare_script(script).in_process
+    assert (tmp_path / "ran.log").read_text() == "top level\nprepare\n"
+
+
+@pytest.mark.parametrize("source", [
+    "def prepare():\n    pass\n\nPREPARE_IN_PROCESS = False\n",
+    "PREPARE_STEPS = []\nPREPARE_IN_PROCESS: bool = False\n",
+    "def setup():\n    pass\n",
+    "def prepare(:\n",
+])
+def test_scripts_that_do_not_declare_hooks_run_in_a_subprocess(source):
+    assert not declares_in_process_hooks(source)
+
+
+@pytest.mark.parametrize("code, returncode", [(0, 0), (3, 3)])
+def test_exit_while_importing_falls_back_to_a_subprocess(tmp_path, code, returncode):
+    script = write_script(tmp_path / f"pack{code}" / "prepare.py", f"""
+        import sys
+
+        def prepare():
+            pass
+
+        sys.exit({code})
+    """)
+    result = run_prepare_script(script)
+    assert not result.in_process
+    assert result.returncode == returncode
+
+
+def test_exit_in_prepare_function(tmp_path):
+    ok = write_script(tmp_path / "ok" / "prepare.py", """
+        import sys
+
+        def prepare():
+            sys.exit(0)
+    """)
+    failing = write_script(tmp_path / "failing" / "prepare.py", """
+        def prepare():
+            raise SystemExit(5)
+    """)
+    assert run_prepare_script(ok).ok
+    assert run_prepare_script(failing).error == "prepare() exited with code 5"
+
+
+def test_prepare_functions_run_concurrently_with_their_own_output(tmp_path):
+    events = []
+    scripts = [(name, write_script(tmp_path / name / "prepare.py", f"""
+        import time
+
+        def prepare():
+            for i in range(3):
+                print("{name}", i)
+                time.sleep(0.2)
+    """)) for name in ("a", "b")]
+    start = time.perf_counter()
+    with PrepareScheduler(max_workers=2, on_event=events.append) as scheduler:
+        results = scheduler.run_all(scripts)
+    assert time.perf_counter() - start < 1.0
+    assert all(result.ok and result.in_process for result in results)
+    for name in ("a", "b"):
+        lines = [e.fields["line"] for e in events
+                 if e.kind == "prepare.output" and e.fields["pack"] == name]
+        assert lines == [f"{name} 0", f"{name} 1", f"{name} 2"]
+
+
+def test_prepare_function_is_abandoned_after_the_timeout(tmp_path):
+    script = write_script(tmp_path / "slow" / "prepare.py", """
+        import time
+
+        def prepare():
+            time.sleep(3)
+    """)
+    start = time.perf_counter()
+    with PrepareScheduler(timeout=0.2) as scheduler:
+        result = scheduler.submit("slow", script).result()
+    assert time.perf_counter() - start < 1.5
+    assert result.timed_out and not result.ok and result.in_process
+    assert result.error.startswith("timed out after 0.2 s")
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="uses sleep")
+def test_timeout_kills_the_processes_a_script_started(tmp_path):
+    script = write_script(tmp_path / "helper" / "prepare.py", """
+        import subprocess
+        subprocess.run(["sleep", "8"])
+    """)
+    start = time.perf_counter()
+    with PrepareScheduler(timeout=0.5) as scheduler:
+        result = scheduler.submit("helper", script).result()
+    assert result.timed_out
+    assert time.perf_counter() - start < 4
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="uses sleep")
+def test_processes_left_running_do_not_block_the_result(tmp_path):
+    script = write_script(tmp_path / "daemon" / "prepare.py", """
+        import subprocess
+        subprocess.Popen(["sleep", "5"])
+        print("started")
+    """)
+    events = []
+    start = time.perf_counter()
+    result = run_prepare_script(script, on_event=events.append)
+    assert result.ok
+    assert time.perf_counter() - start < 4
+    lines = [e.fields["line"] for e in events if e.kind == "prepare.output"]
+    assert lines == ["started"]
@@ -0,0 +1,51 @@
+import pstats
+
+from mcp_agents.profiling import (collapsed_stacks, frame_label, hotspots,
+                                  profile_call, write_profile)
+
+
+def function_key(profile, name):
+    entries = pstats.Stats(profile).stats
+    (found,) = [key for key in entries if key[2] == name]
+    return found
+
+
+def leaf() -> int:
+    return sum(range(20000))
+
+
+def outer() -> int:
+    return leaf() + leaf()
+
+
+def test_frame_label():
+    assert frame_label(("~", 0, "<built-in method len>")) == "<built-in method len>"
+    assert frame_label(("/src/pkg/mod.py", 12, "f;g")) == "f,g (mod.py:12)"
+
+
+def test_profile_call_returns_the_result_and_its_profile():
+    result, profile = profile_call(outer)
+    assert result == 2 * sum(range(20000))
+
+    stacks = collapsed_stacks(pstats.Stats(profile))
+    outer_label = frame_label(function_key(profile, "outer"))
+    leaf_label = frame_label(function_key(profile, "leaf"))
+    assert any(stack.split(";")[-2:] == [outer_label, leaf_label] for stack in stacks)
+    assert all(seconds >= 0 for seconds in stacks.values())
+
+    rows = hotspots(pstats.Stats(profile), count=2)
+    assert len(rows) == 2
+    assert rows[0][3] >= rows[1][3]
+    (calls,) = [row[1] for row in hotspots(pstats.Stats(profile), 100)
+                if row[0].startswith("leaf ")]
+    assert calls == 2
+
+
+def test_write_profile(tmp_path):
+    _, profile = profile_call(outer)
+    pstats_path, collapsed_path = write_profile(profile, tmp_path / "prof" / "run")
+    assert (pstats_path.name, collapsed_path.name) == ("run.pstats", "run.collapsed")
+    assert pstats.Stats(str(pstats_path)).total_calls > 0
+    for line in collapsed_path.read_text(encoding='utf-8').splitlines():
+        stack, microseconds = line.rsplit(" ", 1)
+        assert stack and int(microseconds) > 0
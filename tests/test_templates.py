@@ -0,0 +1,177 @@
+from pathlib import Path
+
+import pytest
+
+from conftest import write_json
+from mcp_agents.generator import MCPConfigGenerator
+from mcp_agents.templates import (TemplateResolver, compile_template,
+                                  compiled_template_cache_path, compose_templates,
+                                  load_compiled_template, save_compiled_template)
+
+
+def test_compiled_template_renders_slots():
+    template = {"servers": {
+        "api": {"env": {"KEY": "%%key%%", "URL": "https://%%host%%/v1"},
+                "args": ["--user", "%%user%%"], "static": {"a": [1, 2]}},
+        "plain": {"command": "x"},
+    }}
+    compiled = compile_template(template)
+
+    assert compiled.servers["api"].placeholders == {"key", "host", "user"}
+    assert not compiled.servers["plain"].slots
+    assert {slot.json_path for slot in compiled.slots} == {
+        "$.servers.api.env.KEY", "$.servers.api.env.URL", "$.servers.api.args[1]"}
+
+    config = compiled.render({"api": {"key": "k", "host": "example.org", "user": "me"}})
+    api = config["servers"]["api"]
+    assert api["env"] == {"KEY": "k", "URL": "https://example.org/v1"}
+    assert api["args"] == ["--user", "me"]
+    # Subtrees without slots are shared with the template, which is untouched
+    assert api["static"] is template["servers"]["api"]["static"]
+    assert config["servers"]["plain"] is template["servers"]["plain"]
+    assert template["servers"]["api"]["env"]["KEY"] == "%%key%%"
+
+
+def test_compiled_template_reports_missing_credential():
+    compiled = compile_template({"servers": {"api": {"env": {"KEY": "%%key%%"}}}})
+    with pytest.raises(ValueError, match="Missing credential for placeholder"):
+        compiled.render({"api": {}})
+
+
+def test_compiled_template_renders_many_credential_sets():
+    compiled = compile_template({"servers": {
+        "api": {"env": {"KEY": "%%key%%", "USER": "%%user%%"}, "args": ["-v"]},
+        "url": "https://%%host%%",
+    }})
+    first = compiled.render({"api": {"key": "k1", "user": "a"},
+                             "url": {"host": "one"}})
+    second = compiled.render({"api": {"key": "k2", "user": "b"},
+                              "url": {"host": "two"}})
+
+    # Each render copies the containers on the way to its slots only
+    assert first["servers"]["api"]["env"] == {"KEY": "k1", "USER": "a"}
+    assert second["servers"]["api"]["env"] == {"KEY": "k2", "USER": "b"}
+    assert first["servers"]["api"]["args"] is second["servers"]["api"]["args"]
+    assert (first["servers"]["url"], second["servers"]["url"]) == \
+        ("https://one", "https://two")
+
+
+def test_placeholder_segments_keep_the_literal_text():
+    compiled = compile_template({"servers": {"a": {"x": "%%user%%@%%host%%:22 %% 5"}}})
+    slot = compiled.slots[0]
+    assert slot.segments == ("", "user", "@", "host", ":22 %% 5")
+    assert slot.render({"user": "me", "host": "h"}) == "me@h:22 %% 5"
+
+
+def test_compiled_template_cache_is_invalidated_by_sources(tmp_path):
+    template_path = tmp_path / "pack" / "mcp_template.json"
+    write_json(template_path, {"servers": {"a": {"command": "a"}}})
+    compiled = compile_template({"servers": {"a": {"command": "a"}}}, [template_path])
+    save_compiled_template(template_path, compiled)
+
+    assert load_compiled_template(template_path).template == compiled.template
+    write_json(template_path, {"servers": {"b": {"command": "b"}}})
+    assert load_compiled_template(template_path) is None
+
+
+def test_damaged_compiled_template_cache_is_ignored(tmp_path):
+    template_path = tmp_path / "pack" / "mcp_template.json"
+    write_json(template_path, {"servers": {"a": {"command": "a"}}})
+    compiled = compile_template({"servers": {"a": {"command": "a"}}}, [template_path])
+    save_compiled_template(template_path, compiled)
+    cache = compiled_template_cache_path(template_path)
+    assert cache.parent.name == "__mcpcache__"
+
+    cache.write_bytes(cache.read_bytes()[:-10])
+    assert load_compiled_template(template_path) is None
+    cache.write_bytes(b"not a pickle")
+    assert load_compiled_template(template_path) is None
+
+
+def test_composed_selections_are_not_cached(project):
+    generator = MCPConfigGenerator("mcp_agent_packs/base/mcp_template.json")
+    generator.compose_with = [Path("mcp_agent_packs/extra/mcp_template.json")]
+    generator.compile()
+    assert not list(project.glob("mcp_agent_packs/*/__mcpcache__/*"))
+
+    MCPConfigGenerator("mcp_agent_packs/base/mcp_template.json").compile()
+    assert [path.relative_to(project).as_posix()
+            for path in project.glob("mcp_agent_packs/*/__mcpcache__/*")] == [
+        "mcp_agent_packs/base/__mcpcache__/mcp_template.pickle"]
+
+
+def test_inheritance_and_fragments(tmp_path):
+    packs = tmp_path / "packs"
+    write_json(packs / "_fragments" / "time.json", {"command": "time", "args": ["a"]})
+    write_json(packs / "base" / "mcp_template.json", {
+        "servers": {"time": {"$fragment": "time", "args": ["b"]},
+                    "old": {"command": "o"}},
+        "inputs": [1],
+    })
+    write_json(packs / "child" / "mcp_template.json", {
+        "extends": "base",
+        "servers": {"old": None, "new": {"command": "n"}},
+        "inputs": [1, 2],
+    })
+
+    resolver = TemplateResolver(packs)
+    template, sources = resolver.resolve(packs / "child" / "mcp_template.json")
+
+    assert template["servers"] == {"time": {"command": "time", "args": ["b"]},
+                                   "new": {"command": "n"}}
+    assert template["inputs"] == [1, 2]
+    assert "extends" not in template
+    assert sources == [packs / "child" / "mcp_template.json",
+                       packs / "base" / "mcp_template.json",
+                       packs / "_fragments" / "time.json"]
+
+
+def test_inheritance_cycle_is_reported(tmp_path):
+    packs = tmp_path / "packs"
+    write_json(packs / "a" / "mcp_template.json", {"extends": "b", "servers": {}})
+    write_json(packs / "b" / "mcp_template.json", {"extends": ["a"], "servers": {}})
+
+    with pytest.raises(ValueError, match="Template inheritance cycle: .*a.*b.*a"):
+        TemplateResolver(packs).resolve(packs / "a" / "mcp_template.json")
+
+
+def test_missing_fragment_is_reported(tmp_path):
+    packs = tmp_path / "packs"
+    write_json(packs / "a" / "mcp_template.json",
+               {"servers": {"x": {"$fragment": "nope"}}})
+
+    with pytest.raises(FileNotFoundError, match="Fragment file not found"):
+        TemplateResolver(packs).resolve(packs / "a" / "mcp_template.json")
+
+
+def test_resolver_rereads_changed_sources(tmp_path):
+    packs = tmp_path / "packs"
+    path = packs / "a" / "mcp_template.json"
+    write_json(path, {"servers": {"x": {"command": "1"}}})
+    resolver = TemplateResolver(packs)
+    assert resolver.resolve(path)[0]["servers"]["x"]["command"] == "1"
+
+    write_json(path, {"servers": {"x": {"command": "22"}}})
+    assert resolver.resolve(path)[0]["servers"]["x"]["command"] == "22"
+
+
+def test_compose_keeps_identical_servers_once():
+    composed = compose_templates([
+        ("a", {"servers": {"time": {"command": "t"}, "a": {"command": "a"}},
+               "inputs": [1]}),
+        ("b", {"servers": {"time": {"command": "t"}, "b": {"command": "b"}},
+               "inputs": [1, 2]}),
+    ])
+    assert list(composed["servers"]) == ["time", "a", "b"]
+    assert composed["inputs"] == [1, 2]
+
+
+def test_compose_reports_all_conflicts():
+    with pytest.raises(ValueError) as error:
+        compose_templates([
+            ("a", {"servers": {"time": {"command": "t"}}, "mode": "x"}),
+            ("b", {"servers": {"time": {"command": "other"}}, "mode": "y"}),
+        ])
+    message = str(error.value)
+    assert "server 'time' is defined differently in a and b" in message
+    assert "'mode' is defined differently in b" in message
@@ -0,0 +1,50 @@
+import pytest
+
+from mcp_agents.generator import MCPConfigGenerator
+from mcp_agents.pipeline import Pipeline
+from mcp_agents.timings import Timings, timed
+
+
+def test_phases_entered_again_add_up():
+    timings = Timings()
+    with timings.phase("load"):
+        pass
+    first = timings.phases["load"]
+    with timed(timings, "load"):
+        pass
+    assert timings.phases["load"] >= first > 0
+
+    with pytest.raises(RuntimeError):
+        with timings.phase("render"):
+            raise RuntimeError
+    # A phase that raised is measured as well
+    assert "render" in timings.phases
+
+
+def test_timed_without_timings_measures_nothing():
+    with timed(None, "load"):
+        pass
+
+
+def test_slowest_servers_and_export():
+    timings = Timings()
+    timings.add_server("a", "render", 0.1)
+    timings.add_server("b", "resolve", 0.2)
+    timings.add_server("a", "resolve", 0.3)
+    assert timings.slowest_servers(1) == [("a", pytest.approx(0.4))]
+    data = timings.to_dict()
+    assert data["servers"] == {"a": {"render": 0.1, "resolve": 0.3},
+                               "b": {"resolve": 0.2}}
+    assert data["total"] > 0 and data["prepare_scripts"] == {}
+
+
+def test_pipeline_times_each_stage_and_server(project):
+    generator = MCPConfigGenerator(output_path=".vscode/mcp.json")
+    generator.timings = Timings()
+    pipeline = Pipeline(generator)
+    assert pipeline.run(pipeline.discover(["base"])).ok
+
+    assert {"load", "validate", "resolve", "render", "write"} <= \
+        generator.timings.phases.keys()
+    assert generator.timings.servers["api"].keys() == {"resolve", "render"}
+    assert generator.timings.servers["time"].keys() == {"render"}
@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+
+from conftest import write_json
+from mcp_agents import watch as watch_module
+from mcp_agents.generator import MCPConfigGenerator
+from mcp_agents.watch import FileWatcher, watch
+
+
+@pytest.mark.parametrize("inotify", [True, False])
+def test_file_watcher_coalesces_a_burst_of_changes(tmp_path, inotify):
+    first, second = tmp_path / "a.json", tmp_path / "b.json"
+    first.write_text("1")
+    second.write_text("1")
+    watcher = FileWatcher(debounce=0.2, poll_interval=0.02)
+    if not inotify:
+        watcher._inotify = None
+    watcher.set_paths([first, second, tmp_path / "missing.json"])
+
+    def edit():
+        time.sleep(0.1)
+        first.write_text("22")
+        time.sleep(0.05)
+        second.write_text("22")
+
+    thread = threading.Thread(target=edit)
+    thread.start()
+    changed = watcher.wait()
+    thread.join()
+    assert changed == {first, second}
+
+
+def test_watch_regenerates_after_a_credential_change(project, monkeypatch, read_json):
+    events = []
+    generator = MCPConfigGenerator("mcp_agent_packs/base/mcp_template.json",
+                                   output_path=".vscode/mcp.json")
+    generator.on_event = events.append
+    generator.run()
+    api = (project / "credentials" / "api.json").absolute()
+    changes = iter([{api}, KeyboardInterrupt])
+
+    def wait(self):
+        write_json(api, {"api_key": "key-2", "user": "me"})
+        change = next(changes)
+        if change is KeyboardInterrupt:
+            raise KeyboardInterrupt
+        return change
+
+    monkeypatch.setattr(watch_module.FileWatcher, "wait", wait)
+    with pytest.raises(KeyboardInterrupt):
+        watch(generator)
+
+    assert read_json(".vscode/mcp.json")["servers"]["api"]["env"]["API_KEY"] == "key-2"
+    kinds = [event.kind for event in events]
+    assert kinds.count("watch.waiting") == 2
+    assert "watch.changed" in kinds
+    assert generator.is_up_to_date()
+
+
+def test_watched_paths_are_the_inputs_of_the_output(project):
+    generator = MCPConfigGenerator("mcp_agent_packs/base/mcp_template.json",
+                                   output_path=".vscode/mcp.json")
+    generator.run()
+    assert {path.absolute() for path in generator.input_paths()} == {
+        project / "mcp_agent_packs" / "base" / "mcp_template.json",
+        project / "mcp_agent_packs" / "_fragments" / "time.json",
+        project / "credentials" / "api.json",
+    }
+
+
+def test_watch_reports_errors_and_keeps_watching(project, monkeypatch, read_json):
+    events = []
+    template = project / "mcp_agent_packs" / "base" / "mcp_template.json"
+    generator = MCPConfigGenerator("mcp_agent_packs/base/mcp_template.json",
+                                   output_path=".vscode/mcp.json")
+    generator.on_event = events.append
+    generator.run()
+    edits = iter([
+        lambda: template.write_text("{", encoding='utf-8'),
+        lambda: write_json(template, {"servers": {"time": {"$fragment": "time"}}}),
+    ])
+
+    def wait(self):
+        try:
+            next(edits)()
+        except StopIteration:
+            raise KeyboardInterrupt
+        return {template}
+
+    monkeypatch.setattr(watch_module.FileWatcher, "wait", wait)
+    with pytest.raises(KeyboardInterrupt):
+        watch(generator)
+
+    errors = [event.fields["error"] for event in events if event.kind == "watch.error"]
+    assert len(errors) == 1 and "Invalid JSON" in errors[0]
+    assert list(read_json(".vscode/mcp.json")["servers"]) == ["time"]
@@ -0,0 +1,113 @@
+from pathlib import Path
+
+import pytest
+
+from conftest import write_json
+from mcp_agents.generator import MCPConfigGenerator
+from mcp_agents.writers import (ClaudeDesktopWriter, CursorWriter, VSCodeWriter,
+                                parse_target)
+
+CONFIG = {
+    "servers": {
+        "stdio": {"command": "a", "type": "stdio"},
+        "http": {"url": "https://example.org", "type": "http"},
+    },
+    "inputs": [{"id": "x"}],
+}
+
+
+def test_vscode_writes_the_template_layout():
+    assert VSCodeWriter().document(CONFIG, {"other": 1}) is CONFIG
+
+
+def test_mcp_servers_layout_drops_stdio_type_and_keeps_other_settings():
+    document = CursorWriter().document(CONFIG, {"theme": "dark",
+                                                "mcpServers": {"old": {}}})
+    assert document == {
+        "theme": "dark",
+        "mcpServers": {"old": {}, "stdio": {"command": "a"},
+                       "http": {"url": "https://example.org", "type": "http"}},
+    }
+
+
+def test_mcp_servers_layout_removes_only_servers_it_wrote():
+    existing = {"mcpServers": {"mine": {"command": "m"}, "gone": {}, "stdio": {}}}
+    document = CursorWriter().document(CONFIG, existing, {"gone", "stdio"})
+    assert list(document["mcpServers"]) == ["mine", "stdio", "http"]
+    assert document["mcpServers"]["stdio"] == {"command": "a"}
+
+
+def test_default_paths(monkeypatch, tmp_path):
+    monkeypatch.setattr("sys.platform", "linux")
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path))
+    assert ClaudeDesktopWriter().default_path() == \
+        tmp_path / "Claude" / "claude_desktop_config.json"
+    assert CursorWriter().default_path() == Path(".cursor/mcp.json")
+    assert VSCodeWriter().default_path() == Path(".vscode/mcp.json")
+
+
+def test_parse_target():
+    writer, path = parse_target("cursor=out/mcp.json")
+    assert isinstance(writer, CursorWriter) and path == Path("out/mcp.json")
+    assert parse_target("claude")[1] is None
+    with pytest.raises(ValueError, match="Unknown output target 'zed'"):
+        parse_target("zed")
+
+
+def test_write_targets_renders_once_for_every_client(project, read_json):
+    write_json(project / "client" / "claude.json", {"globalShortcut": "Ctrl+Space"})
+    generator = MCPConfigGenerator("mcp_agent_packs/base/mcp_template.json")
+    targets = [(VSCodeWriter(), Path(".vscode/mcp.json")),
+               (ClaudeDesktopWriter(), project / "client" / "claude.json"),
+               (CursorWriter(), Path(".cursor/mcp.json"))]
+
+    assert generator.run(targets) == [True, True, True]
+
+    assert read_json(".vscode/mcp.json")["servers"]["api"]["type"] == "stdio"
+    claude = read_json(project / "client" / "claude.json")
+    assert claude["globalShortcut"] == "Ctrl+Space"
+    assert claude["mcpServers"]["api"] == {"command": "api-mcp",
+                                           "env": {"API_KEY": "key-1", "USER": "me"}}
+    assert read_json(".cursor/mcp.json")["mcpServers"] == claude["mcpServers"]
+    for writer, path in targets:
+        assert generator.for_target(writer, path).is_up_to_date()
+    assert generator.run(targets) == [False, False, False]
+
+
+def test_manifests_are_kept_in_the_cache(project, tmp_path_factory):
+    claude = tmp_path_factory.mktemp("Claude") / "claude_desktop_config.json"
+    generator = MCPConfigGenerator("mcp_agent_packs/base/mcp_template.json")
+    targets = [(VSCodeWriter(), Path(".vscode/mcp.json")),
+               (ClaudeDesktopWriter(), claude)]
+
+    assert generator.run(targets) == [True, True]
+    # Neither next to a tracked output nor in another application's directory
+    assert [path.name for path in Path(".vscode").iterdir()] == ["mcp.json"]
+    assert [path.name for path in claude.parent.iterdir()] == [claude.name]
+    manifests = [generator.for_target(*target).manifest_path for target in targets]
+    assert {path.parent for path in manifests} == {Path(".mcp_cache/manifests")}
+    assert manifests[0] != manifests[1]
+    assert all(generator.for_target(*target).is_up_to_date() for target in targets)
+
+
+def test_servers_of_the_user_survive_in_a_shared_file(project, read_json):
+    claude = project / "client" / "claude.json"
+    write_json(claude, {"mcpServers": {"mine": {"command": "m"}}})
+    events = []
+    generator = MCPConfigGenerator("mcp_agent_packs/base/mcp_template.json")
+    generator.on_event = events.append
+    generator.run([(ClaudeDesktopWriter(), claude)])
+    assert list(read_json(claude)["mcpServers"]) == ["mine", "time", "api"]
+    saved = [e.fields["changes"] for e in events if e.kind == "output.saved"]
+    assert saved == [{"time": "added", "api": "added"}]
+
+    # A server the generator wrote before is removed once the pack drops it
+    write_json(project / "mcp_agent_packs" / "base" / "mcp_template.json",
+               {"servers": {"time": {"$fragment": "time"}}})
+    events.clear()
+    generator = MCPConfigGenerator("mcp_agent_packs/base/mcp_template.json")
+    generator.on_event = events.append
+    generator.run([(ClaudeDesktopWriter(), claude)])
+    assert list(read_json(claude)["mcpServers"]) == ["mine", "time"]
+    saved = [e.fields["changes"] for e in events if e.kind == "output.saved"]
+    assert saved == [{"time": "unchanged", "api": "removed"}]